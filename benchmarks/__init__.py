@@ -0,0 +1 @@
+"""Benchmarks that exercise the whole app; see the modules for how to run each."""
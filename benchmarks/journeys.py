@@ -0,0 +1,484 @@
+"""
+End-to-end HTTP benchmark of the core user journeys.
+
+Serves ``campus_gamehub.wsgi.application`` from Django's threaded WSGI
+server on localhost and runs ``--users`` simulated users at once, each in
+a process of its own so that the clients (and the database checks they
+make between steps) don't compete with the server for its GIL. Each one
+repeats the journey: log in, browse the catalog, open a game, request a
+rental, have the game's owner approve it, pay for it. Every request is
+timed; the run prints throughput and p50/p95/p99 latency per step and saves
+them as JSON, which ``--compare`` checks a later run against:
+
+    python -m benchmarks.journeys --users 8 --journeys 200
+    python -m benchmarks.journeys --compare benchmarks/results/journeys-<time>.json
+
+By default a fresh SQLite database is migrated and filled by
+``seed_gamehub`` in a temporary directory. ``--database`` runs against an
+existing file instead and adds the benchmark's users and games to it, so
+point it at a copy. DEBUG is off during the run, as in production.
+"""
+import argparse
+import io
+import json
+import logging
+import math
+import multiprocessing
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+from http.client import HTTPConnection, HTTPException, RemoteDisconnected
+from http.cookies import SimpleCookie
+from pathlib import Path
+from urllib.parse import urlencode
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = BASE_DIR / 'benchmarks' / 'results'
+
+# In journey order
+STEPS = (
+    'login_form', 'login', 'game_list', 'game_detail', 'request_form',
+    'request_rental', 'approve_rental', 'pay_form', 'pay_rental',
+)
+PERCENTILES = (50, 95, 99)
+
+PASSWORD = 'bench-pass-123'
+# Journeys run before the timed ones, to fill template and query caches
+WARMUP_JOURNEYS = 5
+# Games the journeys rent from, and the owners who approve the rentals
+BENCH_GAMES = 20
+BENCH_OWNERS = 2
+
+# --compare flags a step whose p95 latency grew by more than this fraction...
+DEFAULT_TOLERANCE = 0.2
+# ...and by at least this much, so microsecond jitter on fast steps is ignored
+MIN_REGRESSION_MS = 2.0
+
+# Seconds the client processes get to start before the clock starts
+STARTUP_TIMEOUT = 120
+
+IDEMPOTENCY_KEY = re.compile(r'name="idempotency_key" value="([^"]+)"')
+
+
+class JourneyError(Exception):
+    def __init__(self, step, message):
+        super().__init__(f"{step}: {message}")
+        self.step = step
+
+
+# ---- Setup ----
+
+def setup_django(database):
+    """Point the settings at ``database``, production style, and load the WSGI app."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'campus_gamehub.settings')
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = str(database)
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+
+    from campus_gamehub.wsgi import application
+    return application
+
+
+def seed(options, fresh):
+    """Create the benchmark's students, owners and games; returns ``(students, games)``."""
+    from django.core.management import call_command
+    from django.db.models import F
+    from django.utils import timezone
+
+    from games.models import Game, bump_catalog_version
+    from users.models import CustomUser
+
+    quiet = io.StringIO()
+    if fresh:
+        call_command('migrate', verbosity=0)
+        if options.background_rentals:
+            # Something for the catalog, reports and indexes to chew on
+            call_command(
+                'seed_gamehub', prefix='load', rentals=options.background_rentals, password=PASSWORD, stdout=quiet,
+            )
+
+    prefix = f'bench{int(time.time())}'
+    call_command(
+        'seed_gamehub', prefix=prefix, students=options.journeys + WARMUP_JOURNEYS, owners=BENCH_OWNERS,
+        super_admins=0, games=BENCH_GAMES, rentals=0, password=PASSWORD, stdout=quiet,
+    )
+    games = Game.objects.filter(added_by__username__startswith=f'{prefix}-')
+    # Enough copies that every journey's rental can be approved
+    games.update(
+        total_copies=F('total_copies') + options.journeys + WARMUP_JOURNEYS,
+        available_copies=F('available_copies') + options.journeys + WARMUP_JOURNEYS,
+        updated_at=timezone.now(),
+    )
+    bump_catalog_version()
+    students = list(
+        CustomUser.objects.filter(username__startswith=f'{prefix}-student-').order_by('id').values_list('id', 'username')
+    )
+    games = list(games.order_by('id').values_list('id', 'added_by__username'))
+    return students, games
+
+
+class ServerErrors(logging.Handler):
+    """Counts the exceptions behind 500 responses, which DEBUG=False keeps out of the pages."""
+
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.counts = {}
+
+    def emit(self, record):
+        if record.exc_info and record.exc_info[1] is not None:
+            exc = record.exc_info[1]
+            message = f"{type(exc).__name__}: {exc}"
+        else:
+            message = record.getMessage()
+        with self.lock:
+            self.counts[message] = self.counts.get(message, 0) + 1
+
+
+def serve(application):
+    """Start a threaded WSGI server on a free localhost port; returns the server."""
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=False)
+    server.set_app(application)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ---- Simulated users ----
+
+class Client:
+    """A browser stand-in: one keep-alive connection, its cookies and CSRF token."""
+
+    def __init__(self, port, timings):
+        self.connection = HTTPConnection('127.0.0.1', port, timeout=60)
+        self.cookies = {}
+        # (step, seconds, ok) for every request, appended by this client only
+        self.timings = timings
+
+    def request(self, step, method, path, data=None, expect=200):
+        body = urlencode(data) if data is not None else None
+        headers = {'Cookie': '; '.join(f'{name}={value}' for name, value in self.cookies.items())}
+        if method == 'POST':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+
+        start = time.perf_counter()
+        try:
+            response = self._send(method, path, body, headers)
+        except (OSError, HTTPException) as exc:
+            self.timings.append((step, time.perf_counter() - start, False))
+            raise JourneyError(step, f"{type(exc).__name__}: {exc}") from exc
+        content = response.read()
+        elapsed = time.perf_counter() - start
+
+        ok = response.status == expect
+        self.timings.append((step, elapsed, ok))
+        if not ok:
+            raise JourneyError(step, f"HTTP {response.status}, expected {expect}")
+        for header in response.headers.get_all('Set-Cookie') or ():
+            for name, morsel in SimpleCookie(header).items():
+                if morsel['max-age'] == '0':
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+        return content.decode()
+
+    def _send(self, method, path, body, headers):
+        try:
+            self.connection.request(method, path, body, headers)
+            return self.connection.getresponse()
+        except (ConnectionError, RemoteDisconnected):
+            # The server closed the idle keep-alive connection; reconnect once
+            self.connection.close()
+            self.connection.request(method, path, body, headers)
+            return self.connection.getresponse()
+
+    def log_in(self, username):
+        from django.urls import reverse
+
+        self.request('login_form', 'GET', reverse('login'))
+        self.request('login', 'POST', reverse('login'), {'username': username, 'password': PASSWORD}, expect=302)
+
+    def close(self):
+        self.connection.close()
+
+
+def run_journey(client, owner, student, game_id, rental_days):
+    from django.urls import reverse
+
+    from rentals.models import Rental
+
+    student_id, username = student
+    client.log_in(username)
+    client.request('game_list', 'GET', reverse('game_list'))
+    client.request('game_detail', 'GET', reverse('game_detail', args=[game_id]))
+    client.request('request_form', 'GET', reverse('request_rental', args=[game_id]))
+    client.request('request_rental', 'POST', reverse('request_rental', args=[game_id]), {'rental_days': rental_days}, expect=302)
+
+    # Looked up directly: the pages only show it among everything else
+    rental_id = Rental.objects.filter(
+        user_id=student_id, game_id=game_id, status='pending',
+    ).values_list('id', flat=True).first()
+    if rental_id is None:
+        raise JourneyError('request_rental', "no pending rental was created")
+
+    owner.request('approve_rental', 'GET', reverse('update_rental_status', args=[rental_id, 'approved']), expect=302)
+    if not Rental.objects.filter(id=rental_id, status='approved').exists():
+        raise JourneyError('approve_rental', "the rental was not approved")
+
+    page = client.request('pay_form', 'GET', reverse('pay_rental', args=[rental_id]))
+    key = IDEMPOTENCY_KEY.search(page)
+    if key is None:
+        raise JourneyError('pay_form', "no idempotency key in the payment form")
+    client.request(
+        'pay_rental', 'POST', reverse('pay_rental', args=[rental_id]),
+        {'payment_method': 'UPI', 'idempotency_key': key.group(1)}, expect=302,
+    )
+    if not Rental.objects.filter(id=rental_id, payment_status='paid').exists():
+        raise JourneyError('pay_rental', "the rental was not paid")
+
+
+def worker(port, database, journeys, games, barrier, results):
+    """
+    A client process: run journeys off the shared ``journeys`` queue until
+    it hands out ``None``, once every client is ready; report the timings.
+    """
+    setup_django(database)
+    from django.db import connection
+
+    timings, failures, completed = [], {}, 0
+    owners = {}
+    barrier.wait(timeout=STARTUP_TIMEOUT)
+    try:
+        while True:
+            journey = journeys.get()
+            if journey is None:
+                break
+            index, student = journey
+            game_id, owner_name = games[index % len(games)]
+            if owner_name not in owners:
+                # Logs in once per process; its login is not part of the journey
+                owners[owner_name] = Client(port, [])
+                owners[owner_name].log_in(owner_name)
+            # Every journey is a new visitor, as far as cookies go
+            client = Client(port, timings)
+            owner = owners[owner_name]
+            owner.timings = timings
+            try:
+                run_journey(client, owner, student, game_id, rental_days=1 + index % 7)
+                completed += 1
+            except JourneyError as exc:
+                failures[str(exc)] = failures.get(str(exc), 0) + 1
+            finally:
+                owner.timings = []
+                client.close()
+    finally:
+        for owner in owners.values():
+            owner.close()
+        connection.close()
+        results.put((timings, failures, completed))
+
+
+def run(port, database, students, games, users):
+    """Run one journey per student over ``users`` client processes; returns ``(results, seconds)``."""
+    context = multiprocessing.get_context('spawn')
+    journeys, results = context.Queue(), context.Queue()
+    for journey in enumerate(students):
+        journeys.put(journey)
+    for _ in range(users):
+        journeys.put(None)
+    barrier = context.Barrier(users + 1)
+    processes = [
+        context.Process(target=worker, args=(port, database, journeys, games, barrier, results))
+        for _ in range(users)
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait(timeout=STARTUP_TIMEOUT)
+    start = time.perf_counter()
+    collected = [results.get() for _ in processes]
+    seconds = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return collected, seconds
+
+
+# ---- Results ----
+
+def percentile(ordered, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def summarize(results, seconds):
+    durations = {step: [] for step in STEPS}
+    errors = dict.fromkeys(STEPS, 0)
+    failures, completed = {}, 0
+    for timings, worker_failures, worker_completed in results:
+        for step, elapsed, ok in timings:
+            durations[step].append(elapsed)
+            if not ok:
+                errors[step] += 1
+        for message, count in worker_failures.items():
+            failures[message] = failures.get(message, 0) + count
+        completed += worker_completed
+
+    steps = {}
+    for step in STEPS:
+        ordered = sorted(durations[step])
+        stats = {
+            'requests': len(ordered),
+            'errors': errors[step],
+            'per_second': round(len(ordered) / seconds, 2),
+            'mean_ms': round(1000 * sum(ordered) / len(ordered), 2) if ordered else None,
+        }
+        for pct in PERCENTILES:
+            value = percentile(ordered, pct)
+            stats[f'p{pct}_ms'] = round(1000 * value, 2) if value is not None else None
+        stats['max_ms'] = round(1000 * ordered[-1], 2) if ordered else None
+        steps[step] = stats
+
+    requests = sum(stats['requests'] for stats in steps.values())
+    return {
+        'duration_seconds': round(seconds, 2),
+        'journeys': {
+            'completed': completed,
+            'failed': sum(failures.values()),
+            'per_second': round(completed / seconds, 2),
+        },
+        'requests': {'total': requests, 'per_second': round(requests / seconds, 2)},
+        'steps': steps,
+        'failures': dict(sorted(failures.items(), key=lambda item: -item[1])),
+    }
+
+
+def compare(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """``(step, baseline p95, current p95)`` for every step that got slower than allowed."""
+    regressions = []
+    for step, stats in current['steps'].items():
+        before = baseline['steps'].get(step, {}).get('p95_ms')
+        after = stats['p95_ms']
+        if before is None or after is None:
+            continue
+        if after > before * (1 + tolerance) and after - before >= MIN_REGRESSION_MS:
+            regressions.append((step, before, after))
+    return regressions
+
+
+def print_report(report, out=sys.stdout):
+    journeys, requests = report['journeys'], report['requests']
+    out.write(
+        f"{journeys['completed']} journeys ({journeys['failed']} failed) in {report['duration_seconds']}s: "
+        f"{journeys['per_second']} journeys/s, {requests['per_second']} requests/s\n\n"
+    )
+    out.write(f"{'step':<16}{'requests':>9}{'errors':>8}{'req/s':>9}{'mean ms':>10}"
+              + ''.join(f"{f'p{pct} ms':>10}" for pct in PERCENTILES) + f"{'max ms':>10}\n")
+    for step, stats in report['steps'].items():
+        values = [stats['mean_ms']] + [stats[f'p{pct}_ms'] for pct in PERCENTILES] + [stats['max_ms']]
+        out.write(
+            f"{step:<16}{stats['requests']:>9}{stats['errors']:>8}{stats['per_second']:>9}"
+            + ''.join(f"{'-' if value is None else value:>10}" for value in values) + "\n"
+        )
+    for message, count in list(report['failures'].items())[:10]:
+        out.write(f"  failed {count}x: {message}\n")
+    for message, count in list(report.get('server_errors', {}).items())[:10]:
+        out.write(f"  server error {count}x: {message}\n")
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--users', type=int, default=8, help="Simulated users running journeys at once.")
+    parser.add_argument('--journeys', type=int, default=200, help="Journeys to time, over all users.")
+    parser.add_argument('--database', type=Path, help="Existing SQLite file to run against, instead of a fresh one.")
+    parser.add_argument(
+        '--background-rentals', type=int, default=20000,
+        help="Rentals seeded into a fresh database before the run (ignored with --database).",
+    )
+    parser.add_argument('--output', type=Path, help="Where to save the JSON results (default: benchmarks/results/).")
+    parser.add_argument('--compare', type=Path, help="Earlier results to check this run against.")
+    parser.add_argument(
+        '--tolerance', type=float, default=DEFAULT_TOLERANCE,
+        help="Allowed p95 slowdown per step for --compare, as a fraction.",
+    )
+    options = parser.parse_args(argv)
+    if options.users < 1 or options.journeys < 1:
+        parser.error("--users and --journeys must be at least 1.")
+    baseline = json.loads(options.compare.read_text()) if options.compare else None
+
+    with tempfile.TemporaryDirectory(prefix='gamehub-bench-') as scratch:
+        fresh = options.database is None
+        database = Path(scratch) / 'db.sqlite3' if fresh else options.database.resolve()
+        application = setup_django(database)
+        print(f"Seeding {'a fresh database' if fresh else database}...", file=sys.stderr)
+        students, games = seed(options, fresh)
+
+        server_errors = ServerErrors()
+        logging.getLogger('django.request').addHandler(server_errors)
+        server = serve(application)
+        port = server.server_address[1]
+        try:
+            run(port, database, students[:WARMUP_JOURNEYS], games, 1)
+            server_errors.counts.clear()
+            results, seconds = run(port, database, students[WARMUP_JOURNEYS:], games, options.users)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    report = {
+        'benchmark': 'journeys',
+        'started_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'config': {
+            'users': options.users,
+            'journeys': options.journeys,
+            'database': 'fresh' if fresh else str(database),
+            'background_rentals': options.background_rentals if fresh else None,
+        },
+        **summarize(results, seconds),
+        'server_errors': dict(sorted(server_errors.counts.items(), key=lambda item: -item[1])),
+    }
+    print_report(report)
+
+    output = options.output or RESULTS_DIR / f"journeys-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nSaved {output}")
+
+    status = 0
+    if report['journeys']['failed']:
+        status = 1
+    if baseline is not None:
+        regressions = compare(baseline, report, options.tolerance)
+        for step, before, after in regressions:
+            print(f"REGRESSION {step}: p95 {before} ms -> {after} ms")
+        if regressions:
+            status = 1
+        else:
+            print(f"No step's p95 grew more than {options.tolerance:.0%} over {options.compare}.")
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+"""
+Read and write concurrency on SQLite, with and without the production profile.
+
+Runs the same workload twice on copies of one seeded database: once with
+Django's bare SQLite defaults (rollback journal, deferred transactions, a
+5 s busy timeout) and once with the ``OPTIONS`` in settings.DATABASES
+(see ``SQLITE_PRAGMAS``). Each run starts ``--readers`` and ``--writers``
+processes, like gunicorn workers, for ``--seconds``:
+
+* writers file rental requests, approve them (one by one or through the
+  dashboard's bulk approval) and pay for them through the same code as the
+  views (``rentals.services``), one timed write each;
+* readers run the queries behind my_rentals, the catalog, the owner
+  dashboard and the availability calendar.
+
+It prints operations per second, p50/p95/p99 latency and errors ("database
+is locked" among them) per profile and saves them as JSON:
+
+    python -m benchmarks.sqlite_profile --readers 4 --writers 4 --seconds 10
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from .journeys import PERCENTILES, RESULTS_DIR, git_commit, percentile
+
+# Django's SQLite defaults, for comparison
+BARE_OPTIONS = {}
+
+# Seconds the workers get to connect before the clock starts
+STARTUP_TIMEOUT = 120
+
+
+def configure(database, options):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'campus_gamehub.settings')
+    import django
+    from django.conf import settings
+
+    settings.DATABASES['default']['NAME'] = str(database)
+    settings.DATABASES['default']['OPTIONS'] = options
+    settings.DEBUG = False
+    django.setup()
+
+
+def production_options():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'campus_gamehub.settings')
+    from django.conf import settings
+
+    return dict(settings.DATABASES['default']['OPTIONS'])
+
+
+def seed(database, rentals):
+    """Fill ``database``; returns the ids the workers pick from."""
+    configure(database, BARE_OPTIONS)
+    from django.core.management import call_command
+    from django.db import connection
+    from django.db.models import F
+    from django.utils import timezone
+
+    from games.models import Game, bump_catalog_version
+    from users.models import CustomUser
+
+    call_command('migrate', verbosity=0)
+    call_command('seed_gamehub', prefix='load', rentals=rentals, stdout=io.StringIO())
+    # Plenty of copies, so approvals measure locking rather than run out
+    Game.objects.update(
+        total_copies=F('total_copies') + 100000,
+        available_copies=F('available_copies') + 100000,
+        updated_at=timezone.now(),
+    )
+    bump_catalog_version()
+    ids = {
+        'students': list(CustomUser.objects.filter(role='student').values_list('id', flat=True)),
+        'games': list(Game.objects.values_list('id', 'added_by_id')),
+    }
+    connection.close()
+    return ids
+
+
+# ---- Workers ----
+
+def _writes(ids, rng):
+    """
+    A write operation: each call moves a rental one step through its life
+    as the views drive it, from request to approval to payment.
+    """
+    from django.db import transaction
+    from django.utils import timezone
+
+    from games.models import Game
+    from rentals.models import Rental
+    from rentals.pricing import quote
+    from rentals.reservations import period_for
+    from rentals.services import approve_rental, bulk_set_status, record_payment
+    from rentals.stats import record_change, state_of
+    from users.models import CustomUser
+
+    users = CustomUser.objects.in_bulk(ids['students'] + [owner_id for _, owner_id in ids['games']])
+    prices = dict(Game.objects.values_list('id', 'price_per_day'))
+    # The rental in progress; a failed step drops it and the next call starts a new one
+    current = {}
+
+    def write():
+        if 'approved' in current:
+            record_payment(current.pop('approved'), current['user'], uuid.uuid4().hex, 'UPI')
+        elif 'requested' in current:
+            rental = current.pop('requested')
+            if rental.pk % 2:
+                current['approved'] = approve_rental(rental.pk, current['owner'])
+            else:
+                # The dashboard's bulk approval, which reads before it writes
+                if bulk_set_status(current['owner'], [rental.pk], 'approved')[rental.pk]['ok']:
+                    current['approved'] = Rental.objects.get(pk=rental.pk)
+        else:
+            game_id, owner_id = rng.choice(ids['games'])
+            user = users[rng.choice(ids['students'])]
+            rental_days = rng.randint(1, 7)
+            start, end = period_for(timezone.localdate(), rental_days)
+            with transaction.atomic():
+                rental = Rental.objects.create(
+                    user=user, game_id=game_id, rental_days=rental_days, cost=quote(prices[game_id], rental_days),
+                    start_date=start, end_date=end,
+                )
+                record_change(rental, None, state_of(rental))
+            current.update(requested=rental, user=user, owner=users[owner_id])
+
+    return write
+
+
+def _reads(ids, rng):
+    """A read operation: one of the queries behind the busiest pages."""
+    from django.utils import timezone
+
+    from games.models import Game
+    from rentals.models import Rental
+    from rentals.reservations import daily_load
+
+    def my_rentals():
+        return list(Rental.objects.filter(user_id=rng.choice(ids['students'])).select_related('game')[:50])
+
+    def catalog():
+        return list(Game.objects.select_related('added_by').order_by('-id')[:24])
+
+    def owner_dashboard():
+        _, owner_id = rng.choice(ids['games'])
+        return Rental.objects.filter(game__added_by_id=owner_id, status='pending').count()
+
+    def calendar():
+        game_id, _ = rng.choice(ids['games'])
+        today = timezone.localdate()
+        return daily_load([game_id], today, today + timedelta(days=31))
+
+    queries = (my_rentals, catalog, owner_dashboard, calendar)
+    return lambda: rng.choice(queries)()
+
+
+def worker(role, index, database, options, ids, seconds, barrier, results):
+    """Run ``role`` operations for ``seconds`` once every worker is ready; report their timings."""
+    configure(database, options)
+    from django.db import connection
+
+    rng = random.Random(f'{role}-{index}')
+    if role == 'write':
+        # Each writer files requests for its own students
+        operation = _writes({**ids, 'students': ids['students'][index::ids['writers']]}, rng)
+    else:
+        operation = _reads(ids, rng)
+    barrier.wait(timeout=STARTUP_TIMEOUT)
+
+    timings, errors = [], {}
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            operation()
+        except Exception as exc:
+            message = f"{type(exc).__name__}: {exc}"
+            errors[message] = errors.get(message, 0) + 1
+        else:
+            timings.append(time.perf_counter() - start)
+    connection.close()
+    results.put((role, timings, errors))
+
+
+def run_profile(name, options, template, scratch, ids, args):
+    database = Path(scratch) / f'{name}.sqlite3'
+    shutil.copy(template, database)
+    with closing(sqlite3.connect(database)) as db:
+        # journal_mode lives in the file: set it up as the profile's first connection would
+        db.executescript(options.get('init_command', '') or 'PRAGMA journal_mode = DELETE')
+
+    context = multiprocessing.get_context('spawn')
+    barrier = context.Barrier(args.readers + args.writers + 1)
+    results = context.Queue()
+    ids = {**ids, 'writers': args.writers}
+    processes = [
+        context.Process(target=worker, args=(role, index, database, options, ids, args.seconds, barrier, results))
+        for role, count in (('read', args.readers), ('write', args.writers))
+        for index in range(count)
+    ]
+    for process in processes:
+        process.start()
+    barrier.wait(timeout=STARTUP_TIMEOUT)
+    start = time.perf_counter()
+    collected = [results.get(timeout=args.seconds + STARTUP_TIMEOUT) for _ in processes]
+    elapsed = time.perf_counter() - start
+    for process in processes:
+        process.join()
+    return summarize(collected, elapsed)
+
+
+def summarize(collected, seconds):
+    report = {'duration_seconds': round(seconds, 2)}
+    for role in ('read', 'write'):
+        timings = sorted(t for worker_role, worker_timings, _ in collected if worker_role == role for t in worker_timings)
+        errors = {}
+        for worker_role, _, worker_errors in collected:
+            if worker_role == role:
+                for message, count in worker_errors.items():
+                    errors[message] = errors.get(message, 0) + count
+        stats = {
+            'operations': len(timings),
+            'per_second': round(len(timings) / seconds, 1),
+            'errors': sum(errors.values()),
+        }
+        for pct in PERCENTILES:
+            value = percentile(timings, pct)
+            stats[f'p{pct}_ms'] = round(1000 * value, 2) if value is not None else None
+        stats['error_messages'] = dict(sorted(errors.items(), key=lambda item: -item[1]))
+        report[f'{role}s'] = stats
+    return report
+
+
+def print_report(profiles, out=sys.stdout):
+    header = f"{'profile':<12}{'kind':<8}{'ops':>8}{'ops/s':>9}{'errors':>8}" + ''.join(
+        f"{f'p{pct} ms':>10}" for pct in PERCENTILES
+    )
+    out.write(header + "\n")
+    for name, report in profiles.items():
+        for kind in ('reads', 'writes'):
+            stats = report[kind]
+            out.write(
+                f"{name:<12}{kind:<8}{stats['operations']:>8}{stats['per_second']:>9}{stats['errors']:>8}"
+                + ''.join(f"{'-' if stats[f'p{pct}_ms'] is None else stats[f'p{pct}_ms']:>10}" for pct in PERCENTILES)
+                + "\n"
+            )
+            for message, count in list(stats['error_messages'].items())[:3]:
+                out.write(f"    {count}x {message}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--readers', type=int, default=4, help="Reading processes.")
+    parser.add_argument('--writers', type=int, default=4, help="Writing processes.")
+    parser.add_argument('--seconds', type=float, default=10, help="How long each profile runs.")
+    parser.add_argument('--rentals', type=int, default=50000, help="Rentals seeded before the runs.")
+    parser.add_argument('--output', type=Path, help="Where to save the JSON results (default: benchmarks/results/).")
+    args = parser.parse_args(argv)
+    if args.readers < 0 or args.writers < 0 or args.readers + args.writers < 1:
+        parser.error("Run at least one reader or writer.")
+
+    profiles = {'default': BARE_OPTIONS, 'production': production_options()}
+    with tempfile.TemporaryDirectory(prefix='gamehub-sqlite-') as scratch:
+        template = Path(scratch) / 'seeded.sqlite3'
+        print(f"Seeding {args.rentals} rentals...", file=sys.stderr)
+        ids = seed(template, args.rentals)
+        results = {}
+        for name, options in profiles.items():
+            print(f"Running {name} for {args.seconds}s...", file=sys.stderr)
+            results[name] = run_profile(name, options, template, scratch, ids, args)
+
+    report = {
+        'benchmark': 'sqlite_profile',
+        'started_at': datetime.now(dt_timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'config': {
+            'readers': args.readers,
+            'writers': args.writers,
+            'seconds': args.seconds,
+            'rentals': args.rentals,
+            'options': {name: options for name, options in profiles.items()},
+        },
+        'profiles': results,
+    }
+    print_report(results)
+    output = args.output or RESULTS_DIR / f"sqlite-profile-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nSaved {output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
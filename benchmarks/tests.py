@@ -0,0 +1,57 @@
+from django.test import SimpleTestCase
+
+from .journeys import STEPS, compare, percentile, summarize
+from .sqlite_profile import summarize as summarize_profile
+
+
+class JourneyReportTests(SimpleTestCase):
+
+    def test_percentile_is_nearest_rank(self):
+        ordered = list(range(1, 101))
+        self.assertEqual(percentile(ordered, 50), 50)
+        self.assertEqual(percentile(ordered, 99), 99)
+        self.assertEqual(percentile([7], 95), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize_merges_workers(self):
+        results = [
+            ([('login', 0.010, True), ('game_list', 0.020, True)], {}, 1),
+            ([('login', 0.030, True), ('game_list', 0.040, False)], {'game_list: HTTP 500, expected 200': 1}, 0),
+        ]
+        report = summarize(results, seconds=2.0)
+
+        self.assertEqual(set(report['steps']), set(STEPS))
+        self.assertEqual(report['journeys'], {'completed': 1, 'failed': 1, 'per_second': 0.5})
+        self.assertEqual(report['requests'], {'total': 4, 'per_second': 2.0})
+        login = report['steps']['login']
+        self.assertEqual((login['requests'], login['errors'], login['p50_ms'], login['max_ms']), (2, 0, 10.0, 30.0))
+        self.assertEqual(report['steps']['game_list']['errors'], 1)
+        self.assertEqual(report['steps']['pay_rental']['requests'], 0)
+        self.assertIsNone(report['steps']['pay_rental']['p95_ms'])
+
+    def test_compare_flags_slower_p95_only(self):
+        baseline = {'steps': {'login': {'p95_ms': 100.0}, 'game_list': {'p95_ms': 5.0}, 'pay_rental': {'p95_ms': 50.0}}}
+        current = {'steps': {
+            'login': {'p95_ms': 130.0},       # 30% slower
+            'game_list': {'p95_ms': 6.5},     # 30% slower, but under 2 ms
+            'pay_rental': {'p95_ms': 55.0},   # within tolerance
+            'game_detail': {'p95_ms': 80.0},  # not in the baseline
+        }}
+        self.assertEqual(compare(baseline, current, tolerance=0.2), [('login', 100.0, 130.0)])
+
+
+class SQLiteProfileReportTests(SimpleTestCase):
+
+    def test_summarize_splits_reads_and_writes(self):
+        collected = [
+            ('read', [0.001, 0.003], {}),
+            ('write', [0.010], {'OperationalError: database is locked': 2}),
+            ('write', [0.030], {'OperationalError: database is locked': 1}),
+        ]
+        report = summarize_profile(collected, seconds=2.0)
+
+        self.assertEqual(report['reads']['operations'], 2)
+        self.assertEqual(report['reads']['errors'], 0)
+        self.assertEqual(report['writes']['per_second'], 1.0)
+        self.assertEqual(report['writes']['error_messages'], {'OperationalError: database is locked': 3})
+        self.assertEqual((report['writes']['p50_ms'], report['writes']['p99_ms']), (10.0, 30.0))
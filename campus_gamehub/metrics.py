@@ -0,0 +1,266 @@
+"""
+Per-route request metrics, exposed in the Prometheus text format.
+
+``MetricsMiddleware`` times every request and, through a database execute
+wrapper and the ``TimedDjangoTemplates`` template backend, the queries it
+ran and the time spent rendering templates. Results are keyed by the
+resolved URL name (``unmatched`` for 404s) and HTTP method. Streaming
+responses are recorded when the server closes them, so their time and
+queries include producing the body.
+
+Counters live in per-thread shards: a request only touches its own
+thread's dicts, so recording takes no lock (one is taken once per thread,
+to register its shard). ``MetricsRegistry.render`` sums the shards when
+``/metrics`` is scraped. Numbers are per process.
+"""
+import threading
+from bisect import bisect_left
+from time import perf_counter
+
+from django.db import connection
+from django.template.backends.django import DjangoTemplates
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_local = threading.local()
+
+
+class _RequestState:
+    """What the request running on this thread has done so far."""
+    __slots__ = ('queries', 'db_seconds', 'template_seconds', 'template_depth')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+
+
+def _time_query(execute, sql, params, many, context):
+    state = getattr(_local, 'current', None)
+    if state is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state.db_seconds += perf_counter() - start
+        state.queries += 1
+
+
+class _RouteStats:
+    __slots__ = ('statuses', 'buckets', 'count', 'seconds', 'queries', 'db_seconds', 'template_seconds')
+
+    def __init__(self, bucket_count):
+        self.statuses = {}
+        # One slot per bucket plus +Inf; not cumulative until rendered
+        self.buckets = [0] * (bucket_count + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+    def merge(self, other):
+        for status, count in other.statuses.copy().items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.seconds += other.seconds
+        self.queries += other.queries
+        self.db_seconds += other.db_seconds
+        self.template_seconds += other.template_seconds
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._local = threading.local()
+        self._shards = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            return shard
+
+    def observe(self, route, method, status, seconds, queries=0, db_seconds=0.0, template_seconds=0.0):
+        shard = self._shard()
+        stats = shard.get((route, method))
+        if stats is None:
+            stats = shard[route, method] = _RouteStats(len(self.buckets))
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.buckets[bisect_left(self.buckets, seconds)] += 1
+        stats.count += 1
+        stats.seconds += seconds
+        stats.queries += queries
+        stats.db_seconds += db_seconds
+        stats.template_seconds += template_seconds
+
+    def snapshot(self):
+        """``{(route, method): _RouteStats}`` summed over every thread."""
+        with self._shards_lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            for key, stats in shard.copy().items():
+                if key not in totals:
+                    totals[key] = _RouteStats(len(self.buckets))
+                totals[key].merge(stats)
+        return totals
+
+    def reset(self):
+        with self._shards_lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def render(self, extra=()):
+        """
+        The metrics in the Prometheus text exposition format. ``extra`` adds
+        ``(name, type, help, value)`` samples without labels.
+        """
+        snapshot = sorted(self.snapshot().items())
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        family('gamehub_requests_total', 'counter', "Requests by route, method and status.")
+        for (route, method), stats in snapshot:
+            for status, count in sorted(stats.statuses.items()):
+                lines.append(
+                    f'gamehub_requests_total{{{_labels(route, method)},status="{status}"}} {count}'
+                )
+
+        family('gamehub_request_duration_seconds', 'histogram', "Time to produce the response.")
+        for (route, method), stats in snapshot:
+            labels = _labels(route, method)
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), stats.buckets):
+                cumulative += count
+                lines.append(f'gamehub_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'gamehub_request_duration_seconds_sum{{{labels}}} {stats.seconds:.6f}')
+            lines.append(f'gamehub_request_duration_seconds_count{{{labels}}} {stats.count}')
+
+        for name, help_text, attribute, fmt in (
+            ('gamehub_db_queries_total', "Database queries run.", 'queries', '{}'),
+            ('gamehub_db_query_seconds_total', "Time spent in database queries.", 'db_seconds', '{:.6f}'),
+            ('gamehub_template_render_seconds_total', "Time spent rendering templates.", 'template_seconds', '{:.6f}'),
+        ):
+            family(name, 'counter', help_text)
+            for (route, method), stats in snapshot:
+                lines.append(f'{name}{{{_labels(route, method)}}} {fmt.format(getattr(stats, attribute))}')
+
+        for name, kind, help_text, value in extra:
+            family(name, kind, help_text)
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(route, method):
+    return f'route="{_escape(route)}",method="{_escape(method)}"'
+
+
+registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Records every request in ``registry``; goes first in MIDDLEWARE."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Installed once per thread's connection: a per-request
+        # connection.execute_wrapper() would cost more than all the rest
+        if not getattr(_local, 'wrapped', False):
+            if _time_query not in connection.execute_wrappers:
+                connection.execute_wrappers.insert(0, _time_query)
+            _local.wrapped = True
+
+        state = _local.current = _RequestState()
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _local.current = None
+
+        if response.streaming and not response.is_async:
+            # The body, and its queries, come after we return: time each
+            # chunk and record the request when the server closes it
+            response.streaming_content = _timed_stream(response.streaming_content, state)
+            response._resource_closers.append(lambda: _observe(request, response, state, start))
+        else:
+            _observe(request, response, state, start)
+        return response
+
+
+def _observe(request, response, state, start):
+    match = request.resolver_match
+    registry.observe(
+        match.view_name if match else 'unmatched',
+        request.method,
+        response.status_code,
+        perf_counter() - start,
+        state.queries,
+        state.db_seconds,
+        state.template_seconds,
+    )
+
+
+def _timed_stream(content, state):
+    """Yield from ``content`` with ``state`` current while each chunk is produced."""
+    chunks = iter(content)
+    while True:
+        _local.current = state
+        try:
+            chunk = next(chunks)
+        except StopIteration:
+            return
+        finally:
+            _local.current = None
+        yield chunk
+
+
+class _TimedTemplate:
+    """Wraps a backend template to add its render time to the current request."""
+    __slots__ = ('_template',)
+
+    def __init__(self, template):
+        self._template = template
+
+    def __getattr__(self, name):
+        return getattr(self._template, name)
+
+    def render(self, context=None, request=None):
+        state = getattr(_local, 'current', None)
+        # Templates rendered while rendering another one are already timed
+        if state is None or state.template_depth:
+            return self._template.render(context, request)
+        state.template_depth += 1
+        start = perf_counter()
+        try:
+            return self._template.render(context, request)
+        finally:
+            state.template_seconds += perf_counter() - start
+            state.template_depth -= 1
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, with render times recorded for metrics."""
+
+    def from_string(self, template_code):
+        return _TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return _TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,165 @@
+"""
+Keyset (cursor) pagination shared by the list views.
+
+Pages are fetched with ``WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n`` style
+queries instead of OFFSET, so page 1000 costs the same as page 1 as long as
+the ordering columns are indexed. Cursors are opaque url-safe tokens that
+carry the ordering values of the boundary row and the paging direction.
+"""
+import base64
+import binascii
+import datetime
+import json
+from functools import reduce
+from operator import or_
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """
+    DjangoJSONEncoder keeps only milliseconds of a datetime; a cursor needs
+    all of it, or rows within the boundary row's millisecond are skipped.
+    """
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps({'d': direction, 'k': list(values)}, cls=_CursorEncoder)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, model, fields):
+    """Return ``(direction, values)`` with values converted back to python."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        direction, raw_values = payload['d'], payload['k']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor("Malformed cursor.")
+
+    if direction not in ('next', 'prev') or len(raw_values) != len(fields):
+        raise InvalidCursor("Malformed cursor.")
+
+    try:
+        values = [
+            model._meta.get_field(name).to_python(value)
+            for name, value in zip(fields, raw_values)
+        ]
+    except ValidationError:
+        raise InvalidCursor("Malformed cursor.")
+    return direction, values
+
+
+def page_size_from_request(request, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def _keyset_filter(fields, values, after):
+    # (a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+    lookup = 'gt' if after else 'lt'
+    clauses = []
+    for i, name in enumerate(fields):
+        equal = {field: value for field, value in zip(fields[:i], values[:i])}
+        clauses.append(Q(**equal, **{f'{name}__{lookup}': values[i]}))
+    return reduce(or_, clauses)
+
+
+def _row_values(row, fields):
+    if isinstance(row, dict):
+        return [row[name] for name in fields]
+    return [getattr(row, name) for name in fields]
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, prev_cursor, page_size):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.page_size = page_size
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def url_for(self, request, cursor):
+        """Current URL with ``cursor`` swapped in, keeping the other filters."""
+        params = request.GET.copy()
+        params['cursor'] = cursor
+        return f"{request.path}?{params.urlencode()}"
+
+    def next_url(self, request):
+        return self.url_for(request, self.next_cursor) if self.has_next else None
+
+    def previous_url(self, request):
+        return self.url_for(request, self.prev_cursor) if self.has_previous else None
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    Return one ``KeysetPage`` of ``queryset`` ordered by ``ordering``.
+
+    ``ordering`` must end in a unique column (normally ``id``) and all of its
+    fields must share one direction, e.g. ``['title', 'id']`` or
+    ``['-requested_at', '-id']``. Raises ``InvalidCursor`` for bad tokens.
+    """
+    descending = ordering[0].startswith('-')
+    if any(name.startswith('-') != descending for name in ordering):
+        raise ValueError("Keyset ordering fields must share one direction.")
+    fields = [name.lstrip('-') for name in ordering]
+
+    direction, values = 'next', None
+    if cursor:
+        direction, values = decode_cursor(cursor, queryset.model, fields)
+    backwards = direction == 'prev'
+
+    if values is not None:
+        queryset = queryset.filter(_keyset_filter(fields, values, after=(descending == backwards)))
+
+    if backwards:
+        order_by = [name if descending else f'-{name}' for name in fields]
+    else:
+        order_by = list(ordering)
+
+    rows = list(queryset.order_by(*order_by)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+
+    has_next = (values is not None) if backwards else has_more
+    has_prev = has_more if backwards else (values is not None)
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor('next', _row_values(rows[-1], fields))
+    if rows and has_prev:
+        prev_cursor = encode_cursor('prev', _row_values(rows[0], fields))
+    return KeysetPage(rows, next_cursor, prev_cursor, page_size)
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its timings cover the rest of the stack
+    'campus_gamehub.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,7 +62,8 @@ import os
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates plus render timing for /metrics
+        'BACKEND': 'campus_gamehub.metrics.TimedDjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -94,14 +97,54 @@ WSGI_APPLICATION = 'campus_gamehub.wsgi.application'
 #     }
 # }
 
+# SQLite for several concurrent workers: every new connection runs these
+# pragmas. journal_mode is stored in the database file, the rest are per
+# connection. `python -m benchmarks.sqlite_profile` measures the difference.
+SQLITE_PRAGMAS = {
+    # Readers no longer wait for the writer, nor the writer for readers
+    'journal_mode': 'WAL',
+    # With WAL, fsync at checkpoints only: a power cut can lose the last
+    # commits but not corrupt the file
+    'synchronous': 'NORMAL',
+    # Milliseconds to wait for the write lock before "database is locked"
+    'busy_timeout': 20000,
+    # Read the file through a memory map, in bytes
+    'mmap_size': 256 * 1024 * 1024,
+    # Page cache per connection; negative means KiB
+    'cache_size': -64 * 1024,
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name} = {value}' for name, value in SQLITE_PRAGMAS.items()),
+            # Transactions take the write lock at BEGIN. Otherwise one that
+            # reads and then writes fails with "database is locked" at once
+            # when another got the lock first, without waiting busy_timeout.
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Reuse connections across requests, and so their page cache
+        'CONN_MAX_AGE': 60,
     }
 }
 
 
+# Rental rates (see rentals.pricing). A full week costs this many days'
+# price; with 7, weeks cost the same as any other days.
+RENTAL_WEEK_PRICE_DAYS = 7
+# (minimum rental days, multiplier on the daily price of the days left
+# over after full weeks), as strings for Decimal
+RENTAL_DAY_TIERS = (
+    (1, '1.00'),
+)
+
+
+# Scrapers read /metrics with "Authorization: Bearer <token>"; super admins
+# can always read it. Empty turns token access off. Don't trust the client
+# address instead: behind a reverse proxy every request comes from it.
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
 
 
 # Password validation
@@ -0,0 +1,243 @@
+"""
+Test helpers: realistic seed data and per-view query budgets.
+
+``seed_data`` adds a batch of users, games, rentals in every status,
+payments and waitlists; calling it again grows the data set.
+``QueryBudgetMixin.assertQueryBudget`` fails when a block runs more queries
+than its budget and lists the SQL it ran, so an N+1 regression shows up
+with the query that repeats; ``assertViewBudget`` checks a view against
+the test case's ``query_budgets`` as the data grows.
+"""
+import datetime
+import functools
+import itertools
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from games.models import Game, bump_catalog_version
+from rentals.models import Payment, Rental, Waitlist, WaitlistEntry
+from rentals.pricing import quote
+from rentals.stats import rebuild_stats
+
+User = get_user_model()
+
+_batches = itertools.count()
+
+SEED_PASSWORD = 'pass12345'
+
+# status, payment status, days since the request
+RENTAL_MIX = [
+    ('pending', 'pending', 0),
+    ('approved', 'pending', 1),
+    ('approved', 'paid', 2),
+    ('reserved', 'pending', 0),
+    ('overdue', 'pending', 20),
+    ('returned', 'paid', 40),
+    ('denied', 'pending', 5),
+]
+
+
+@functools.cache
+def _password_hash():
+    # Hashing is slow on purpose; every seeded user shares one hash
+    return make_password(SEED_PASSWORD)
+
+
+def seed_data(students=6, owners=2, games_per_owner=4, existing=None):
+    """
+    Add one batch of users and rental history; returns the batch as
+    ``{"super_admin", "owners", "students", "games", "rentals"}``. Every
+    student rents every game of the batch once, cycling through
+    ``RENTAL_MIX``. Pass an earlier batch as ``existing`` to grow it: its
+    owners get new games too and its students rent them as well.
+    """
+    batch = next(_batches)
+    password = _password_hash()
+    now = timezone.now()
+    today = timezone.localdate(now)
+
+    def users(role, count):
+        return User.objects.bulk_create([
+            User(username=f'{role}-{batch}-{i}', email=f'{role}-{batch}-{i}@example.com', password=password, role=role)
+            for i in range(count)
+        ])
+
+    super_admin, = users('super_admin', 1)
+    owner_users = users('student_admin', owners)
+    student_users = users('student', students)
+    if existing is not None:
+        owner_users = existing['owners'] + owner_users
+        student_users = existing['students'] + student_users
+
+    games = Game.objects.bulk_create([
+        Game(
+            title=f'Game {batch}-{o}-{g}',
+            description='A game.',
+            price_per_day=Decimal('20.00') + g,
+            total_copies=len(student_users) + 1,
+            available_copies=len(student_users) + 1,
+            added_by=owner,
+        )
+        for o, owner in enumerate(owner_users)
+        for g in range(games_per_owner)
+    ])
+
+    rentals = []
+    mix = itertools.cycle(RENTAL_MIX)
+    for game in games:
+        for student in student_users:
+            status, payment_status, age = next(mix)
+            requested_at = now - datetime.timedelta(days=age)
+            start = today + datetime.timedelta(days=3) if status == 'reserved' else timezone.localdate(requested_at)
+            rental = Rental(
+                user=student,
+                game=game,
+                status=status,
+                rental_days=3,
+                cost=quote(game.price_per_day, 3),
+                requested_at=requested_at,
+                start_date=start,
+                end_date=start + datetime.timedelta(days=3),
+                payment_status=payment_status,
+            )
+            if status not in ('pending', 'denied'):
+                rental.approved_at = requested_at
+                rental.approved_by = game.added_by
+            if status in ('approved', 'overdue', 'returned'):
+                rental.due_at = requested_at + datetime.timedelta(days=3)
+            if status == 'returned':
+                rental.returned_at = rental.due_at
+            if payment_status == 'paid':
+                rental.payment_method = 'upi'
+                rental.payment_date = requested_at
+                rental.transaction_id = f'TXN-SEED-{batch}-{game.pk}-{student.pk}'
+            rentals.append(rental)
+    requested = [rental.requested_at for rental in rentals]
+    rentals = Rental.objects.bulk_create(rentals)
+    # auto_now_add overwrites the value given to bulk_create, on the instances too
+    by_request_time = {}
+    for rental, requested_at in zip(rentals, requested):
+        rental.requested_at = requested_at
+        by_request_time.setdefault(requested_at, []).append(rental.pk)
+    for requested_at, ids in by_request_time.items():
+        Rental.objects.filter(pk__in=ids).update(requested_at=requested_at)
+
+    out = {}
+    for rental in rentals:
+        if rental.status in ('approved', 'overdue'):
+            out[rental.game_id] = out.get(rental.game_id, 0) + 1
+    for game in games:
+        game.available_copies -= out.get(game.pk, 0)
+    Game.objects.bulk_update(games, ['available_copies'])
+    bump_catalog_version()
+
+    Payment.objects.bulk_create([
+        Payment(
+            rental=rental,
+            user=rental.user,
+            idempotency_key=f'seed-{rental.pk}',
+            transaction_id=rental.transaction_id,
+            amount=rental.cost,
+            method=rental.payment_method,
+            created_at=rental.payment_date,
+        )
+        for rental in rentals if rental.payment_status == 'paid'
+    ])
+
+    # Everyone queues for the batch's first game
+    Waitlist.objects.create(
+        game=games[0], length=len(student_users), next_position=len(student_users) + 1, head_user=student_users[0],
+    )
+    WaitlistEntry.objects.bulk_create([
+        WaitlistEntry(game=games[0], user=student, position=position, rental_days=2)
+        for position, student in enumerate(student_users, start=1)
+    ])
+
+    rebuild_stats()
+    cache.clear()
+    return {
+        'super_admin': super_admin,
+        'owners': owner_users,
+        'students': student_users,
+        'games': games,
+        'rentals': rentals,
+    }
+
+
+def _listing(captured):
+    return "\n".join(f"{i}. {query['sql']}" for i, query in enumerate(captured.captured_queries, start=1))
+
+
+class QueryBudgetMixin:
+    """
+    Query budget assertions for ``TestCase`` subclasses. ``assertViewBudget``
+    needs ``query_budgets`` (queries per request, by URL name) and adds data
+    between its two requests with ``grow()``, by default another
+    ``seed_data`` batch on top of ``self.data``.
+    """
+    query_budgets = {}
+
+    def grow(self):
+        seed_data(existing=self.data)
+
+    @contextmanager
+    def assertQueryBudget(self, budget, label='', using=DEFAULT_DB_ALIAS):
+        """Fail if the block runs more than ``budget`` queries; yields the captured queries."""
+        with CaptureQueriesContext(connections[using]) as captured:
+            yield captured
+        if len(captured) > budget:
+            self.fail(f"{label or 'Block'} ran {len(captured)} queries, budget is {budget}:\n{_listing(captured)}")
+
+    def assertScalingBudget(self, budget, fetch, grow, label):
+        """
+        Run ``fetch()`` within ``budget``, ``grow()`` the data and run it
+        again: it must stay within budget and run as many queries as before.
+        Returns the two results.
+        """
+        with self.assertQueryBudget(budget, label) as before:
+            first = fetch()
+        grow()
+        with self.assertQueryBudget(budget, f"{label} with more data") as after:
+            second = fetch()
+        if len(after) != len(before):
+            self.fail(f"{label} ran {len(before)} queries, then {len(after)} with more data:\n{_listing(after)}")
+        return first, second
+
+    def assertViewBudget(self, name, user=None, url=None, args=(), query='', method='get', data=None,
+                         status=200, budgets=None):
+        """
+        Request the view ``name`` within its budget (from ``budgets``,
+        default ``query_budgets``), ``grow()`` the data and request it again;
+        returns the two responses. ``url`` defaults to the view's URL with
+        ``args`` and ``query``; ``url`` and ``data`` may be callables,
+        evaluated for each request. A JSON string as ``data`` is posted as
+        the request body.
+        """
+        if user is not None:
+            self.client.force_login(user)
+        budgets = self.query_budgets if budgets is None else budgets
+        if url is None:
+            url = reverse(name, args=args) + query
+
+        def fetch():
+            target = url() if callable(url) else url
+            payload = data() if callable(data) else data
+            if isinstance(payload, str):
+                response = self.client.post(target, payload, content_type='application/json')
+            else:
+                response = getattr(self.client, method)(target, payload)
+            self.assertEqual(response.status_code, status, target)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+
+        label = f"{method.upper()} {name if callable(url) else url}"
+        return self.assertScalingBudget(budgets[name], fetch, self.grow, label)
@@ -0,0 +1,135 @@
+import datetime
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rentals.models import Rental
+from .metrics import MetricsRegistry, registry
+from .pagination import paginate_keyset
+from .testing import seed_data
+
+
+class MetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=2, owners=1, games_per_owner=2)
+
+    def setUp(self):
+        registry.reset()
+
+    def test_records_route_queries_and_template_time(self):
+        self.client.force_login(self.data['students'][0])
+        self.client.get(reverse('student_dashboard'))
+        self.client.get('/no-such-page/')
+
+        stats = registry.snapshot()
+        dashboard = stats['student_dashboard', 'GET']
+        self.assertEqual(dashboard.statuses, {200: 1})
+        self.assertEqual(dashboard.queries, 4)
+        self.assertGreater(dashboard.db_seconds, 0)
+        self.assertGreater(dashboard.template_seconds, 0)
+        self.assertLessEqual(dashboard.template_seconds, dashboard.seconds)
+        self.assertEqual(stats['unmatched', 'GET'].statuses, {404: 1})
+
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = MetricsRegistry(buckets=(0.1, 1.0))
+        for seconds in (0.05, 0.5, 0.5, 3.0):
+            metrics.observe('game_list', 'GET', 200, seconds)
+        text = metrics.render()
+        self.assertIn('gamehub_request_duration_seconds_bucket{route="game_list",method="GET",le="0.1"} 1', text)
+        self.assertIn('gamehub_request_duration_seconds_bucket{route="game_list",method="GET",le="1.0"} 3', text)
+        self.assertIn('gamehub_request_duration_seconds_bucket{route="game_list",method="GET",le="+Inf"} 4', text)
+        self.assertIn('gamehub_request_duration_seconds_count{route="game_list",method="GET"} 4', text)
+        self.assertIn('gamehub_requests_total{route="game_list",method="GET",status="200"} 4', text)
+
+    def test_endpoint_access(self):
+        # Behind a reverse proxy every request comes from the local host
+        local = {'REMOTE_ADDR': '127.0.0.1'}
+        self.assertEqual(self.client.get(reverse('metrics'), **local).status_code, 403)
+        self.client.force_login(self.data['students'][0])
+        self.assertEqual(self.client.get(reverse('metrics'), **local).status_code, 403)
+
+        self.client.force_login(self.data['super_admin'])
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE gamehub_request_duration_seconds histogram', response.content)
+        self.assertIn(b'gamehub_card_cache_hits_total', response.content)
+
+    @override_settings(METRICS_TOKEN='s3cret')
+    def test_scraper_token(self):
+        for header, status in (('Bearer s3cret', 200), ('bearer s3cret', 200), ('Bearer wrong', 403), ('', 403)):
+            with self.subTest(header):
+                response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION=header)
+                self.assertEqual(response.status_code, status)
+
+    def test_no_token_by_default(self):
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+
+    def test_streaming_responses_include_the_body(self):
+        self.client.force_login(self.data['super_admin'])
+        response = self.client.get(reverse('export_rentals') + '?format=csv')
+        self.assertNotIn(('export_rentals', 'GET'), registry.snapshot())
+        rows = b''.join(response.streaming_content).count(b'\n')
+        response.close()
+
+        stats = registry.snapshot()['export_rentals', 'GET']
+        self.assertEqual(stats.count, 1)
+        self.assertGreater(rows, len(self.data['rentals']))
+        # Session, user and the export's own queries
+        self.assertGreaterEqual(stats.queries, 3)
+        self.assertGreater(stats.db_seconds, 0)
+
+
+class SQLiteProfileTests(TestCase):
+
+    def test_connections_run_the_pragmas(self):
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            def pragma(name):
+                return cursor.execute(f'PRAGMA {name}').fetchone()[0]
+
+            # 1 is NORMAL; the in-memory test database keeps its own journal_mode
+            self.assertEqual(pragma('synchronous'), 1)
+            self.assertEqual(pragma('busy_timeout'), 20000)
+            self.assertEqual(pragma('cache_size'), -64 * 1024)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        data = seed_data(students=2, owners=1, games_per_owner=3)
+        cls.ids = sorted((rental.pk for rental in data['rentals']), reverse=True)
+        # Every request within one millisecond, as under load
+        moment = datetime.datetime(2026, 3, 1, 12, 0, 0, 500000, tzinfo=datetime.timezone.utc)
+        for offset, rental_id in enumerate(cls.ids):
+            requested_at = moment + datetime.timedelta(microseconds=offset % 3)
+            Rental.objects.filter(pk=rental_id).update(requested_at=requested_at)
+        cls.ordering = ['-requested_at', '-id']
+
+    def page(self, cursor=None):
+        rentals = Rental.objects.filter(pk__in=self.ids)
+        return paginate_keyset(rentals, self.ordering, cursor=cursor, page_size=2)
+
+    def expected(self):
+        rows = Rental.objects.filter(pk__in=self.ids).order_by(*self.ordering)
+        return list(rows.values_list('id', flat=True))
+
+    def test_next_and_prev_walk_tied_timestamps(self):
+        pages = [self.page()]
+        while pages[-1].has_next:
+            pages.append(self.page(pages[-1].next_cursor))
+        seen = [rental.pk for page in pages for rental in page]
+        self.assertEqual(seen, self.expected())
+
+        back = [pages[-1]]
+        while back[-1].has_previous:
+            back.append(self.page(back[-1].prev_cursor))
+        self.assertEqual(
+            [[rental.pk for rental in page] for page in reversed(back)],
+            [[rental.pk for rental in page] for page in pages],
+        )
@@ -20,6 +20,7 @@ from django.views.generic import TemplateView
 from django.conf import settings
 from django.conf.urls.static import static
 from users.views import login_redirect_view
+from .views import metrics
 
 
 urlpatterns = [
@@ -29,6 +30,7 @@ urlpatterns = [
     path('games/', include('games.urls')),
     path('rentals/', include('rentals.urls')),
     path('dashboard/', login_redirect_view, name='dashboard'),
+    path('metrics', metrics, name='metrics'),
 
 ]
 
@@ -1,4 +1,33 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from games.cards import card_cache_stats
+from .metrics import registry
+
 
 def home(request):
     return render(request, 'home.html')
+
+
+def _is_scraper(request):
+    """Whether the request carries ``settings.METRICS_TOKEN`` as a bearer token."""
+    token = settings.METRICS_TOKEN
+    scheme, _, value = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    return bool(token) and scheme.lower() == 'bearer' and constant_time_compare(value, token)
+
+
+def metrics(request):
+    """Request metrics (see campus_gamehub.metrics) in the Prometheus text format."""
+    user = request.user
+    is_admin = user.is_authenticated and (user.is_superuser or user.role == 'super_admin')
+    if not (is_admin or _is_scraper(request)):
+        return HttpResponseForbidden("Metrics are only available to super admins.")
+
+    cards = card_cache_stats()
+    body = registry.render(extra=[
+        ('gamehub_card_cache_hits_total', 'counter', "Game card cache hits.", cards['hits']),
+        ('gamehub_card_cache_misses_total', 'counter', "Game card cache misses.", cards['misses']),
+    ])
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,8 +1,50 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from rentals.waitlist import promote_waitlist
+from .forms import GameForm
 from .models import Game
+from .search import search_filter
+
+class InStockFilter(admin.SimpleListFilter):
+    title = "availability"
+    parameter_name = 'in_stock'
+
+    def lookups(self, request, model_admin):
+        return [('yes', "In stock"), ('no', "All copies rented")]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'yes':
+            return queryset.filter(available_copies__gt=0)
+        if self.value() == 'no':
+            return queryset.filter(available_copies=0)
+        return queryset
+
 
 @admin.register(Game)
 class GameAdmin(admin.ModelAdmin):
-    list_display = ('title', 'available')
-    list_filter = ('available',)
+    list_display = ('title', 'available_copies', 'total_copies')
+    list_filter = (InStockFilter,)
     search_fields = ('title',)
+    # GameForm refuses fewer copies than are rented out
+    form = GameForm
+    fields = ('title', 'description', 'image', 'total_copies', 'price_per_day', 'added_by')
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.available_copies = obj.total_copies
+            return super().save_model(request, obj, form, change)
+        # As in edit_game: the stock moves through a conditional UPDATE, so
+        # copies taken by approvals meanwhile aren't overwritten
+        content_fields = [name for name in form.fields if name != 'total_copies']
+        obj.save(update_fields=content_fields + ['updated_at'])
+        if not obj.set_total_copies(form.cleaned_data['total_copies']):
+            self.message_user(
+                request, "More copies are rented out now; the number of copies was not changed.", messages.WARNING,
+            )
+        promote_waitlist([obj.pk])
+
+    def get_search_results(self, request, queryset, search_term):
+        # Use the full-text index instead of a LIKE scan
+        matches = search_filter(search_term)
+        if matches is None:
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(matches), False
@@ -0,0 +1,74 @@
+"""
+Cached HTML fragments for game cards.
+
+Each card is rendered once per (variant, game, version) and stored in the
+default cache; a catalog render then costs one ``get_many`` plus rendering
+only the cards that changed. The version is ``Game.updated_at``, so a stale
+entry is never served even if an invalidation signal was missed (e.g. a
+change made in another process), and ``post_save``/``post_delete`` drop the
+entries eagerly to keep the cache small.
+"""
+import threading
+
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+CARD_TEMPLATES = {
+    'catalog': 'games/_game_card.html',
+    'dashboard': 'games/_dashboard_game_card.html',
+}
+CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def card_cache_key(variant, game_id):
+    return f"game-card:{variant}:{game_id}"
+
+
+def _version(game):
+    return game.updated_at.timestamp() if game.updated_at else None
+
+
+def render_game_cards(games, variant='catalog'):
+    """Return the rendered card for each game, in order, using the cache."""
+    template_name = CARD_TEMPLATES[variant]
+    games = list(games)
+    keys = [card_cache_key(variant, game.pk) for game in games]
+    cached = cache.get_many(keys)
+
+    cards, fresh = [], {}
+    for key, game in zip(keys, games):
+        version = _version(game)
+        entry = cached.get(key)
+        if entry is not None and entry[0] == version:
+            html = entry[1]
+        else:
+            html = render_to_string(template_name, {'game': game})
+            fresh[key] = (version, html)
+        cards.append(mark_safe(html))
+
+    if fresh:
+        cache.set_many(fresh, CARD_CACHE_TIMEOUT)
+    with _stats_lock:
+        _stats['hits'] += len(games) - len(fresh)
+        _stats['misses'] += len(fresh)
+    return cards
+
+
+def invalidate_game_cards(game_id):
+    cache.delete_many([card_cache_key(variant, game_id) for variant in CARD_TEMPLATES])
+
+
+def card_cache_stats():
+    """Hit/miss counters for this process since start-up."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+    }
@@ -0,0 +1,64 @@
+"""
+Validators for conditional GET on the catalog pages.
+
+Every write to a game bumps the one-row ``CatalogVersion`` stamp (and the
+game's own ``updated_at``), so a single primary-key lookup is enough to
+decide whether a client's cached copy is still good; when it is, the view
+answers 304 without running its queries or rendering. Pages greet the
+logged-in user, so the ETag also carries the user id.
+"""
+from django.contrib.messages import get_messages
+
+from .models import CatalogVersion, Game
+
+
+def _has_pending_messages(request):
+    # len() loads the messages without marking them as shown
+    return len(get_messages(request)) > 0
+
+
+def _user_tag(request):
+    return request.user.pk if request.user.is_authenticated else 0
+
+
+def catalog_version():
+    """``(version, updated_at)`` of the catalog stamp."""
+    return CatalogVersion.objects.filter(pk=1).values_list('version', 'updated_at').first() or (0, None)
+
+
+def _catalog_state(request):
+    if not hasattr(request, '_catalog_state'):
+        request._catalog_state = catalog_version()
+    return request._catalog_state
+
+
+def catalog_etag(request, *args, **kwargs):
+    if _has_pending_messages(request):
+        return None
+    version, _ = _catalog_state(request)
+    return f"catalog-{version}-{_user_tag(request)}"
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return _catalog_state(request)[1]
+
+
+def _game_updated_at(request, pk):
+    # The detail page also shows the game's waitlist, which has its own timestamp
+    if not hasattr(request, '_game_updated_at'):
+        row = Game.objects.filter(pk=pk).values_list('updated_at', 'waitlist__updated_at').first()
+        request._game_updated_at = max(filter(None, row)) if row else None
+    return request._game_updated_at
+
+
+def game_etag(request, pk, *args, **kwargs):
+    if _has_pending_messages(request):
+        return None
+    updated_at = _game_updated_at(request, pk)
+    if updated_at is None:
+        return None
+    return f"game-{pk}-{updated_at.timestamp()}-{_user_tag(request)}"
+
+
+def game_last_modified(request, pk, *args, **kwargs):
+    return _game_updated_at(request, pk)
@@ -4,14 +4,35 @@ from .models import Game
 class GameForm(forms.ModelForm):
     class Meta:
         model = Game
-        fields = ['title', 'description', 'image', 'available', 'price_per_day']
+        fields = ['title', 'description', 'image', 'total_copies', 'price_per_day']
         widgets = {
+            'total_copies': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
             'price_per_day': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01', 'min': '1'}),
         }
         labels = {
+            'total_copies': 'Number of copies',
             'price_per_day': 'Price per day (₹)',
         }
 
+    def clean_total_copies(self):
+        total = self.cleaned_data['total_copies']
+        if self.instance.pk:
+            rented = self.instance.total_copies - self.instance.available_copies
+            if total < rented:
+                raise forms.ValidationError(f"{rented} copies are rented out right now.")
+        return total
+
+    def save(self, commit=True):
+        # New games start with every copy on the shelf. For existing games
+        # edit_game changes the stock through Game.set_total_copies().
+        game = super().save(commit=False)
+        if game.pk is None:
+            game.available_copies = game.total_copies
+        if commit:
+            game.save()
+            self.save_m2m()
+        return game
+
 # from django import forms
 # from .models import Game
 
@@ -0,0 +1,72 @@
+"""
+Thumbnail and WebP derivatives for ``Game.image``.
+
+Uploads are kept as-is; card-sized crops are written next to them in JPEG
+and WebP and recorded in ``Game.image_variants`` so templates can build a
+``srcset`` without touching storage.
+"""
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+# Fixed card sizes (width, height); cards crop to 200px tall at 1x.
+THUMBNAIL_SIZES = ((320, 200), (640, 400))
+VARIANT_DIR = 'games/derived'
+
+# Pillow format name -> (file extension, save options)
+VARIANT_FORMATS = {
+    'JPEG': ('jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+    'WEBP': ('webp', {'quality': 75, 'method': 4}),
+}
+
+
+def build_variants(game):
+    """Render every size/format of ``game.image`` and return the variant map."""
+    storage = game.image.storage
+    stem = os.path.splitext(os.path.basename(game.image.name))[0]
+
+    with game.image.open('rb') as fh:
+        source = ImageOps.exif_transpose(Image.open(fh))
+        source = source.convert('RGB')
+
+    variants = {}
+    for width, height in THUMBNAIL_SIZES:
+        fitted = ImageOps.fit(source, (width, height), Image.Resampling.LANCZOS)
+        for fmt, (ext, options) in VARIANT_FORMATS.items():
+            buffer = BytesIO()
+            fitted.save(buffer, fmt, **options)
+            name = storage.save(f"{VARIANT_DIR}/{stem}_{width}x{height}.{ext}", ContentFile(buffer.getvalue()))
+            variants.setdefault(str(width), {})[ext] = name
+    return variants
+
+
+def delete_variants(game):
+    storage = game.image.storage
+    for formats in (game.image_variants or {}).values():
+        for name in formats.values():
+            storage.delete(name)
+
+
+def process_game_image(game):
+    """
+    Replace the stored derivatives of ``game`` with fresh ones.
+
+    Unreadable uploads are logged and leave the game without variants, so
+    templates fall back to the original image.
+    """
+    delete_variants(game)
+    variants = {}
+    if game.image:
+        try:
+            variants = build_variants(game)
+        except (OSError, UnidentifiedImageError, Image.DecompressionBombError):
+            logger.warning("Could not build thumbnails for game %s (%s)", game.pk, game.image.name, exc_info=True)
+
+    game.image_variants = variants
+    game.save(update_fields=['image_variants', 'updated_at'])
+    return variants
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from games.images import process_game_image
+from games.models import Game
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail and WebP derivatives for existing game images."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Rebuild derivatives even for games that already have them.",
+        )
+
+    def handle(self, *args, **options):
+        games = Game.objects.exclude(image='').exclude(image__isnull=True).order_by('id')
+        if not options['force']:
+            games = games.filter(image_variants={})
+
+        processed = failed = 0
+        for game in games.iterator(chunk_size=200):
+            if process_game_image(game):
+                processed += 1
+            else:
+                failed += 1
+                self.stderr.write(f"Skipped game {game.pk}: could not read {game.image.name}")
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} image(s), {failed} skipped."))
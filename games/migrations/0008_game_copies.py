@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:39
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+def copies_from_available(apps, schema_editor):
+    # Every existing game is one copy, on the shelf unless it was rented out
+    Game = apps.get_model('games', 'Game')
+    Game.objects.filter(available=False).update(available_copies=0)
+
+
+def available_from_copies(apps, schema_editor):
+    Game = apps.get_model('games', 'Game')
+    Game.objects.filter(available_copies=0).update(available=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0007_game_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='available_copies',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='total_copies',
+            field=models.PositiveIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.RunPython(copies_from_available, available_from_copies),
+        migrations.RemoveField(
+            model_name='game',
+            name='available',
+        ),
+        migrations.AddIndex(
+            model_name='game',
+            index=models.Index(condition=models.Q(('available_copies__gt', 0)), fields=['title', 'id'], name='game_in_stock_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='game',
+            constraint=models.CheckConstraint(condition=models.Q(('available_copies__lte', models.F('total_copies'))), name='game_available_within_total'),
+        ),
+    ]
@@ -1,11 +1,19 @@
 from django.db import models
 from django.conf import settings
+from django.core.validators import MinValueValidator
+from django.utils import timezone
 
 class Game(models.Model):
     title = models.CharField(max_length=100)
     description = models.TextField()
     image = models.ImageField(upload_to='games/', blank=True, null=True)
-    available = models.BooleanField(default=True)
+    # Thumbnail/WebP derivatives of `image`, see games.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    # Copies the owner has, and how many of them are on the shelf. Rentals
+    # move available_copies with conditional UPDATEs (see rentals.services).
+    total_copies = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    available_copies = models.PositiveIntegerField(default=1, editable=False)
 
     # NEW FIELD → track who added the game
     added_by = models.ForeignKey(
@@ -19,6 +27,68 @@ class Game(models.Model):
     # NEW FIELD → price per day for rentals
     price_per_day = models.DecimalField(max_digits=6, decimal_places=2, default=50.00)
 
+    # Bumped on every change; drives ETag/Last-Modified for the catalog pages
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the catalog orders on (title, id)
+            models.Index(fields=['title', 'id'], name='game_title_id_idx'),
+            # Same, for listings of games with a copy on the shelf
+            models.Index(
+                fields=['title', 'id'], condition=models.Q(available_copies__gt=0), name='game_in_stock_idx',
+            ),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(available_copies__lte=models.F('total_copies')),
+                name='game_available_within_total',
+            ),
+        ]
+
+    @property
+    def available(self):
+        return self.available_copies > 0
+
+    def set_total_copies(self, total):
+        """
+        Change how many copies the owner has; the copies on the shelf move by
+        the same amount. Returns False, changing nothing, if more than
+        ``total`` copies are rented out.
+        """
+        updated = Game.objects.filter(
+            pk=self.pk, available_copies__gte=models.F('total_copies') - total,
+        ).update(
+            available_copies=models.F('available_copies') + total - models.F('total_copies'),
+            total_copies=total,
+            updated_at=timezone.now(),
+        )
+        if updated:
+            bump_catalog_version()
+        self.refresh_from_db(fields=['total_copies', 'available_copies', 'updated_at'])
+        return bool(updated)
+
     def __str__(self):
         return self.title
 
+
+
+class CatalogVersion(models.Model):
+    """
+    One row, bumped on every write to a game; the catalog pages validate
+    ETag/Last-Modified against it instead of scanning the games table.
+    """
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+
+def bump_catalog_version(now=None):
+    """
+    Mark the catalog as changed. Call it from every path that writes games
+    without going through ``Game.save()``/``delete()`` (queryset updates,
+    bulk_create), which the games.signals receivers already cover.
+    """
+    now = now or timezone.now()
+    if not CatalogVersion.objects.filter(pk=1).update(version=models.F('version') + 1, updated_at=now):
+        # Only after a flush; the migration creates the row
+        CatalogVersion.objects.get_or_create(pk=1, defaults={'version': 1, 'updated_at': now})
@@ -0,0 +1,163 @@
+"""
+Ranked full-text search over Game title and description.
+
+On SQLite the catalog is indexed by an FTS5 external-content table
+(``games_game_fts``) that mirrors ``games_game``. Triggers keep it in sync on
+every insert, update and delete, including ``bulk_create`` and queryset
+``update()`` calls that never reach model signals. Other backends, or SQLite
+builds without FTS5, fall back to ``icontains`` matching.
+"""
+import re
+from functools import reduce
+from operator import and_
+
+from django.db import connection, OperationalError
+from django.db.models import Q, Case, When, Value, IntegerField
+from django.db.models.expressions import RawSQL
+
+from .models import Game
+
+FTS_TABLE = 'games_game_fts'
+MAX_TERMS = 8
+DEFAULT_LIMIT = 50
+
+# Title matches weigh ten times more than description matches in bm25().
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+_FTS_TRIGGERS = {
+    'games_game_fts_ai': f"""
+        CREATE TRIGGER IF NOT EXISTS games_game_fts_ai AFTER INSERT ON games_game BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END""",
+    'games_game_fts_ad': f"""
+        CREATE TRIGGER IF NOT EXISTS games_game_fts_ad AFTER DELETE ON games_game BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END""",
+    'games_game_fts_au': f"""
+        CREATE TRIGGER IF NOT EXISTS games_game_fts_au AFTER UPDATE OF title, description ON games_game BEGIN
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO {FTS_TABLE}(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END""",
+}
+
+
+def install_fts(using_connection=None):
+    """
+    Create the FTS5 table and its triggers if they are missing.
+
+    Runs after every ``migrate``: SQLite schema changes to ``games_game`` are
+    done by rebuilding the table, which silently drops its triggers, so they
+    are re-created here and the index is rebuilt whenever that happened.
+    """
+    conn = using_connection or connection
+    if conn.vendor != 'sqlite':
+        return False
+
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+            [FTS_TABLE + '%'],
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+
+        if FTS_TABLE not in existing:
+            try:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    "title, description, content='games_game', content_rowid='id', "
+                    "tokenize='unicode61 remove_diacritics 2')"
+                )
+            except OperationalError:
+                # SQLite compiled without FTS5; search uses the fallback.
+                conn._games_fts_enabled = False
+                return False
+
+        missing_triggers = [name for name in _FTS_TRIGGERS if name not in existing]
+        for name in missing_triggers:
+            cursor.execute(_FTS_TRIGGERS[name])
+
+        if FTS_TABLE not in existing or missing_triggers:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    conn._games_fts_enabled = True
+    return True
+
+
+def fts_enabled():
+    enabled = getattr(connection, '_games_fts_enabled', None)
+    if enabled is None:
+        enabled = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+                enabled = cursor.fetchone() is not None
+        connection._games_fts_enabled = enabled
+    return enabled
+
+
+def _terms(query):
+    return re.findall(r'\w+', (query or '').lower())[:MAX_TERMS]
+
+
+def _match(terms):
+    # Every term is quoted (so user input can't inject FTS syntax) and
+    # prefix-matched, and all of them must match.
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _fallback_filter(terms):
+    return reduce(and_, (Q(title__icontains=t) | Q(description__icontains=t) for t in terms))
+
+
+def search_filter(query):
+    """
+    A ``Q`` for every game matching ``query``, unranked and uncapped, for
+    filtering querysets (the admin changelist); ``None`` without terms.
+    """
+    terms = _terms(query)
+    if not terms:
+        return None
+    if fts_enabled():
+        return Q(pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [_match(terms)]))
+    return _fallback_filter(terms)
+
+
+def search_game_ids(query, limit=DEFAULT_LIMIT):
+    """Return ids of games matching every term in ``query``, best match first."""
+    terms = _terms(query)
+    if not terms:
+        return []
+
+    if fts_enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+                f"ORDER BY bm25({FTS_TABLE}, %s, %s) LIMIT %s",
+                [_match(terms), TITLE_WEIGHT, DESCRIPTION_WEIGHT, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    matches = _fallback_filter(terms)
+    title_hits = sum(
+        (Case(When(title__icontains=t, then=Value(1)), default=Value(0), output_field=IntegerField())
+         for t in terms),
+        Value(0),
+    )
+    return list(
+        Game.objects.filter(matches)
+        .annotate(title_hits=title_hits)
+        .order_by('-title_hits', 'title', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+
+
+def search_games(query, limit=DEFAULT_LIMIT):
+    """Return matching Game objects in rank order."""
+    ids = search_game_ids(query, limit=limit)
+    games = Game.objects.in_bulk(ids)
+    return [games[pk] for pk in ids if pk in games]
@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cards import invalidate_game_cards
+from .images import delete_variants
+from .models import Game, bump_catalog_version
+
+
+@receiver(post_delete, sender=Game)
+def remove_image_variants(sender, instance, **kwargs):
+    if instance.image_variants:
+        delete_variants(instance)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def drop_cached_cards(sender, instance, **kwargs):
+    invalidate_game_cards(instance.pk)
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def bump_catalog(sender, instance, **kwargs):
+    bump_catalog_version()
@@ -0,0 +1,46 @@
+from django import template
+from django.utils.html import format_html
+
+from games.images import THUMBNAIL_SIZES
+
+register = template.Library()
+
+# Cards are one third of the row from the md breakpoint up
+CARD_SIZES = "(min-width: 768px) 33vw, 100vw"
+
+
+def _srcset(storage, variants, ext):
+    return ", ".join(
+        f"{storage.url(formats[ext])} {width}w"
+        for width, formats in sorted(variants.items(), key=lambda item: int(item[0]))
+        if ext in formats
+    )
+
+
+@register.simple_tag
+def game_thumbnail(game, css_class="card-img-top", sizes=CARD_SIZES):
+    """
+    Render a game's card image as a <picture> with WebP and JPEG srcsets.
+
+    Falls back to the original upload when no derivatives exist yet.
+    """
+    variants = game.image_variants or {}
+    if not variants:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', game.image.url, css_class, game.title)
+
+    storage = game.image.storage
+    width, height = THUMBNAIL_SIZES[0]
+    smallest = variants[min(variants, key=int)]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" width="{}" height="{}" loading="lazy"></picture>',
+        _srcset(storage, variants, "webp"),
+        sizes,
+        storage.url(smallest["jpg"]),
+        _srcset(storage, variants, "jpg"),
+        sizes,
+        css_class,
+        game.title,
+        width,
+        height,
+    )
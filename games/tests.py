@@ -1,3 +1,394 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from campus_gamehub.pagination import DEFAULT_PAGE_SIZE
+from campus_gamehub.testing import QueryBudgetMixin, seed_data
+from rentals.models import Rental, WaitlistEntry
+from rentals.services import approve_rental
+from . import urls
+from PIL import Image
+
+from .cards import card_cache_key, card_cache_stats, render_game_cards
+from .images import THUMBNAIL_SIZES, VARIANT_DIR, process_game_image
+from .models import Game
+from .search import fts_enabled, search_game_ids
+from .templatetags.game_images import game_thumbnail
+
+# Queries per request, including the session and user lookups of a
+# logged-in request. They must not grow with the data.
+QUERY_BUDGETS = {
+    'game_list': 4,
+    'game_list_api': 2,
+    'game_search': 3,
+    'card_cache_stats': 2,
+    'game_detail': 4,
+    'add_game': 2,
+    'edit_game': 3,
+    'delete_game': 3,
+}
+
+
+class GameViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data()
+        cls.owner = cls.data['owners'][0]
+        cls.student = cls.data['students'][0]
+        cls.game = cls.data['games'][0]
+
+    def test_every_view_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_catalog(self):
+        self.assertViewBudget('game_list')
+        self.assertViewBudget('game_list', query='?available=1')
+
+    def test_catalog_as_student(self):
+        self.assertViewBudget('game_list', user=self.student)
+
+    def test_catalog_api(self):
+        first, second = self.assertViewBudget('game_list_api')
+        self.assertEqual(len(second.json()['results']), DEFAULT_PAGE_SIZE)
+
+    def test_search(self):
+        first, second = self.assertViewBudget('game_search', query='?q=game')
+        self.assertGreater(len(second.context['cards']), len(first.context['cards']))
+
+    def test_card_cache_stats(self):
+        self.assertViewBudget('card_cache_stats', user=self.data['super_admin'])
+
+    def test_game_detail(self):
+        self.assertViewBudget('game_detail', user=self.student, args=[self.game.pk])
+
+    def test_game_forms(self):
+        self.assertViewBudget('add_game', user=self.owner)
+        self.assertViewBudget('edit_game', user=self.owner, args=[self.game.pk])
+        self.assertViewBudget('delete_game', user=self.owner, args=[self.game.pk])
+
+
+class GameAdminTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=3, owners=1, games_per_owner=1)
+        cls.admin = cls.data['super_admin']
+        get_user_model().objects.filter(pk=cls.admin.pk).update(is_staff=True, is_superuser=True)
+        cls.game = cls.data['games'][0]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def post(self, url, total_copies):
+        return self.client.post(url, {
+            'title': 'Catan', 'description': 'Trading.', 'total_copies': total_copies, 'price_per_day': '30.00',
+            'added_by': self.data['owners'][0].pk,
+        })
+
+    def test_add_puts_every_copy_on_the_shelf(self):
+        self.assertEqual(self.post(reverse('admin:games_game_add'), 5).status_code, 302)
+        game = Game.objects.get(title='Catan')
+        self.assertEqual((game.total_copies, game.available_copies), (5, 5))
+
+    def test_change_moves_stock_with_the_total(self):
+        game = Game.objects.get(pk=self.game.pk)
+        rented = game.total_copies - game.available_copies
+        self.assertGreater(rented, 0)
+        # Everyone queued for it gets one of the new copies
+        WaitlistEntry.objects.filter(game=game).delete()
+
+        response = self.post(reverse('admin:games_game_change', args=[game.pk]), game.total_copies + 3)
+        self.assertEqual(response.status_code, 302)
+        game.refresh_from_db()
+        self.assertEqual((game.title, game.available_copies), ('Catan', game.total_copies - rented))
+
+        self.post(reverse('admin:games_game_change', args=[game.pk]), rented - 1)
+        game.refresh_from_db()
+        self.assertEqual(game.total_copies - game.available_copies, rented)
+
+    def test_new_copies_go_to_the_waitlist(self):
+        game = Game.objects.get(pk=self.game.pk)
+        rented = game.total_copies - game.available_copies
+        Game.objects.filter(pk=game.pk).update(available_copies=0, total_copies=rented)
+        game.refresh_from_db()
+        pending = set(Rental.objects.filter(game=game, status='pending').values_list('user_id', flat=True))
+        waiting = set(WaitlistEntry.objects.filter(game=game).values_list('user_id', flat=True))
+
+        self.post(reverse('admin:games_game_change', args=[game.pk]), game.total_copies + len(pending) + len(waiting))
+        # Those with a pending request already keep their place
+        still_waiting = WaitlistEntry.objects.filter(game=game).values_list('user_id', flat=True)
+        self.assertEqual(set(still_waiting), waiting & pending)
+        now_pending = Rental.objects.filter(game=game, status='pending').values_list('user_id', flat=True)
+        self.assertEqual(set(now_pending), pending | waiting)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=1, owners=1, games_per_owner=2)
+        cls.game = cls.data['games'][0]
+        cls.unrented = Game.objects.create(title='Azul', description='Tiles.', added_by=cls.data['owners'][0])
+
+    def get(self, **headers):
+        return self.client.get(reverse('game_list_api'), headers=headers)
+
+    def test_unchanged_catalog_answers_304(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        # Only the catalog stamp is read
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(if_none_match=response['ETag']).status_code, 304)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(if_modified_since=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.get(if_modified_since='Mon, 01 Jan 2001 00:00:00 GMT').status_code, 200)
+
+    def test_every_game_write_changes_the_etag(self):
+        writes = [
+            lambda: self.game.set_total_copies(5),
+            lambda: Game.objects.create(title='Hanabi', description='Fireworks.'),
+            lambda: self.data['games'][1].delete(),
+        ]
+        for write in writes:
+            etag = self.get()['ETag']
+            write()
+            self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+    def test_copies_taken_and_returned_change_the_etag(self):
+        # Both move available_copies with queryset updates, not Game.save()
+        rental = Rental.objects.create(user=self.data['students'][0], game=self.unrented, rental_days=3)
+        etag = self.get()['ETag']
+        rental = approve_rental(rental.pk, self.data['owners'][0])
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+        etag = self.get()['ETag']
+        rental.delete()
+        self.assertEqual(self.get(if_none_match=etag).status_code, 200)
+
+
+class GameCardCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=1, owners=1, games_per_owner=3)
+
+    def setUp(self):
+        cache.clear()
+        self.games = list(Game.objects.order_by('pk'))
+
+    def render(self):
+        # The counters are per process, so compare against a snapshot
+        before = card_cache_stats()
+        cards = render_game_cards(Game.objects.order_by('pk'))
+        after = card_cache_stats()
+        return cards, after['hits'] - before['hits'], after['misses'] - before['misses']
+
+    def test_second_render_hits_the_cache(self):
+        first, hits, misses = self.render()
+        self.assertEqual((hits, misses), (0, 3))
+        second, hits, misses = self.render()
+        self.assertEqual((hits, misses), (3, 0))
+        self.assertEqual(first, second)
+
+    def test_saving_a_game_drops_its_cards(self):
+        self.render()
+        game = self.games[0]
+        game.title = 'Renamed'
+        game.save()
+        self.assertIsNone(cache.get(card_cache_key('catalog', game.pk)))
+        cards, hits, misses = self.render()
+        self.assertEqual((hits, misses), (2, 1))
+        self.assertIn('Renamed', cards[0])
+
+    def test_stale_version_is_rendered_again(self):
+        # A queryset update sends no signal; the newer updated_at alone
+        # must keep the old card from being served
+        self.render()
+        game = self.games[0]
+        Game.objects.filter(pk=game.pk).update(title='Renamed', updated_at=timezone.now() + timedelta(seconds=1))
+        self.assertIsNotNone(cache.get(card_cache_key('catalog', game.pk)))
+        cards, hits, misses = self.render()
+        self.assertEqual((hits, misses), (2, 1))
+        self.assertIn('Renamed', cards[0])
+
+    def test_stats_view_is_for_super_admins(self):
+        self.render()
+        self.client.force_login(self.data['students'][0])
+        self.assertEqual(self.client.get(reverse('card_cache_stats')).status_code, 403)
+        self.client.force_login(self.data['super_admin'])
+        stats = self.client.get(reverse('card_cache_stats')).json()
+        self.assertEqual(set(stats), {'hits', 'misses', 'hit_ratio'})
+        self.assertGreaterEqual(stats['misses'], 3)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=1, owners=1, games_per_owner=1)
+
+    def test_index_follows_every_write(self):
+        self.assertTrue(fts_enabled())
+        game = Game.objects.create(title='Zephyr Quest', description='Sky pirates.')
+        self.assertEqual(search_game_ids('zephyr'), [game.pk])
+
+        game.title = 'Tempest Quest'
+        game.save()
+        self.assertEqual(search_game_ids('zephyr'), [])
+        self.assertEqual(search_game_ids('tempest'), [game.pk])
+
+        Game.objects.filter(pk=game.pk).update(description='Airships and storms.')
+        self.assertEqual(search_game_ids('airships'), [game.pk])
+        self.assertEqual(search_game_ids('pirates'), [])
+
+        bulk, = Game.objects.bulk_create([Game(title='Nimbus', description='Clouds.')])
+        self.assertEqual(search_game_ids('nimb'), [bulk.pk])
+
+        game.delete()
+        self.assertEqual(search_game_ids('tempest'), [])
+
+    def test_title_matches_rank_first(self):
+        described = Game.objects.create(title='Pirates', description='A tale of the harbour.')
+        titled = Game.objects.create(title='Harbour', description='Boats.')
+        self.assertEqual(search_game_ids('harbour'), [titled.pk, described.pk])
+
+    def test_admin_search_is_not_capped(self):
+        Game.objects.bulk_create([Game(title=f'Meeple {i}', description='Wooden.') for i in range(1005)])
+        admin = self.data['super_admin']
+        get_user_model().objects.filter(pk=admin.pk).update(is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+
+        response = self.client.get(reverse('admin:games_game_changelist'), {'q': 'meeple'})
+        self.assertEqual(response.context['cl'].result_count, 1005)
+
+
+class GameImageTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def game_with(self, content, name='box.png'):
+        return Game.objects.create(
+            title='Dixit', description='Pictures.', image=SimpleUploadedFile(name, content, content_type='image/png'),
+        )
+
+    def png(self, size=(1200, 900)):
+        buffer = BytesIO()
+        Image.new('RGB', size, (200, 40, 90)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_builds_every_size_and_format(self):
+        game = self.game_with(self.png())
+        variants = process_game_image(game)
+
+        self.assertEqual(set(variants), {str(width) for width, _ in THUMBNAIL_SIZES})
+        storage = game.image.storage
+        for width, height in THUMBNAIL_SIZES:
+            for ext, fmt in (('jpg', 'JPEG'), ('webp', 'WEBP')):
+                with storage.open(variants[str(width)][ext]) as fh, Image.open(fh) as image:
+                    self.assertEqual((image.format, image.size), (fmt, (width, height)))
+        self.assertEqual(Game.objects.get(pk=game.pk).image_variants, variants)
+
+    def test_thumbnail_srcsets(self):
+        game = self.game_with(self.png())
+        process_game_image(game)
+        html = game_thumbnail(game)
+
+        storage = game.image.storage
+        webp = ", ".join(f"{storage.url(game.image_variants[str(w)]['webp'])} {w}w" for w, _ in THUMBNAIL_SIZES)
+        self.assertIn(f'<source type="image/webp" srcset="{webp}"', html)
+        self.assertIn(f'src="{storage.url(game.image_variants["320"]["jpg"])}"', html)
+        self.assertIn('640w', html)
+        self.assertIn('width="320" height="200"', html)
+
+    def test_unreadable_upload_falls_back_to_the_original(self):
+        game = self.game_with(b'not an image', name='broken.png')
+        with self.assertLogs('games.images', 'WARNING'):
+            self.assertEqual(process_game_image(game), {})
+        self.assertEqual(game_thumbnail(game).count('<img src="'), 1)
+        self.assertIn(game.image.url, game_thumbnail(game))
+
+    def test_reprocessing_replaces_old_variants(self):
+        game = self.game_with(self.png())
+        process_game_image(game)
+        process_game_image(game)
+        _, files = game.image.storage.listdir(VARIANT_DIR)
+        self.assertEqual(len(files), len(THUMBNAIL_SIZES) * 2)
+
+
+class ImportGamesTests(TestCase):
+
+    CSV = (
+        "title,description,total_copies,price_per_day\n"
+        "Carcassonne,Tiles and meeples.,3,25.50\n"
+        ",No title.,1,10\n"
+        "Hanabi,Fireworks.,0,10\n"
+        "Patchwork,Quilts.,,\n"
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = seed_data(students=1, owners=1, games_per_owner=1)['owners'][0]
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.directory = Path(directory)
+
+    def run_import(self, name, content, *args):
+        path = self.directory / name
+        path.write_text(content, encoding='utf-8')
+        out, err = io.StringIO(), io.StringIO()
+        call_command('import_games', str(path), *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_imports_valid_rows_and_reports_the_rest(self):
+        out, err = self.run_import('games.csv', self.CSV, '--owner', self.owner.username, '--batch-size', '1')
+
+        self.assertIn("Imported 2 game(s), 2 invalid row(s) skipped", out)
+        self.assertIn("Line 3: title:", err)
+        self.assertIn("Line 4: total_copies:", err)
+        carcassonne = Game.objects.get(title='Carcassonne')
+        self.assertEqual(
+            (carcassonne.total_copies, carcassonne.available_copies, carcassonne.price_per_day, carcassonne.added_by),
+            (3, 3, Decimal('25.50'), self.owner),
+        )
+        # Empty columns take the model defaults
+        patchwork = Game.objects.get(title='Patchwork')
+        self.assertEqual((patchwork.total_copies, patchwork.price_per_day), (1, Decimal('50.00')))
+        self.assertEqual(search_game_ids('quilts'), [patchwork.pk])
+
+    def test_jsonl(self):
+        lines = '{"title": "Codenames", "description": "Spies.", "total_copies": 2}\n\n{not json}\n'
+        out, err = self.run_import('games.jsonl', lines)
+        self.assertIn("Imported 1 game(s), 1 invalid row(s) skipped", out)
+        self.assertIn("Line 3: invalid JSON", err)
+        self.assertTrue(Game.objects.filter(title='Codenames', available_copies=2).exists())
+
+    def test_dry_run_writes_nothing(self):
+        before = Game.objects.count()
+        out, _ = self.run_import('games.csv', self.CSV, '--dry-run')
+        self.assertIn("Validated 2 game(s), 2 invalid row(s) skipped", out)
+        self.assertEqual(Game.objects.count(), before)
+
+    def test_unknown_owner(self):
+        with self.assertRaisesMessage(CommandError, "No user named 'nobody'."):
+            self.run_import('games.csv', self.CSV, '--owner', 'nobody')
@@ -4,6 +4,9 @@ from . import views
 
 urlpatterns = [
     path('', views.game_list, name='game_list'),
+    path('api/games/', views.game_list_api, name='game_list_api'),
+    path('search/', views.game_search, name='game_search'),
+    path('cards/stats/', views.card_cache_stats_view, name='card_cache_stats'),
     path('<int:pk>/', views.game_detail, name='game_detail'),
     path('add/', views.add_game, name='add_game'),
     path('edit/<int:pk>/', views.edit_game, name='edit_game'),
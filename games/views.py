@@ -1,20 +1,102 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
+from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseForbidden
+from django.urls import reverse
+from django.views.decorators.http import condition
+from campus_gamehub.pagination import InvalidCursor, paginate_keyset, page_size_from_request
+from rentals.waitlist import promote_waitlist
 from .models import Game
 from .forms import GameForm
+from .search import search_games
+from .images import process_game_image
+from .cards import render_game_cards, card_cache_stats
+from .conditional import catalog_etag, catalog_last_modified, game_etag, game_last_modified
 
+# Catalog order; backed by the (title, id) index on Game.
+CATALOG_ORDERING = ['title', 'id']
 
-def game_list(request):
+
+def _catalog_page(request):
     games = Game.objects.all()
-    return render(request, 'games/games_list.html', {'games': games})
+    if request.GET.get('available'):
+        # Served by the partial game_in_stock_idx index
+        games = games.filter(available_copies__gt=0)
+    return paginate_keyset(
+        games,
+        CATALOG_ORDERING,
+        cursor=request.GET.get('cursor'),
+        page_size=page_size_from_request(request),
+    )
+
+
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+def game_list(request):
+    try:
+        page = _catalog_page(request)
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid page cursor.")
+    return render(request, 'games/games_list.html', {
+        'cards': render_game_cards(page.items, 'catalog'),
+        'page': page,
+        'next_url': page.next_url(request),
+        'previous_url': page.previous_url(request),
+    })
+
+
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+def game_list_api(request):
+    try:
+        page = _catalog_page(request)
+    except InvalidCursor:
+        return JsonResponse({'error': "Invalid page cursor."}, status=400)
+
+    results = [{
+        'id': game.id,
+        'title': game.title,
+        'description': game.description,
+        'image': game.image.url if game.image else None,
+        'available': game.available,
+        'available_copies': game.available_copies,
+        'total_copies': game.total_copies,
+        'price_per_day': str(game.price_per_day),
+        'url': reverse('game_detail', args=[game.pk]),
+    } for game in page.items]
 
+    return JsonResponse({
+        'results': results,
+        'page_size': page.page_size,
+        'next_cursor': page.next_cursor,
+        'previous_cursor': page.prev_cursor,
+        'next': page.next_url(request),
+        'previous': page.previous_url(request),
+    })
 
+
+@condition(etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+def game_search(request):
+    query = request.GET.get('q', '').strip()
+    games = search_games(query) if query else []
+    return render(request, 'games/games_list.html', {
+        'cards': render_game_cards(games, 'catalog'),
+        'query': query,
+    })
+
+
+@condition(etag_func=game_etag, last_modified_func=game_last_modified)
 def game_detail(request, pk):
-    game = get_object_or_404(Game, pk=pk)
+    game = get_object_or_404(Game.objects.select_related('added_by', 'waitlist__head_user'), pk=pk)
     return render(request, 'games/game_detail.html', {'game': game})
 
 
+@login_required
+def card_cache_stats_view(request):
+    if not (request.user.is_superuser or request.user.role == 'super_admin'):
+        return HttpResponseForbidden("Only super admins can view cache statistics.")
+    return JsonResponse(card_cache_stats())
+
+
 # ---------------- Game Management ----------------
 
 @login_required
@@ -25,6 +107,8 @@ def add_game(request):
             game = form.save(commit=False)
             game.added_by = request.user
             game.save()
+            if game.image:
+                process_game_image(game)
             messages.success(request, "Game added successfully!")
             return redirect('game_list')
     else:
@@ -38,7 +122,19 @@ def edit_game(request, pk):
     if request.method == 'POST':
         form = GameForm(request.POST, request.FILES, instance=game)
         if form.is_valid():
-            form.save()
+            game = form.save(commit=False)
+            # Stock goes through a conditional UPDATE so rentals approved
+            # meanwhile aren't overwritten
+            total_copies = form.cleaned_data['total_copies']
+            content_fields = [name for name in form.Meta.fields if name != 'total_copies']
+            game.save(update_fields=content_fields + ['updated_at'])
+            with transaction.atomic():
+                if not game.set_total_copies(total_copies):
+                    messages.warning(request, "More copies are rented out now; the number of copies was not changed.")
+                # New copies go to the waitlist first
+                promote_waitlist([game.pk])
+            if 'image' in form.changed_data:
+                process_game_image(game)
             messages.success(request, "Game updated successfully!")
             return redirect('game_detail', pk=pk)
     else:
@@ -1,6 +1,18 @@
 # rentals/admin.py
-from django.contrib import admin
-from .models import Rental
+from django.contrib import admin, messages
+from django.utils import timezone
+from .models import Payment, Rental
+from .pricing import quote
+from .reservations import period_for
+from .services import RentalError, approve_rental, deny_rental
+from .stats import record_change, state_of
+
+# Moved only by rentals.services (the actions below), which keeps the game's
+# copies and the stats counters in step
+LIFECYCLE_FIELDS = (
+    'status', 'requested_at', 'approved_at', 'approved_by', 'cost', 'start_date', 'end_date', 'due_at',
+    'returned_at', 'payment_status', 'payment_method', 'payment_date', 'transaction_id',
+)
 
 @admin.register(Rental)
 class RentalAdmin(admin.ModelAdmin):
@@ -8,13 +20,45 @@ class RentalAdmin(admin.ModelAdmin):
     list_filter = ('status',)
     actions = ['approve_rentals', 'deny_rentals']
 
+    def get_readonly_fields(self, request, obj=None):
+        if obj is None:
+            return LIFECYCLE_FIELDS
+        # Moving a rental to another user or game would move its counters too
+        return ('user', 'game', 'rental_days') + LIFECYCLE_FIELDS
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return super().save_model(request, obj, form, change)
+        # A new request, priced and counted like one filed from the site
+        obj.cost = quote(obj.game.price_per_day, obj.rental_days)
+        obj.start_date, obj.end_date = period_for(timezone.localdate(), obj.rental_days)
+        super().save_model(request, obj, form, change)
+        record_change(obj, None, state_of(obj))
+
+    def _apply(self, request, queryset, action, verb):
+        done, failed = 0, []
+        for rental_id in queryset.values_list('id', flat=True):
+            try:
+                action(rental_id, request.user)
+                done += 1
+            except RentalError as exc:
+                failed.append(f"#{rental_id}: {exc}")
+        if done:
+            self.message_user(request, f"{verb} {done} rental(s).", messages.SUCCESS)
+        if failed:
+            self.message_user(request, "Skipped " + "; ".join(failed), messages.WARNING)
+
     def approve_rentals(self, request, queryset):
-        queryset.update(status='approved')
-        for rental in queryset:
-            rental.game.available = False
-            rental.game.save()
+        self._apply(request, queryset, approve_rental, "Approved")
     approve_rentals.short_description = "Approve selected rentals"
 
     def deny_rentals(self, request, queryset):
-        queryset.update(status='denied')
+        self._apply(request, queryset, deny_rental, "Denied")
     deny_rentals.short_description = "Deny selected rentals"
+
+
+@admin.register(Payment)
+class PaymentAdmin(admin.ModelAdmin):
+    list_display = ('transaction_id', 'rental', 'user', 'amount', 'method', 'created_at')
+    search_fields = ('transaction_id', 'idempotency_key')
+    readonly_fields = ('rental', 'user', 'idempotency_key', 'transaction_id', 'amount', 'method', 'created_at')
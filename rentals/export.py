@@ -0,0 +1,88 @@
+"""
+Streaming rental exports (CSV and JSON Lines).
+
+Rows are read with ``values_list().iterator()`` and encoded as they go, so
+memory use does not depend on how many rentals are exported. Shared by the
+``export_rentals`` view and management command.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Rental
+
+# (column name, lookup)
+EXPORT_COLUMNS = [
+    ('id', 'id'),
+    ('renter', 'user__username'),
+    ('renter_email', 'user__email'),
+    ('game_id', 'game_id'),
+    ('game', 'game__title'),
+    ('owner', 'game__added_by__username'),
+    ('status', 'status'),
+    ('rental_days', 'rental_days'),
+    ('cost', 'cost'),
+    ('requested_at', 'requested_at'),
+    ('approved_at', 'approved_at'),
+    ('due_at', 'due_at'),
+    ('returned_at', 'returned_at'),
+    ('payment_status', 'payment_status'),
+    ('payment_method', 'payment_method'),
+    ('payment_date', 'payment_date'),
+    ('transaction_id', 'transaction_id'),
+]
+
+CHUNK_SIZE = 2000
+
+# Encoded rows are sent on in pieces of about this many characters
+FLUSH_SIZE = 64 * 1024
+
+
+def export_rows(queryset=None):
+    """Yield one tuple per rental, in ``EXPORT_COLUMNS`` order."""
+    queryset = Rental.objects.all() if queryset is None else queryset
+    return (
+        queryset.order_by('id')
+        .values_list(*[lookup for _, lookup in EXPORT_COLUMNS])
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+class _Echo:
+    """File-like object that hands back what is written to it (for csv.writer)."""
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([name for name, _ in EXPORT_COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _jsonl_lines(rows):
+    names = [name for name, _ in EXPORT_COLUMNS]
+    for row in rows:
+        yield json.dumps(dict(zip(names, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (_csv_lines, 'text/csv'),
+    'jsonl': (_jsonl_lines, 'application/x-ndjson'),
+}
+
+
+def export_chunks(queryset, fmt):
+    """Yield the export of ``queryset`` as text chunks of about ``FLUSH_SIZE``."""
+    encode, _ = EXPORT_FORMATS[fmt]
+    buffer, size = [], 0
+    for line in encode(export_rows(queryset)):
+        buffer.append(line)
+        size += len(line)
+        if size >= FLUSH_SIZE:
+            yield ''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield ''.join(buffer)
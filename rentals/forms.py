@@ -1,10 +1,102 @@
+import datetime
+
 from django import forms
+from django.utils import timezone
+
+from .models import Rental
+from .pricing import MAX_RENTAL_DAYS
+from .reservations import BOOKING_HORIZON_DAYS
 
 class RentalRequestForm(forms.Form):
     rental_days = forms.IntegerField(
         min_value=1,
-        max_value=30,
+        max_value=MAX_RENTAL_DAYS,
         initial=3,
         label="Number of days",
         widget=forms.NumberInput(attrs={"class": "form-control"})
     )
+    start_date = forms.DateField(
+        required=False,
+        label="Start date",
+        help_text="Leave empty to start as soon as it's approved.",
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"})
+    )
+
+    def clean_start_date(self):
+        start = self.cleaned_data.get('start_date')
+        if start is None:
+            return start
+        today = timezone.localdate()
+        if start < today:
+            raise forms.ValidationError("The start date cannot be in the past.")
+        if start > today + datetime.timedelta(days=BOOKING_HORIZON_DAYS):
+            raise forms.ValidationError(f"Rentals can be booked at most {BOOKING_HORIZON_DAYS} days ahead.")
+        return start
+
+
+class RentalFilterForm(forms.Form):
+    status = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Any status')] + Rental.STATUS_CHOICES,
+        widget=forms.Select(attrs={"class": "form-select"})
+    )
+    payment_status = forms.ChoiceField(
+        required=False,
+        choices=[('', 'Any payment')] + Rental.PAYMENT_STATUS_CHOICES,
+        widget=forms.Select(attrs={"class": "form-select"})
+    )
+    date_from = forms.DateField(
+        required=False,
+        label="Requested from",
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"})
+    )
+    date_to = forms.DateField(
+        required=False,
+        label="Requested to",
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"})
+    )
+
+    def filter(self, queryset):
+        """Apply the cleaned filters; dates become index-friendly datetime bounds."""
+        data = self.cleaned_data if self.is_bound and self.is_valid() else {}
+        if data.get('status'):
+            queryset = queryset.filter(status=data['status'])
+        if data.get('payment_status'):
+            queryset = queryset.filter(payment_status=data['payment_status'])
+        if data.get('date_from'):
+            queryset = queryset.filter(requested_at__gte=_start_of_day(data['date_from']))
+        if data.get('date_to'):
+            queryset = queryset.filter(
+                requested_at__lt=_start_of_day(data['date_to'] + datetime.timedelta(days=1))
+            )
+        return queryset
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+class RollupReportForm(forms.Form):
+    MAX_DAYS = 366
+
+    date_from = forms.DateField(
+        required=False,
+        label="From",
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"})
+    )
+    date_to = forms.DateField(
+        required=False,
+        label="To",
+        widget=forms.DateInput(attrs={"class": "form-control", "type": "date"})
+    )
+
+    def clean(self):
+        cleaned = super().clean()
+        date_to = cleaned.get('date_to') or timezone.localdate()
+        date_from = cleaned.get('date_from') or date_to - datetime.timedelta(days=29)
+        if date_from > date_to:
+            raise forms.ValidationError("The start date must be before the end date.")
+        if (date_to - date_from).days >= self.MAX_DAYS:
+            raise forms.ValidationError(f"Reports can cover at most {self.MAX_DAYS} days.")
+        cleaned['date_from'], cleaned['date_to'] = date_from, date_to
+        return cleaned
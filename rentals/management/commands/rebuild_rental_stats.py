@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rentals.stats import find_drift, rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the RentalStats counters from the Rental table, or check them for drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help="Only compare stored counters with the Rental table; exit non-zero on drift.",
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            drift = find_drift()
+            for user_id, fields in sorted(drift.items()):
+                details = ", ".join(f"{field} {have} != {want}" for field, (have, want) in fields.items())
+                self.stderr.write(f"user {user_id}: {details}")
+            if drift:
+                raise CommandError(f"Rental stats drifted for {len(drift)} user(s); run without --check to rebuild.")
+            self.stdout.write(self.style.SUCCESS("Rental stats are consistent."))
+            return
+
+        count = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt rental stats for {count} user(s)."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from rentals.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Update the daily per-game and per-owner rental rollups from rentals changed "
+        "since the last run. Safe to run repeatedly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Recompute every day instead of only those touched since the last run.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        days, rows = refresh_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {days} day(s), {rows} game rollup row(s) in {time.monotonic() - started:.1f}s."
+        ))
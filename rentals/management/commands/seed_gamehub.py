@@ -0,0 +1,373 @@
+import itertools
+import random
+import time
+from bisect import bisect
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from games.models import Game, bump_catalog_version
+from rentals.models import Payment, Rental
+from rentals.pricing import quote
+from rentals.services import RETURN_GRACE
+from rentals.stats import rebuild_stats
+
+User = get_user_model()
+
+ADJECTIVES = ['Ancient', 'Cosmic', 'Crimson', 'Hidden', 'Iron', 'Lost', 'Neon', 'Silent', 'Wild', 'Frozen']
+NOUNS = ['Empire', 'Quest', 'Kingdom', 'Legends', 'Frontier', 'Dungeon', 'Galaxy', 'Harbor', 'Tactics', 'Racers']
+PRICES = [Decimal(price) for price in ('20.00', '30.00', '40.00', '50.00', '60.00', '80.00', '100.00')]
+COPIES, COPY_WEIGHTS = [1, 2, 3, 4, 5], [40, 25, 15, 12, 8]
+RENTAL_DAYS = [1, 2, 3, 5, 7, 14, 21, 30]
+RENTAL_DAY_CUM_WEIGHTS = list(itertools.accumulate([10, 18, 22, 15, 18, 10, 4, 3]))
+PAYMENT_METHODS = ['UPI', 'Credit Card', 'Wallet', 'Net Banking']
+# Requests by hour of day: quiet at night, busiest in the evening
+HOURS = range(24)
+HOUR_CUM_WEIGHTS = list(itertools.accumulate([1, 1, 1, 1, 1, 1, 2, 3, 4, 5, 6, 6, 7, 7, 7, 7, 8, 9, 10, 10, 9, 7, 4, 2]))
+
+# Chance a request is turned down, and of being paid for, by status
+DENY_RATE = 0.08
+PAID_RATE = {'approved': 0.6, 'overdue': 0.3, 'returned': 0.92, 'reserved': 0.4}
+
+
+def _minutes(low_hours, high_hours):
+    return [timedelta(minutes=minutes) for minutes in range(round(low_hours * 60), round(high_hours * 60))]
+
+
+# Delays drawn uniformly per rental, picked from tables: creating a
+# timedelta per value would be a good part of the time to seed a million
+DENIAL_DELAYS = _minutes(1, 48)
+APPROVAL_DELAYS = _minutes(0.2, 24)
+PAYMENT_DELAYS = _minutes(0, 24)
+RETURN_DELAYS = _minutes(-24, 48)
+BOOKED_AHEAD = [timedelta(days=days) for days in range(1, 31)]
+RENTAL_PERIODS = {days: timedelta(days=days) for days in RENTAL_DAYS}
+SECONDS = [timedelta(seconds=second) for second in range(60 * 60 * 24)]
+
+# Page cache of the seeding connection on SQLite, in KiB (the default is 2 MB)
+SQLITE_CACHE_KIB = 512 * 1024
+
+# Column order of the rental and payment rows built by the command
+RENTAL_FIELDS = (
+    'id', 'user_id', 'game_id', 'status', 'requested_at', 'approved_at', 'approved_by_id',
+    'rental_days', 'cost', 'payment_status', 'payment_method', 'payment_date', 'transaction_id',
+    'start_date', 'end_date', 'due_at', 'returned_at', 'updated_at',
+)
+PAYMENT_FIELDS = ('id', 'rental_id', 'user_id', 'idempotency_key', 'transaction_id', 'amount', 'method', 'created_at')
+STATUS, PAYMENT_STATUS, PAYMENT_METHOD, PAYMENT_DATE, TRANSACTION_ID = (
+    RENTAL_FIELDS.index(name)
+    for name in ('status', 'payment_status', 'payment_method', 'payment_date', 'transaction_id')
+)
+
+
+@contextmanager
+def _sqlite_bulk_load(tables, drop_indexes):
+    """
+    On SQLite, give the connection a large page cache and, if
+    ``drop_indexes``, drop the secondary indexes of ``tables`` for the
+    duration, recreating them from their stored definitions afterwards.
+    Does nothing on other databases.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA cache_size')
+        cache_size, = cursor.fetchone()
+        cursor.execute(f'PRAGMA cache_size = -{SQLITE_CACHE_KIB}')
+        indexes = []
+        if drop_indexes:
+            # Indexes backing UNIQUE columns have no sql and cannot be dropped
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL "
+                f"AND tbl_name IN ({', '.join(['%s'] * len(tables))})",
+                tables,
+            )
+            indexes = cursor.fetchall()
+            for name, _ in indexes:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for _, sql in indexes:
+                cursor.execute(sql)
+            cursor.execute(f'PRAGMA cache_size = {cache_size}')
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, games and rentals for load testing. Users and games are "
+        "bulk created with one pre-hashed password, rentals and payments inserted in batches "
+        "of raw rows; --seed makes the data reproducible."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=1000)
+        parser.add_argument('--owners', type=int, default=50, help="Student admins; they own the games.")
+        parser.add_argument('--super-admins', type=int, default=2)
+        parser.add_argument('--games', type=int, default=2000)
+        parser.add_argument('--rentals', type=int, default=100000)
+        parser.add_argument('--days', type=int, default=365, help="Rentals are requested over this many past days.")
+        parser.add_argument(
+            '--seed', type=int, default=42,
+            help="Random seed; the same options give the same data, relative to the time of the run.",
+        )
+        parser.add_argument('--prefix', default='seed', help="Username prefix, so several data sets can coexist.")
+        parser.add_argument('--password', default='gamehub123', help="Password of every generated user.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per bulk insert/transaction.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options['owners'] < 1 and options['games']:
+            raise CommandError("Games need at least one owner.")
+        if options['students'] < 1 and options['rentals']:
+            raise CommandError("Rentals need at least one student.")
+        if User.objects.filter(username__startswith=f"{options['prefix']}-").exists():
+            raise CommandError(f"Users prefixed {options['prefix']!r} already exist; pick another --prefix.")
+
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.batch_size = options['batch_size']
+        started = time.monotonic()
+
+        owners, students = self._seed_users(options)
+        games = self._seed_games(options['games'], owners)
+        rentals, payments, out = self._seed_rentals(options['rentals'], options['days'], games, students)
+        self._settle_copies(games, out)
+        rebuild_stats()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(owners) + len(students) + options['super_admins']} user(s), {len(games)} game(s), "
+            f"{rentals} rental(s) and {payments} payment(s) in {time.monotonic() - started:.1f}s. "
+            f"Run `manage.py rollup_rentals --full` to build the report rollups."
+        ))
+
+    def _insert(self, model, rows):
+        for i in range(0, len(rows), self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(rows[i:i + self.batch_size])
+        return rows
+
+    def _seed_users(self, options):
+        password = make_password(options['password'])
+        prefix = options['prefix']
+        users = []
+        for role, count in (
+            ('super_admin', options['super_admins']),
+            ('student_admin', options['owners']),
+            ('student', options['students']),
+        ):
+            users += [
+                User(
+                    username=f'{prefix}-{role}-{i}',
+                    email=f'{prefix}-{role}-{i}@example.com',
+                    password=password,
+                    role=role,
+                    date_joined=self.now - timedelta(days=self.rng.uniform(0, options['days'] + 30)),
+                )
+                for i in range(count)
+            ]
+        self._insert(User, users)
+        self.stdout.write(f"  {len(users)} users")
+        return (
+            [user for user in users if user.role == 'student_admin'],
+            [user for user in users if user.role == 'student'],
+        )
+
+    def _seed_games(self, count, owners):
+        rng = self.rng
+        games = []
+        for i in range(count):
+            copies = rng.choices(COPIES, COPY_WEIGHTS)[0]
+            games.append(Game(
+                title=f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}',
+                description=f'A {rng.choice(ADJECTIVES).lower()} game about {rng.choice(NOUNS).lower()}.',
+                price_per_day=rng.choice(PRICES),
+                total_copies=copies,
+                available_copies=copies,
+                added_by=rng.choice(owners),
+            ))
+        self._insert(Game, games)
+        self.stdout.write(f"  {len(games)} games")
+        return games
+
+    def _seed_rentals(self, count, days, games, students):
+        """
+        Insert ``count`` rentals and their payments as plain tuples through
+        ``executemany``: building model instances and letting bulk_create
+        prepare every value is most of the cost at this volume. Values are
+        what the drivers store directly (naive UTC datetimes, dates, Decimal).
+        """
+        random = self.random = self.rng.random
+        offset = timezone.localtime(self.now).utcoffset()
+        now = self.utc_now = self.now.replace(tzinfo=None)
+        # Local midnight of today, in naive UTC
+        midnight = (now + offset).replace(hour=0, minute=0, second=0, microsecond=0) - offset
+        self.today = (now + offset).date()
+        self.booking_window = now - timedelta(days=14)
+        self.pending_window = now - timedelta(days=1)
+        self.overdue_window = now - RETURN_GRACE
+        games = [(game.pk, game.added_by_id, game.price_per_day) for game in games]
+        out = Counter()
+        student_ids = [student.pk for student in students]
+        costs = {}
+        pending = set()
+        rental_id = (Rental.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        payment_id = (Payment.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+        rentals_made = payments_made = 0
+
+        # Like loaddata, check foreign keys once at the end rather than per
+        # row; building the indexes once afterwards likewise beats updating a
+        # dozen of them row by row, unless the table already dwarfs the new rows
+        tables = [Rental._meta.db_table, Payment._meta.db_table]
+        with connection.constraint_checks_disabled(), _sqlite_bulk_load(tables, drop_indexes=count > rental_id):
+            for batch in self._request_times(count, days, midnight):
+                rentals, payments = [], []
+                for requested_at in batch:
+                    # Same as rng.choice/rng.choices, at a fraction of the cost
+                    game_id, owner_id, price = games[int(random() * len(games))]
+                    user_id = student_ids[int(random() * len(student_ids))]
+                    rental_days = RENTAL_DAYS[bisect(RENTAL_DAY_CUM_WEIGHTS, random() * RENTAL_DAY_CUM_WEIGHTS[-1])]
+                    cost = costs.get((price, rental_days))
+                    if cost is None:
+                        cost = costs[price, rental_days] = quote(price, rental_days)
+
+                    rental = self._lifecycle(
+                        rental_id, user_id, game_id, owner_id, rental_days, cost,
+                        requested_at, (requested_at + offset).date(), pending,
+                    )
+                    rentals.append(rental)
+                    if rental[STATUS] in ('approved', 'overdue'):
+                        out[game_id] += 1
+                    if rental[PAYMENT_STATUS] == 'paid':
+                        payments.append((
+                            payment_id, rental_id, user_id, f'seed-rental-{rental_id}',
+                            rental[TRANSACTION_ID], cost, rental[PAYMENT_METHOD], rental[PAYMENT_DATE],
+                        ))
+                        payment_id += 1
+                    rental_id += 1
+
+                with transaction.atomic():
+                    self._write(Rental, RENTAL_FIELDS, rentals)
+                    self._write(Payment, PAYMENT_FIELDS, payments)
+                rentals_made += len(rentals)
+                payments_made += len(payments)
+                self.stdout.write(f"  {rentals_made} rentals")
+
+        connection.check_constraints(table_names=tables)
+
+        # Ids were given explicitly; backends with sequences must catch up
+        reset = connection.ops.sequence_reset_sql(no_style(), [Rental, Payment])
+        if reset:
+            with connection.cursor() as cursor:
+                for sql in reset:
+                    cursor.execute(sql)
+        return rentals_made, payments_made, out
+
+    def _request_times(self, count, days, midnight):
+        """
+        ``count`` request times over the ``days`` days before today, oldest first and
+        in batches: ids follow request time as they would in production, and
+        the indexes on time columns grow at one end instead of all over.
+        """
+        rng = self.rng
+        batch = []
+        for day in range(days):
+            start = midnight - timedelta(days=days - day)
+            per_day = count * (day + 1) // days - count * day // days
+            seconds = sorted(
+                hour * 3600 + int(rng.random() * 3600)
+                for hour in rng.choices(HOURS, cum_weights=HOUR_CUM_WEIGHTS, k=per_day)
+            )
+            for second in seconds:
+                batch.append(start + SECONDS[second])
+                if len(batch) == self.batch_size:
+                    yield batch
+                    batch = []
+        if batch:
+            yield batch
+
+    def _write(self, model, fields, rows):
+        """``INSERT`` tuples of values for ``fields``, in that order."""
+        if not rows:
+            return
+        quote_name = connection.ops.quote_name
+        columns = [model._meta.get_field(name).column for name in fields]
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote_name(model._meta.db_table),
+            ', '.join(quote_name(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, rows)
+
+    def _lifecycle(self, rental_id, user_id, game_id, owner_id, rental_days, cost, requested_at, start, pending):
+        """
+        A rental row whose status, dates and payment are consistent with its
+        request time, in ``RENTAL_FIELDS`` order.
+        """
+        random, now = self.random, self.utc_now
+        status = 'pending'
+        approved_at = approved_by_id = due_at = returned_at = None
+        payment_status, payment_method, payment_date, transaction_id = 'pending', None, None, None
+        updated_at = requested_at
+        if requested_at > self.booking_window and random() < 0.05:
+            # Booked ahead
+            start += BOOKED_AHEAD[int(random() * len(BOOKED_AHEAD))]
+
+        if requested_at > self.pending_window and random() < 0.7:
+            # Still waiting for the owner; at most one pending request per user and game
+            if (user_id, game_id) in pending:
+                status = 'denied'
+            else:
+                pending.add((user_id, game_id))
+        elif random() < DENY_RATE:
+            status = 'denied'
+            updated_at = min(requested_at + DENIAL_DELAYS[int(random() * len(DENIAL_DELAYS))], now)
+        else:
+            approved_at = updated_at = min(requested_at + APPROVAL_DELAYS[int(random() * len(APPROVAL_DELAYS))], now)
+            approved_by_id = owner_id
+            if start > self.today:
+                status = 'reserved'
+            else:
+                due_at = approved_at + RENTAL_PERIODS[rental_days]
+                if due_at > now:
+                    status = 'approved'
+                elif due_at > self.overdue_window and random() < 0.3:
+                    status = 'overdue'
+                    updated_at = due_at
+                else:
+                    status = 'returned'
+                    returned_at = updated_at = min(due_at + RETURN_DELAYS[int(random() * len(RETURN_DELAYS))], now)
+
+            if random() < PAID_RATE[status]:
+                payment_status = 'paid'
+                payment_method = PAYMENT_METHODS[int(random() * len(PAYMENT_METHODS))]
+                payment_date = min(approved_at + PAYMENT_DELAYS[int(random() * len(PAYMENT_DELAYS))], now)
+                transaction_id = f'TXN-{rental_id:012d}-{int(random() * 0x100000000):08X}'
+                updated_at = max(updated_at, payment_date)
+
+        return (
+            rental_id, user_id, game_id, status, requested_at, approved_at, approved_by_id,
+            rental_days, cost, payment_status, payment_method, payment_date, transaction_id,
+            start, start + RENTAL_PERIODS[rental_days], due_at, returned_at, updated_at,
+        )
+
+    def _settle_copies(self, games, out):
+        """Match every game's shelf count to its ``out`` active rentals, adding copies where needed."""
+        for game in games:
+            game.total_copies = max(game.total_copies, out[game.pk])
+            game.available_copies = game.total_copies - out[game.pk]
+        Game.objects.bulk_update(games, ['total_copies', 'available_copies'], batch_size=self.batch_size)
+        bump_catalog_version(self.now)
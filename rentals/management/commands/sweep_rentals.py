@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from rentals.models import Rental
+from rentals.services import (
+    RETURN_GRACE, SWEEP_BATCH_SIZE, RentalError, mark_overdue, return_expired, start_reservations,
+)
+from rentals.stats import ACTIVE_STATUSES
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark approved rentals past their due date as overdue, and close rentals "
+        "overdue for longer than the grace period as returned, putting their copies back on the shelf. "
+        "Reservations whose start date has come take their copy and become approved. "
+        "Safe to run repeatedly, e.g. from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-days', type=int, default=RETURN_GRACE.days,
+            help="Days after the due date before a rental is closed as returned.",
+        )
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE, help="Rentals per UPDATE/transaction.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would change.")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        if options['grace_days'] < 0:
+            raise CommandError("--grace-days cannot be negative.")
+
+        now = timezone.now()
+        grace = timedelta(days=options['grace_days'])
+
+        if options['dry_run']:
+            expired = Rental.objects.filter(status__in=ACTIVE_STATUSES, due_at__lte=now - grace).count()
+            overdue = Rental.objects.filter(status='approved', due_at__gt=now - grace, due_at__lte=now).count()
+            starting = Rental.objects.filter(status='reserved', start_date__lte=timezone.localdate(now)).count()
+            self.stdout.write(
+                f"Would return {expired} rental(s), start up to {starting} reservation(s) and mark {overdue} overdue."
+            )
+            return
+
+        # Return first, so rentals past the grace period skip the overdue step
+        # ...and reservations can start with the copies that came back
+        returned, copies = return_expired(now, grace=grace, batch_size=options['batch_size'])
+        try:
+            started = start_reservations(now, batch_size=options['batch_size'])
+        except RentalError as exc:
+            raise CommandError(str(exc))
+        overdue = mark_overdue(now, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Returned {returned} rental(s) ({copies} cop(ies) back on the shelf), "
+            f"started {started} reservation(s), marked {overdue} overdue."
+        ))
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:27
+
+import django.db.models.deletion
+from django.conf import settings
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def populate_stats(apps, schema_editor):
+    Rental = apps.get_model('rentals', 'Rental')
+    RentalStats = apps.get_model('rentals', 'RentalStats')
+
+    def counters(prefix, paid_field):
+        return {
+            f'{prefix}_total': Count('id'),
+            f'{prefix}_active': Count('id', filter=Q(status__in=['approved', 'ongoing'])),
+            f'{prefix}_completed': Count('id', filter=Q(status='returned')),
+            paid_field: Sum('cost', filter=Q(payment_status='paid'), default=Decimal('0')),
+        }
+
+    stats = {}
+    for row in Rental.objects.values('user_id').annotate(**counters('rentals', 'spent_paid')).order_by():
+        stats.setdefault(row.pop('user_id'), {}).update(row)
+    owner_rows = (
+        Rental.objects.filter(game__added_by__isnull=False)
+        .values('game__added_by').annotate(**counters('received', 'revenue_paid')).order_by()
+    )
+    for row in owner_rows:
+        stats.setdefault(row.pop('game__added_by'), {}).update(row)
+    RentalStats.objects.bulk_create([RentalStats(user_id=k, **v) for k, v in stats.items()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0004_rental_payment_date_rental_payment_method_and_more'),
+        ('games', '0002_game_added_by'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentalStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rental_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('rentals_total', models.IntegerField(default=0)),
+                ('rentals_active', models.IntegerField(default=0)),
+                ('rentals_completed', models.IntegerField(default=0)),
+                ('spent_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('received_total', models.IntegerField(default=0)),
+                ('received_active', models.IntegerField(default=0)),
+                ('received_completed', models.IntegerField(default=0)),
+                ('revenue_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:28
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0007_game_updated_at'),
+        ('rentals', '0005_rentalstats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['requested_at', 'id'], name='rental_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['status', 'requested_at', 'id'], name='rental_status_requested_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['payment_status', 'requested_at', 'id'], name='rental_payment_requested_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_ledger(apps, schema_editor):
+    Rental = apps.get_model('rentals', 'Rental')
+    Payment = apps.get_model('rentals', 'Payment')
+    paid = Rental.objects.filter(payment_status='paid').values_list(
+        'id', 'user_id', 'cost', 'payment_method', 'payment_date', 'transaction_id'
+    )
+    Payment.objects.bulk_create([
+        Payment(
+            rental_id=rental_id,
+            user_id=user_id,
+            idempotency_key=f"legacy-{rental_id}",
+            transaction_id=transaction_id or f"TXN-LEGACY-{rental_id}",
+            amount=cost or 0,
+            method=method or "Mock Method",
+            created_at=paid_at or timezone.now(),
+        )
+        for rental_id, user_id, cost, method, paid_at, transaction_id in paid.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0006_rental_dashboard_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Payment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64, unique=True)),
+                ('transaction_id', models.CharField(max_length=50, unique=True)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('method', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('rental', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payment', to='rentals.rental')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payments', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:31
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_due_at(apps, schema_editor):
+    Rental = apps.get_model('rentals', 'Rental')
+    approved = Rental.objects.filter(status='approved', approved_at__isnull=False, due_at__isnull=True)
+    for days in approved.values_list('rental_days', flat=True).distinct().order_by():
+        approved.filter(rental_days=days).update(due_at=F('approved_at') + timedelta(days=days))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0007_payment_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rental',
+            name='due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rental',
+            name='returned_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='rental',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('denied', 'Denied'), ('overdue', 'Overdue'), ('returned', 'Returned')], default='pending', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['status', 'due_at'], name='rental_status_due_idx'),
+        ),
+        migrations.RunPython(backfill_due_at, migrations.RunPython.noop),
+    ]
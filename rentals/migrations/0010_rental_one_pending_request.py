@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:35
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def deny_duplicate_requests(apps, schema_editor):
+    # Keep the oldest pending request per (user, game); the rest become
+    # denied. Neither status counts towards RentalStats.
+    Rental = apps.get_model('rentals', 'Rental')
+    seen = set()
+    duplicates = []
+    pending = Rental.objects.filter(status='pending').order_by('requested_at', 'id')
+    for rental_id, user_id, game_id in pending.values_list('id', 'user_id', 'game_id').iterator():
+        if (user_id, game_id) in seen:
+            duplicates.append(rental_id)
+        seen.add((user_id, game_id))
+    for i in range(0, len(duplicates), 500):
+        Rental.objects.filter(id__in=duplicates[i:i + 500]).update(status='denied', updated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0007_game_updated_at'),
+        ('rentals', '0009_daily_rollups'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(deny_duplicate_requests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='rental',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'pending')), fields=('user', 'game'), name='rental_one_pending_request'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-18 00:41
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_periods(apps, schema_editor):
+    # Existing rentals started when they were approved (or requested)
+    Rental = apps.get_model('rentals', 'Rental')
+    batch = []
+    for rental in Rental.objects.only('id', 'requested_at', 'approved_at', 'rental_days').iterator():
+        rental.start_date = timezone.localdate(rental.approved_at or rental.requested_at)
+        rental.end_date = rental.start_date + timedelta(days=rental.rental_days)
+        batch.append(rental)
+        if len(batch) >= 1000:
+            Rental.objects.bulk_update(batch, ['start_date', 'end_date'])
+            batch = []
+    Rental.objects.bulk_update(batch, ['start_date', 'end_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0011_waitlist'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rental',
+            name='end_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='rental',
+            name='start_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='rental',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('reserved', 'Reserved'), ('approved', 'Approved'), ('denied', 'Denied'), ('overdue', 'Overdue'), ('returned', 'Returned')], default='pending', max_length=10),
+        ),
+        migrations.RunPython(backfill_periods, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['game', 'end_date', 'start_date'], name='rental_game_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['status', 'start_date'], name='rental_status_start_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('games', '0009_catalog_version'),
+        ('rentals', '0013_rentalrequestcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['approved_at'], name='rental_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rental',
+            index=models.Index(fields=['payment_status', 'payment_date'], name='rental_paid_date_idx'),
+        ),
+    ]
@@ -2,13 +2,23 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from games.models import Game
+from .pricing import quote
+from datetime import timedelta
 import uuid
 
+def due_at_for(taken_at, rental_days):
+    """When a rental whose copy left the shelf at ``taken_at`` is due back."""
+    return taken_at + timedelta(days=rental_days)
+
+
 class Rental(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
+        ('reserved', 'Reserved'),
         ('approved', 'Approved'),
         ('denied', 'Denied'),
+        ('overdue', 'Overdue'),
+        ('returned', 'Returned'),
     ]
 
     PAYMENT_STATUS_CHOICES = [
@@ -16,6 +26,10 @@ class Rental(models.Model):
         ('paid', 'Paid'),
     ]
 
+    # Approved rentals that hold a copy now (approved, overdue) or for a
+    # future period (reserved)
+    ACTIVE_STATUSES = ('reserved', 'approved', 'overdue')
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     game = models.ForeignKey(Game, on_delete=models.CASCADE)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
@@ -45,9 +59,53 @@ class Rental(models.Model):
     payment_date = models.DateTimeField(null=True, blank=True)
     transaction_id = models.CharField(max_length=50, null=True, blank=True)
 
+    # Booked period, end exclusive: end_date = start_date + rental_days
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+
+    # Loan period, set on approval; `manage.py sweep_rentals` acts on it
+    due_at = models.DateTimeField(null=True, blank=True)
+    returned_at = models.DateTimeField(null=True, blank=True)
+
+    # Bumped by every change, including queryset updates in rentals.services;
+    # the daily rollups use it as their watermark
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the dashboards, optionally filtered by status
+            models.Index(fields=['requested_at', 'id'], name='rental_requested_idx'),
+            models.Index(fields=['status', 'requested_at', 'id'], name='rental_status_requested_idx'),
+            models.Index(fields=['payment_status', 'requested_at', 'id'], name='rental_payment_requested_idx'),
+            # Sweeper: active rentals by due date
+            models.Index(fields=['status', 'due_at'], name='rental_status_due_idx'),
+            # Overlap checks: end_date > x skips a game's past rentals
+            models.Index(fields=['game', 'end_date', 'start_date'], name='rental_game_period_idx'),
+            # Sweeper: reservations by start date
+            models.Index(fields=['status', 'start_date'], name='rental_status_start_idx'),
+            # Daily rollups: approvals and paid revenue by day
+            models.Index(fields=['approved_at'], name='rental_approved_idx'),
+            models.Index(fields=['payment_status', 'payment_date'], name='rental_paid_date_idx'),
+        ]
+        constraints = [
+            # A user can have only one open request per game
+            models.UniqueConstraint(
+                fields=['user', 'game'],
+                condition=models.Q(status='pending'),
+                name='rental_one_pending_request',
+            ),
+        ]
+
     def calculate_cost(self):
         """Calculate total rental cost"""
-        return self.rental_days * self.game.price_per_day
+        return quote(self.game.price_per_day, self.rental_days)
+
+    def calculate_due_at(self):
+        return due_at_for(self.approved_at, self.rental_days)
+
+    @property
+    def awaiting_payment(self):
+        return self.status in self.ACTIVE_STATUSES and self.payment_status == 'pending'
 
     def save(self, *args, **kwargs):
         # Auto-calc cost before saving
@@ -55,8 +113,172 @@ class Rental(models.Model):
             self.cost = self.calculate_cost()
             if not self.approved_at:
                 self.approved_at = timezone.now()
+        if self.status == 'approved' and self.approved_at and self.due_at is None:
+            self.due_at = self.calculate_due_at()
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.username} - {self.game.title} ({self.status})"
 
+
+
+class RentalStats(models.Model):
+    """
+    Denormalised rental counters for one user, as renter and as game owner.
+
+    Maintained by rentals.stats in the same transaction as every rental
+    change; `manage.py rebuild_rental_stats` recomputes it from scratch.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="rental_stats"
+    )
+
+    # Rentals this user made
+    rentals_total = models.IntegerField(default=0)
+    rentals_active = models.IntegerField(default=0)
+    rentals_completed = models.IntegerField(default=0)
+    spent_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    # Rentals of games this user added
+    received_total = models.IntegerField(default=0)
+    received_active = models.IntegerField(default=0)
+    received_completed = models.IntegerField(default=0)
+    revenue_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Rental stats for {self.user}"
+
+
+class Payment(models.Model):
+    """
+    Append-only ledger of rental payments.
+
+    `idempotency_key` comes from the payment form, so a resubmitted form maps
+    to the payment it already created; a rental can only be paid once.
+    Rows outlive the rental or user they refer to.
+    """
+    rental = models.OneToOneField(
+        Rental, on_delete=models.SET_NULL, null=True, blank=True, related_name="payment"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="payments"
+    )
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    transaction_id = models.CharField(max_length=50, unique=True)
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+    method = models.CharField(max_length=50)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.transaction_id} ({self.amount})"
+
+
+# ---- Daily rollups (maintained by `manage.py rollup_rentals`) ----
+
+class DailyGameRollup(models.Model):
+    """
+    One game's rental activity on one day. Requests count by `requested_at`,
+    approvals and rented days by `approved_at`, revenue by `payment_date`.
+    """
+    day = models.DateField()
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="daily_rollups")
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    requests = models.PositiveIntegerField(default=0)
+    approvals = models.PositiveIntegerField(default=0)
+    rented_days = models.PositiveIntegerField(default=0)
+    revenue_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'game'], name='rollup_day_game_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.game_id} on {self.day}"
+
+
+class DailyOwnerRollup(models.Model):
+    """The DailyGameRollup rows of one owner's games, summed per day."""
+    day = models.DateField()
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="daily_rollups")
+    requests = models.PositiveIntegerField(default=0)
+    approvals = models.PositiveIntegerField(default=0)
+    rented_days = models.PositiveIntegerField(default=0)
+    revenue_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'day'], name='rollup_owner_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner_id} on {self.day}"
+
+
+class RollupWatermark(models.Model):
+    """Rentals changed after `value` have not been rolled up yet."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+# ---- Waitlist ----
+
+class Waitlist(models.Model):
+    """
+    Queue summary for one game, kept in step with its WaitlistEntry rows by
+    rentals.waitlist so that depth and head are a single-row read.
+    """
+    game = models.OneToOneField(Game, on_delete=models.CASCADE, primary_key=True, related_name="waitlist")
+    length = models.PositiveIntegerField(default=0)
+    next_position = models.PositiveIntegerField(default=1)
+    head_user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Waitlist for {self.game_id} ({self.length})"
+
+
+class WaitlistEntry(models.Model):
+    """A student waiting for a game; the lowest position is served first."""
+    game = models.ForeignKey(Game, on_delete=models.CASCADE, related_name="waitlist_entries")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="waitlist_entries")
+    position = models.PositiveIntegerField()
+    rental_days = models.PositiveIntegerField(default=7)
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['game', 'position'], name='waitlist_game_position_uniq'),
+            models.UniqueConstraint(fields=['game', 'user'], name='waitlist_game_user_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} waiting for {self.game_id} (#{self.position})"
+
+
+class RentalRequestCounter(models.Model):
+    """
+    One user's rental requests in the current throttle window; see
+    rentals.throttle. The row is reused from window to window.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="+"
+    )
+    # Unix time the window started at
+    window_start = models.BigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.count} requests since {self.window_start}"
@@ -0,0 +1,82 @@
+"""
+Rental prices, in exact ``Decimal``.
+
+Every cost shown or stored goes through ``quote``, so the request page, the
+stored ``Rental.cost`` and the payment amount always agree. Full weeks are
+billed at ``settings.RENTAL_WEEK_PRICE_DAYS`` days' price and the days
+left over at the daily price, discounted by ``settings.RENTAL_DAY_TIERS``
+for longer rentals. The rates live in settings only; the shipped ones bill
+every day at the daily price.
+
+``quote_many`` prices many ``(game_id, days)`` pairs at once against a
+price table kept in the default cache (``post_save``/``post_delete`` of a
+game drop its entry, see rentals.signals), so a batch of quotes needs at
+most one query for the prices that are not cached.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from games.models import Game
+
+MAX_RENTAL_DAYS = 30
+
+WEEK_DAYS = 7
+
+PRICE_CACHE_TIMEOUT = 60 * 5
+
+CENT = Decimal('0.01')
+
+
+def _tier(days):
+    tiers = settings.RENTAL_DAY_TIERS
+    multiplier = tiers[0][1]
+    for min_days, tier_multiplier in tiers:
+        if days >= min_days:
+            multiplier = tier_multiplier
+    return Decimal(multiplier)
+
+
+def quote(price_per_day, days):
+    """Total cost of renting at ``price_per_day`` for ``days`` days."""
+    price_per_day = Decimal(price_per_day)
+    weeks, extra = divmod(days, WEEK_DAYS)
+    total = weeks * settings.RENTAL_WEEK_PRICE_DAYS * price_per_day + extra * price_per_day * _tier(days)
+    return total.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def price_cache_key(game_id):
+    return f"game-price:{game_id}"
+
+
+def price_table(game_ids):
+    """``{game_id: price_per_day}`` for the existing games among ``game_ids``."""
+    game_ids = set(game_ids)
+    cached = cache.get_many([price_cache_key(game_id) for game_id in game_ids])
+    prices = {game_id: cached[price_cache_key(game_id)] for game_id in game_ids if price_cache_key(game_id) in cached}
+
+    missing = game_ids - prices.keys()
+    if missing:
+        fresh = dict(Game.objects.filter(id__in=missing).values_list('id', 'price_per_day'))
+        cache.set_many({price_cache_key(game_id): price for game_id, price in fresh.items()}, PRICE_CACHE_TIMEOUT)
+        prices.update(fresh)
+    return prices
+
+
+def invalidate_prices(game_ids):
+    cache.delete_many([price_cache_key(game_id) for game_id in game_ids])
+
+
+def quote_many(pairs):
+    """
+    Quote every ``(game_id, days)`` pair; returns ``{(game_id, days): cost}``,
+    leaving out pairs whose game does not exist.
+    """
+    pairs = list(pairs)
+    prices = price_table(game_id for game_id, _ in pairs)
+    return {
+        (game_id, days): quote(prices[game_id], days)
+        for game_id, days in pairs
+        if game_id in prices
+    }
@@ -0,0 +1,98 @@
+"""
+Booked periods of rentals, for overlap checks and the availability calendar.
+
+A rental holds one copy of its game for ``[start_date, end_date)`` once it
+is approved or reserved (overdue ones until they come back). Periods are
+looked up with one range query on the ``(game, end_date, start_date)``
+index: ``end_date > start`` skips a game's finished rentals, so the cost
+does not grow with its history.
+"""
+import calendar
+import datetime
+from collections import Counter, defaultdict
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Rental
+
+# How far ahead students can book
+BOOKING_HORIZON_DAYS = 90
+
+
+def period_for(start_date, rental_days):
+    return start_date, start_date + datetime.timedelta(days=rental_days)
+
+
+def booked(game_ids, start, end, exclude=None):
+    """Rentals holding a copy of any of ``game_ids`` on some day in ``[start, end)``."""
+    rentals = Rental.objects.filter(
+        Q(end_date__gt=start) | Q(status='overdue'),
+        game_id__in=game_ids,
+        start_date__lt=end,
+        status__in=Rental.ACTIVE_STATUSES,
+    )
+    if exclude:
+        rentals = rentals.exclude(pk__in=exclude)
+    return rentals
+
+
+def daily_load(game_ids, start, end, exclude=None):
+    """``{game_id: Counter(day -> copies booked)}`` for days in ``[start, end)``."""
+    load = defaultdict(Counter)
+    # Overdue rentals keep their copy until they come back, at least today
+    still_out = timezone.localdate() + datetime.timedelta(days=1)
+    rows = booked(game_ids, start, end, exclude).values_list('game_id', 'start_date', 'end_date', 'status')
+    for game_id, booked_from, booked_to, status in rows:
+        if status == 'overdue':
+            booked_to = max(booked_to, still_out)
+        day = max(booked_from, start)
+        while day < min(booked_to, end):
+            load[game_id][day] += 1
+            day += datetime.timedelta(days=1)
+    return load
+
+
+def has_room(load, total_copies, start, end):
+    """True if another copy can be booked for every day of ``[start, end)``."""
+    day = start
+    while day < end:
+        if load[day] >= total_copies:
+            return False
+        day += datetime.timedelta(days=1)
+    return True
+
+
+def book(load, start, end):
+    day = start
+    while day < end:
+        load[day] += 1
+        day += datetime.timedelta(days=1)
+
+
+def month_calendar(game, year, month):
+    """
+    Free and busy intervals of ``game`` for one month, as a list of
+    ``{"start", "end", "status", "available"}`` (``end`` exclusive), merging
+    consecutive days with the same number of free copies.
+    """
+    start = datetime.date(year, month, 1)
+    end = start + datetime.timedelta(days=calendar.monthrange(year, month)[1])
+    load = daily_load([game.pk], start, end)[game.pk]
+
+    intervals = []
+    day = start
+    while day < end:
+        available = max(game.total_copies - load[day], 0)
+        if intervals and intervals[-1]['available'] == available:
+            intervals[-1]['end'] = day + datetime.timedelta(days=1)
+        else:
+            intervals.append({
+                'start': day,
+                'end': day + datetime.timedelta(days=1),
+                'status': 'free' if available else 'busy',
+                'available': available,
+            })
+        day += datetime.timedelta(days=1)
+    return intervals
+
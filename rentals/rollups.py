@@ -0,0 +1,158 @@
+"""
+Daily per-game and per-owner rental rollups.
+
+``DailyGameRollup`` rows are recomputed one whole day at a time from the
+Rental table, so refreshing a day is idempotent. ``refresh_rollups`` finds
+the days touched by rentals changed since the stored watermark
+(``Rental.updated_at``) and recomputes just those; ``DailyOwnerRollup`` is
+then summed from the game rows. Reports read the rollup tables only.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyGameRollup, DailyOwnerRollup, Rental, RollupWatermark
+
+WATERMARK = 'daily_rentals'
+
+# Rentals changed this long before the previous run are looked at again, so
+# a transaction that committed late (with an older updated_at) isn't missed.
+WATERMARK_OVERLAP = datetime.timedelta(minutes=5)
+
+DAYS_PER_TRANSACTION = 31
+
+METRICS = ('requests', 'approvals', 'rented_days', 'revenue_paid')
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, start + datetime.timedelta(days=1)
+
+
+def _on_days(field, days, filters):
+    """
+    ``Q`` matching ``field`` on any of ``days``, as index-friendly ranges.
+    ``filters`` are repeated in every range so SQLite can search an index
+    on ``(filter columns..., field)`` once per day.
+    """
+    clauses = []
+    for day in days:
+        start, end = _day_bounds(day)
+        clauses.append(Q(**filters, **{f'{field}__gte': start, f'{field}__lt': end}))
+    return reduce(or_, clauses)
+
+
+def _grouped(field, days, filters, **aggregates):
+    return (
+        Rental.objects.filter(_on_days(field, days, filters))
+        .annotate(day=TruncDate(field))
+        .values('day', 'game_id', 'game__added_by')
+        .annotate(**aggregates)
+        .order_by()
+    )
+
+
+def compute_game_rollups(days):
+    """Return unsaved ``DailyGameRollup`` rows for ``days``."""
+    rows = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    owners = {}
+    queries = [
+        _grouped('requested_at', days, {}, requests=Count('id')),
+        _grouped('approved_at', days, {}, approvals=Count('id'), rented_days=Sum('rental_days')),
+        _grouped('payment_date', days, {'payment_status': 'paid'}, revenue_paid=Sum('cost', default=Decimal('0'))),
+    ]
+    for query in queries:
+        for row in query:
+            key = (row.pop('day'), row.pop('game_id'))
+            owners[key] = row.pop('game__added_by')
+            rows[key].update(row)
+
+    return [
+        DailyGameRollup(day=day, game_id=game_id, owner_id=owners[day, game_id], **metrics)
+        for (day, game_id), metrics in rows.items()
+    ]
+
+
+@transaction.atomic
+def refresh_days(days):
+    """Recompute the game and owner rollups of ``days``; returns game rows written."""
+    days = sorted(set(days))
+    if not days:
+        return 0
+    DailyGameRollup.objects.filter(day__in=days).delete()
+    game_rows = DailyGameRollup.objects.bulk_create(compute_game_rollups(days), batch_size=1000)
+
+    DailyOwnerRollup.objects.filter(day__in=days).delete()
+    owner_rows = (
+        DailyGameRollup.objects.filter(day__in=days, owner__isnull=False)
+        .values('day', 'owner_id')
+        .annotate(**{metric: Sum(metric) for metric in METRICS})
+        .order_by()
+    )
+    DailyOwnerRollup.objects.bulk_create([DailyOwnerRollup(**row) for row in owner_rows], batch_size=1000)
+    return len(game_rows)
+
+
+def changed_days(since):
+    """Days whose rollups are affected by rentals changed after ``since``."""
+    changed = Rental.objects.all() if since is None else Rental.objects.filter(updated_at__gt=since)
+    days = set()
+    for dates in changed.values_list('requested_at', 'approved_at', 'payment_date').iterator():
+        days.update(timezone.localdate(value) for value in dates if value is not None)
+    return days
+
+
+def refresh_rollups(full=False):
+    """
+    Bring the rollups up to date and move the watermark forward.
+
+    Returns ``(days_refreshed, game_rows_written)``. With ``full`` (or on the
+    first run) every day with rental activity is recomputed and rollups for
+    days without any are dropped; deleted rentals are only noticed this way.
+    """
+    started = timezone.now()
+    watermark = RollupWatermark.objects.filter(name=WATERMARK).first()
+    if full or watermark is None:
+        since = None
+    else:
+        since = watermark.value - WATERMARK_OVERLAP
+
+    days = sorted(changed_days(since))
+    if since is None:
+        DailyGameRollup.objects.exclude(day__in=days).delete()
+        DailyOwnerRollup.objects.exclude(day__in=days).delete()
+
+    written = 0
+    for i in range(0, len(days), DAYS_PER_TRANSACTION):
+        written += refresh_days(days[i:i + DAYS_PER_TRANSACTION])
+
+    RollupWatermark.objects.update_or_create(name=WATERMARK, defaults={'value': started})
+    return len(days), written
+
+
+def report(date_from, date_to, owner=None):
+    """
+    Per-day and per-game totals for ``date_from``..``date_to`` (inclusive),
+    for one owner or for everyone, read from the rollup tables only.
+    """
+    metrics = {metric: Sum(metric) for metric in METRICS}
+    if owner is not None:
+        daily = DailyOwnerRollup.objects.filter(owner=owner, day__range=(date_from, date_to))
+        games = DailyGameRollup.objects.filter(owner=owner, day__range=(date_from, date_to))
+    else:
+        daily = DailyGameRollup.objects.filter(day__range=(date_from, date_to))
+        games = daily
+
+    by_day = list(daily.values('day').annotate(**metrics).order_by('day'))
+    by_game = list(
+        games.values('game_id', 'game__title').annotate(**metrics).order_by('-revenue_paid', 'game__title')
+    )
+    totals = {metric: sum(row[metric] for row in by_day) for metric in METRICS}
+    return {'by_day': by_day, 'by_game': by_game, 'totals': totals}
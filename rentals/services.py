@@ -0,0 +1,477 @@
+"""
+State changes for rentals.
+
+Everything that moves a rental between statuses goes through here so the
+rental row and its game's availability always change in one transaction.
+Callers handle ``RentalError`` by showing the message to the user.
+"""
+import uuid
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DateField, DateTimeField, DecimalField, F, IntegerField, Q, Value, When
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from games.models import Game, bump_catalog_version
+from .models import Payment, Rental, due_at_for
+from .pricing import quote
+from .reservations import book, daily_load, has_room, period_for
+from .stats import ACTIVE_STATUSES, RentalChange, RentalState, record_change, record_changes, state_of
+from .waitlist import promote_waitlist
+
+
+class RentalError(Exception):
+    pass
+
+
+# The dashboards post "Rejected"; the model calls it "denied".
+STATUS_ALIASES = {'rejected': 'denied'}
+
+
+def normalize_status(status):
+    status = status.lower()
+    return STATUS_ALIASES.get(status, status)
+
+
+def can_manage(user, rental):
+    return user.is_superuser or rental.game.added_by_id == user.pk
+
+
+def _claim_pending(rental_id, **changes):
+    """
+    Move a pending rental on with a conditional UPDATE.
+
+    Doing the write first means concurrent callers queue on the row (or, on
+    SQLite, on the database write lock) instead of reading stale state, and
+    only one of them can ever see the rental as pending.
+    """
+    changes.setdefault('updated_at', timezone.now())
+    if Rental.objects.filter(pk=rental_id, status='pending').update(**changes):
+        return Rental.objects.select_related('game').get(pk=rental_id)
+
+    current = Rental.objects.filter(pk=rental_id).values_list('status', flat=True).first()
+    if current is None:
+        raise RentalError("Rental not found.")
+    raise RentalError(f"Rental is already {current}.")
+
+
+def _per_game(counts):
+    return Case(
+        *[When(pk=game_id, then=Value(count)) for game_id, count in counts.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def _take_copies(counts, now):
+    """
+    Take ``counts[game_id]`` copies of each game off the shelf in one
+    conditional UPDATE. Returns False, leaving some games untouched, if any
+    of them no longer has that many copies; callers roll back then.
+
+    The ``available_copies >= n`` check and the decrement happen in the same
+    statement, so concurrent approvals can't oversell a game and no lock is
+    held beyond the game rows being written.
+    """
+    enough = reduce(or_, (Q(pk=game_id, available_copies__gte=count) for game_id, count in counts.items()))
+    updated = Game.objects.filter(enough).update(
+        available_copies=F('available_copies') - _per_game(counts), updated_at=now,
+    )
+    if updated:
+        bump_catalog_version(now)
+    return updated == len(counts)
+
+
+def _return_copies(counts, now):
+    """Put ``counts[game_id]`` copies of each game back on the shelf."""
+    Game.objects.filter(pk__in=counts).update(
+        available_copies=Least(F('available_copies') + _per_game(counts), F('total_copies')),
+        updated_at=now,
+    )
+    bump_catalog_version(now)
+
+
+def _due_at(durations, now):
+    """``due_at`` by ``rental_days`` for rentals whose copies leave the shelf at ``now``."""
+    return Case(
+        *[When(rental_days=days, then=Value(due_at_for(now, days))) for days in durations],
+        output_field=DateTimeField(),
+    )
+
+
+def _schedule(rental, today):
+    """The period ``rental`` would be booked for if approved on ``today``."""
+    return period_for(max(rental.start_date or today, today), rental.rental_days)
+
+
+@transaction.atomic
+def approve_rental(rental_id, approver):
+    """
+    Approve a pending rental.
+
+    A rental starting today takes a copy of its game off the shelf; one
+    booked for a later date becomes ``reserved`` and takes its copy when it
+    starts (see ``start_reservations``). Either way no day of the booked
+    period may already have every copy booked. Copies move with conditional
+    UPDATEs, so of several concurrent approvals only as many succeed as there
+    are copies. Any failure rolls the rental back to pending.
+    """
+    now = timezone.now()
+    today = timezone.localdate(now)
+    rental = _claim_pending(rental_id, status='approved', approved_at=now, approved_by=approver, updated_at=now)
+    before = RentalState('pending', rental.payment_status, rental.cost)
+    # Row lock so date checks for one game run one at a time
+    game = Game.objects.select_for_update().get(pk=rental.game_id)
+
+    start, end = _schedule(rental, today)
+    load = daily_load([game.pk], start, end, exclude=[rental.pk])[game.pk]
+    if not has_room(load, game.total_copies, start, end):
+        raise RentalError(f"{game.title} is fully booked between {start:%d %b} and {end:%d %b}.")
+
+    rental.start_date, rental.end_date = start, end
+    update_fields = ['start_date', 'end_date', 'updated_at']
+    if start > today:
+        rental.status = 'reserved'
+        update_fields.append('status')
+    else:
+        if not _take_copies({game.pk: 1}, now):
+            raise RentalError(f"Every copy of {game.title} is rented out.")
+        rental.due_at = due_at_for(now, rental.rental_days)
+        update_fields.append('due_at')
+    if not rental.cost:
+        rental.cost = quote(game.price_per_day, rental.rental_days)
+        update_fields.append('cost')
+    rental.save(update_fields=update_fields)
+    record_change(rental, before, state_of(rental))
+    return rental
+
+
+@transaction.atomic
+def deny_rental(rental_id, actor=None):
+    rental = _claim_pending(rental_id, status='denied')
+    record_change(rental, RentalState('pending', rental.payment_status, rental.cost), state_of(rental))
+    promote_waitlist([rental.game_id])
+    return rental
+
+
+def set_rental_status(rental_id, new_status, actor):
+    status = normalize_status(new_status)
+    if status == 'approved':
+        return approve_rental(rental_id, actor)
+    if status == 'denied':
+        return deny_rental(rental_id, actor)
+    raise RentalError(f"Unknown rental status {new_status!r}.")
+
+
+# Upper bound on one bulk request, so a single POST can't lock half the table
+BULK_MAX_RENTALS = 500
+
+
+@transaction.atomic
+def bulk_set_status(actor, rental_ids, new_status):
+    """
+    Approve or deny many rentals in one round trip.
+
+    Ownership and state are checked with one query and the changes applied
+    with set-based UPDATEs. Approval follows the same rules as
+    ``approve_rental``; when the selected rentals want more copies of a
+    game than it has, the oldest requests win. Returns
+    ``{rental_id: {"ok": bool, ...}}`` with a result for every requested id.
+    """
+    status = normalize_status(new_status)
+    if status not in ('approved', 'denied'):
+        raise RentalError(f"Unknown rental status {new_status!r}.")
+    rental_ids = list(dict.fromkeys(rental_ids))
+    if len(rental_ids) > BULK_MAX_RENTALS:
+        raise RentalError(f"At most {BULK_MAX_RENTALS} rentals can be updated at once.")
+
+    rentals = Rental.objects.select_for_update().filter(id__in=rental_ids)
+    if not actor.is_superuser:
+        rentals = rentals.filter(game__added_by=actor)
+    found = {
+        row['id']: row
+        for row in rentals.order_by('requested_at', 'id').values(
+            'id', 'status', 'game_id', 'user_id', 'game__added_by', 'payment_status', 'cost',
+            'rental_days', 'start_date',
+        )
+    }
+
+    results = {}
+    pending = []
+    for rental_id in rental_ids:
+        if rental_id not in found:
+            results[rental_id] = {'ok': False, 'error': "Rental not found or not yours to manage."}
+        elif found[rental_id]['status'] != 'pending':
+            results[rental_id] = {'ok': False, 'error': f"Rental is already {found[rental_id]['status']}."}
+        else:
+            pending.append(rental_id)
+
+    def stats_changes(rental_ids, new_status):
+        return [
+            RentalChange(
+                row['user_id'], row['game__added_by'],
+                RentalState('pending', row['payment_status'], row['cost']),
+                RentalState(new_status, row['payment_status'], row['cost']),
+            )
+            for row in map(found.get, rental_ids)
+        ]
+
+    now = timezone.now()
+    if status == 'denied':
+        Rental.objects.filter(id__in=pending, status='pending').update(status='denied', updated_at=now)
+        record_changes(stats_changes(pending, 'denied'))
+        promote_waitlist({found[rental_id]['game_id'] for rental_id in pending})
+        results.update({rental_id: {'ok': True, 'status': 'denied'} for rental_id in pending})
+        return results
+    if not pending:
+        return results
+
+    # Oldest request first (`found` is in request order)
+    today = timezone.localdate(now)
+    pending = set(pending)
+    by_game = {}
+    periods = {}
+    for rental_id, row in found.items():
+        if rental_id in pending:
+            by_game.setdefault(row['game_id'], []).append(rental_id)
+            periods[rental_id] = period_for(max(row['start_date'] or today, today), row['rental_days'])
+    stock, prices = {}, {}
+    for game_id, available, total, price in (
+        Game.objects.select_for_update().filter(id__in=by_game)
+        .values_list('id', 'available_copies', 'total_copies', 'price_per_day')
+    ):
+        stock[game_id], prices[game_id] = (available, total), price
+    loads = daily_load(by_game, today, max(end for _, end in periods.values()))
+
+    approved, reserved, taken = [], [], {}
+    for game_id, candidates in by_game.items():
+        on_shelf, total = stock[game_id]
+        for rental_id in candidates:
+            start, end = periods[rental_id]
+            if not has_room(loads[game_id], total, start, end):
+                results[rental_id] = {'ok': False, 'error': "The game is fully booked for those dates."}
+                continue
+            if start > today:
+                reserved.append(rental_id)
+            elif taken.get(game_id, 0) < on_shelf:
+                taken[game_id] = taken.get(game_id, 0) + 1
+                approved.append(rental_id)
+            else:
+                results[rental_id] = {'ok': False, 'error': "Every copy of this game is rented out."}
+                continue
+            book(loads[game_id], start, end)
+
+    if taken and not _take_copies(taken, now):
+        raise RentalError("Some games were rented out while approving; please try again.")
+
+    def per_rental(rental_ids, value):
+        return Case(
+            *[When(id=rental_id, then=Value(value(rental_id))) for rental_id in rental_ids],
+            output_field=DateField(),
+        )
+
+    # Requests filed before costs were stored get theirs now
+    unpriced = [rental_id for rental_id in approved + reserved if not found[rental_id]['cost']]
+    for rental_id in unpriced:
+        found[rental_id]['cost'] = quote(prices[found[rental_id]['game_id']], found[rental_id]['rental_days'])
+    cost = Case(
+        *[When(id=rental_id, then=Value(found[rental_id]['cost'])) for rental_id in unpriced],
+        default=F('cost'),
+        output_field=DecimalField(max_digits=8, decimal_places=2),
+    )
+    for new_status, ids in (('approved', approved), ('reserved', reserved)):
+        if not ids:
+            continue
+        changes = {}
+        if new_status == 'approved':
+            changes['due_at'] = _due_at({found[rental_id]['rental_days'] for rental_id in ids}, now)
+        Rental.objects.filter(id__in=ids).update(
+            status=new_status,
+            approved_at=now,
+            approved_by=actor,
+            start_date=per_rental(ids, lambda rental_id: periods[rental_id][0]),
+            end_date=per_rental(ids, lambda rental_id: periods[rental_id][1]),
+            updated_at=now,
+            cost=cost,
+            **changes,
+        )
+        record_changes(stats_changes(ids, new_status))
+        results.update({rental_id: {'ok': True, 'status': new_status} for rental_id in ids})
+    return results
+
+
+# ---- Due dates ----
+
+# Overdue rentals are closed as returned this long after their due date
+RETURN_GRACE = timedelta(days=3)
+SWEEP_BATCH_SIZE = 500
+
+
+def _transition_batch(candidates, status, batch_size, **changes):
+    """
+    Move up to ``batch_size`` of ``candidates`` (oldest due first) to
+    ``status`` with one UPDATE and return the rows it moved. Must run in
+    a transaction.
+    """
+    rows = list(
+        candidates.select_for_update(of=('self',)).order_by('due_at', 'id').values_list(
+            'id', 'status', 'game_id', 'user_id', 'game__added_by', 'payment_status', 'cost',
+        )[:batch_size]
+    )
+    if not rows:
+        return rows
+    changes.setdefault('updated_at', timezone.now())
+    Rental.objects.filter(id__in=[row[0] for row in rows]).update(status=status, **changes)
+    record_changes([
+        RentalChange(renter_id, owner_id, RentalState(old, payment_status, cost), RentalState(status, payment_status, cost))
+        for _, old, _, renter_id, owner_id, payment_status, cost in rows
+    ])
+    return rows
+
+
+def mark_overdue(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """Flag approved rentals past their due date as overdue; returns how many."""
+    now = now or timezone.now()
+    candidates = Rental.objects.filter(status='approved', due_at__lte=now)
+    total = 0
+    while True:
+        with transaction.atomic():
+            rows = _transition_batch(candidates, 'overdue', batch_size)
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+
+
+def return_expired(now=None, grace=RETURN_GRACE, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Close active rentals whose due date passed more than ``grace`` ago as
+    returned and put their copies back on the shelf. Returns
+    ``(rentals_returned, copies_returned)``.
+    """
+    now = now or timezone.now()
+    candidates = Rental.objects.filter(status__in=ACTIVE_STATUSES, due_at__lte=now - grace)
+    returned = copies = 0
+    while True:
+        with transaction.atomic():
+            rows = _transition_batch(candidates, 'returned', batch_size, returned_at=now, updated_at=now)
+            counts = {}
+            for row in rows:
+                counts[row[2]] = counts.get(row[2], 0) + 1
+            if counts:
+                _return_copies(counts, now)
+                promote_waitlist(counts)
+                copies += len(rows)
+        returned += len(rows)
+        if len(rows) < batch_size:
+            return returned, copies
+
+
+def start_reservations(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Start reserved rentals whose start date has come: each takes a copy off
+    the shelf and becomes approved, due ``rental_days`` after it starts (as
+    approvals are, see ``due_at_for``). A
+    reservation whose copy is not back yet (a late return) is left for the
+    next run. Returns how many started; raises ``RentalError``, rolling back
+    the batch, if copies went missing while it ran.
+    """
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    started = after = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                Rental.objects.select_for_update(of=('self',))
+                .filter(status='reserved', start_date__lte=today, id__gt=after)
+                .order_by('id')
+                .values_list('id', 'game_id', 'user_id', 'game__added_by', 'payment_status', 'cost', 'rental_days')
+                [:batch_size]
+            )
+            if not rows:
+                return started
+            after = rows[-1][0]
+            stock = dict(
+                Game.objects.select_for_update().filter(id__in={row[1] for row in rows})
+                .values_list('id', 'available_copies')
+            )
+            taken, starting = {}, []
+            for row in rows:
+                game_id = row[1]
+                if taken.get(game_id, 0) < stock[game_id]:
+                    taken[game_id] = taken.get(game_id, 0) + 1
+                    starting.append(row)
+            if starting:
+                if not _take_copies(taken, now):
+                    raise RentalError("Some games were rented out while starting reservations; please run again.")
+                Rental.objects.filter(id__in=[row[0] for row in starting]).update(
+                    status='approved', due_at=_due_at({row[6] for row in starting}, now), updated_at=now,
+                )
+                record_changes([
+                    RentalChange(
+                        renter_id, owner_id,
+                        RentalState('reserved', payment_status, cost), RentalState('approved', payment_status, cost),
+                    )
+                    for _, _, renter_id, owner_id, payment_status, cost, _ in starting
+                ])
+        started += len(starting)
+        if len(rows) < batch_size:
+            return started
+
+
+def _new_transaction_id():
+    return f"TXN-{uuid.uuid4().hex[:20].upper()}"
+
+
+def record_payment(rental, user, idempotency_key, method):
+    """
+    Record a payment for an approved rental, at most once.
+
+    Returns ``(payment, created)``. A repeated ``idempotency_key`` (double
+    click, retry) returns the payment it already created without doing any
+    writes; a second payment attempt for an already-paid rental returns the
+    existing payment too. The ledger row, the rental's payment fields and
+    the stats counters change in one transaction.
+    """
+    existing = Payment.objects.filter(idempotency_key=idempotency_key).first()
+    if existing is not None:
+        if existing.rental_id != rental.id:
+            raise RentalError("This payment form was already used for another rental.")
+        return existing, False
+
+    before = state_of(rental)
+    try:
+        with transaction.atomic():
+            payment = Payment.objects.create(
+                rental=rental,
+                user=user,
+                idempotency_key=idempotency_key,
+                transaction_id=_new_transaction_id(),
+                amount=rental.cost or 0,
+                method=method,
+            )
+            updated = Rental.objects.filter(
+                pk=rental.pk, status__in=ACTIVE_STATUSES, payment_status='pending',
+            ).update(
+                payment_status='paid',
+                payment_method=method,
+                payment_date=payment.created_at,
+                transaction_id=payment.transaction_id,
+                updated_at=payment.created_at,
+            )
+            if not updated:
+                raise RentalError("You cannot pay for a rental that is not approved.")
+            rental.payment_status = 'paid'
+            rental.payment_method = method
+            rental.payment_date = payment.created_at
+            rental.transaction_id = payment.transaction_id
+            record_change(rental, before, state_of(rental))
+    except IntegrityError:
+        # Lost a race with the same form or another payment for this rental
+        existing = Payment.objects.filter(rental=rental).first()
+        if existing is None:
+            raise
+        return existing, False
+    return payment, True
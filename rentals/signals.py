@@ -0,0 +1,31 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from games.models import Game
+from .models import Rental
+from .pricing import invalidate_prices
+from .services import _return_copies
+from .stats import RentalChange, record_changes, state_of
+
+# Statuses in which a rental has a copy off the shelf
+HOLDING_STATUSES = ('approved', 'overdue')
+
+
+@receiver(post_save, sender=Game)
+@receiver(post_delete, sender=Game)
+def drop_cached_price(sender, instance, **kwargs):
+    invalidate_prices([instance.pk])
+
+
+@receiver(pre_delete, sender=Rental)
+def forget_rental(sender, instance, **kwargs):
+    """
+    Take a deleted rental out of the stats counters and put back the copy
+    it holds, in the deleting transaction. Also runs for rentals deleted
+    with their game or user.
+    """
+    owner_id = Game.objects.filter(pk=instance.game_id).values_list('added_by_id', flat=True).first()
+    record_changes([RentalChange(instance.user_id, owner_id, state_of(instance), None)], create=False)
+    if instance.status in HOLDING_STATUSES:
+        _return_copies({instance.game_id: 1}, timezone.now())
@@ -0,0 +1,139 @@
+"""
+Incremental maintenance of ``RentalStats``.
+
+Callers describe each rental change as a before/after ``RentalState`` and
+``record_changes`` turns them into per-user deltas applied with ``F()``
+updates. It must be called inside the transaction that changes the
+rentals, so the counters can never disagree with a committed rental.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, When
+
+from .models import Rental, RentalStats
+
+ACTIVE_STATUSES = Rental.ACTIVE_STATUSES
+COMPLETED_STATUSES = ('returned',)
+
+RentalState = namedtuple('RentalState', ['status', 'payment_status', 'cost'])
+RentalChange = namedtuple('RentalChange', ['renter_id', 'owner_id', 'before', 'after'])
+
+RENTER_FIELDS = ('rentals_total', 'rentals_active', 'rentals_completed', 'spent_paid')
+OWNER_FIELDS = ('received_total', 'received_active', 'received_completed', 'revenue_paid')
+
+
+def state_of(rental):
+    return RentalState(rental.status, rental.payment_status, rental.cost)
+
+
+def _contribution(state):
+    if state is None:
+        return (0, 0, 0, Decimal('0'))
+    return (
+        1,
+        int(state.status in ACTIVE_STATUSES),
+        int(state.status in COMPLETED_STATUSES),
+        Decimal(state.cost or 0) if state.payment_status == 'paid' else Decimal('0'),
+    )
+
+
+def record_changes(changes, create=True):
+    """
+    Apply ``changes`` to the counters. With ``create=False`` users without
+    a ``RentalStats`` row are skipped instead of getting one, for deletions
+    where the user may be on the way out too.
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for change in changes:
+        after, before = _contribution(change.after), _contribution(change.before)
+        diff = [a - b for a, b in zip(after, before)]
+        for field, value in zip(RENTER_FIELDS, diff):
+            deltas[change.renter_id][field] += value
+        if change.owner_id is not None:
+            for field, value in zip(OWNER_FIELDS, diff):
+                deltas[change.owner_id][field] += value
+
+    deltas = {
+        user_id: {field: value for field, value in fields.items() if value}
+        for user_id, fields in deltas.items()
+    }
+    deltas = {user_id: fields for user_id, fields in deltas.items() if fields}
+    if not deltas:
+        return
+
+    if create:
+        RentalStats.objects.bulk_create(
+            [RentalStats(user_id=user_id) for user_id in deltas], ignore_conflicts=True
+        )
+    # One UPDATE for every user, whatever the size of the batch
+    changed_fields = {field for fields in deltas.values() for field in fields}
+    RentalStats.objects.filter(pk__in=deltas).update(**{
+        field: Case(
+            *[
+                When(pk=user_id, then=F(field) + fields[field])
+                for user_id, fields in deltas.items() if field in fields
+            ],
+            default=F(field),
+            output_field=RentalStats._meta.get_field(field),
+        )
+        for field in changed_fields
+    })
+
+
+def record_change(rental, before, after):
+    record_changes([RentalChange(rental.user_id, rental.game.added_by_id, before, after)])
+
+
+def compute_stats():
+    """Recompute every user's counters from the Rental table."""
+    def counters(prefix, paid_field):
+        return {
+            f'{prefix}_total': Count('id'),
+            f'{prefix}_active': Count('id', filter=Q(status__in=ACTIVE_STATUSES)),
+            f'{prefix}_completed': Count('id', filter=Q(status__in=COMPLETED_STATUSES)),
+            paid_field: Sum('cost', filter=Q(payment_status='paid'), default=Decimal('0')),
+        }
+
+    stats = defaultdict(dict)
+    for row in Rental.objects.values('user_id').annotate(**counters('rentals', 'spent_paid')).order_by():
+        stats[row.pop('user_id')].update(row)
+    owner_rows = (
+        Rental.objects.filter(game__added_by__isnull=False)
+        .values('game__added_by').annotate(**counters('received', 'revenue_paid')).order_by()
+    )
+    for row in owner_rows:
+        stats[row.pop('game__added_by')].update(row)
+    return stats
+
+
+@transaction.atomic
+def rebuild_stats():
+    stats = compute_stats()
+    RentalStats.objects.all().delete()
+    RentalStats.objects.bulk_create(
+        [RentalStats(user_id=user_id, **fields) for user_id, fields in stats.items()],
+        batch_size=1000,
+    )
+    return len(stats)
+
+
+def find_drift():
+    """Return ``{user_id: {field: (stored, expected)}}`` for every mismatch."""
+    expected = compute_stats()
+    fields = RENTER_FIELDS + OWNER_FIELDS
+    stored = {row['user_id']: row for row in RentalStats.objects.values('user_id', *fields)}
+
+    drift = {}
+    for user_id in set(expected) | set(stored):
+        want = expected.get(user_id, {})
+        have = stored.get(user_id, {})
+        mismatches = {
+            field: (have.get(field, 0), want.get(field, 0))
+            for field in fields
+            if have.get(field, 0) != want.get(field, 0)
+        }
+        if mismatches:
+            drift[user_id] = mismatches
+    return drift
@@ -1,3 +1,716 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from campus_gamehub.testing import QueryBudgetMixin, seed_data
+from . import urls
+from games.models import Game
+from .export import EXPORT_COLUMNS, export_chunks
+from .models import Payment, Rental, RentalRequestCounter, Waitlist, WaitlistEntry
+from .pricing import quote
+from .rollups import refresh_rollups, report
+from .services import (
+    RentalError, approve_rental, bulk_set_status, deny_rental, mark_overdue, record_payment, return_expired,
+    start_reservations,
+)
+from .stats import find_drift, record_change, state_of
+from .throttle import allow_rental_request
+from .waitlist import join_waitlist, promote_waitlist
+
+# Queries per request, including the session and user lookups of a
+# logged-in request. They must not grow with the data.
+QUERY_BUDGETS = {
+    'request_rental': 3,
+    'my_rentals': 4,
+    'pay_rental': 3,
+    'rental_report': 4,
+    'export_rentals': 3,
+    'game_calendar': 4,
+    'quote_rentals': 3,
+}
+
+# Same, for the views that change rentals (savepoints count too)
+WRITE_QUERY_BUDGETS = {
+    # 1 of them counts the request in the throttle (a user's first request
+    # ever inserts the counter row: 3 more)
+    'request_rental': 10,
+    'leave_waitlist': 7,
+    # Taking copies off the shelf also bumps the catalog version
+    'update_rental_status': 14,
+    'bulk_update_rental_status': 12,
+    'pay_rental': 10,
+}
+
+
+
+def file_request(user, game, days=3, start=None):
+    """A pending rental, filed and counted as request_rental does."""
+    start = start or timezone.localdate()
+    rental = Rental.objects.create(
+        user=user, game=game, rental_days=days, cost=quote(game.price_per_day, days),
+        start_date=start, end_date=start + timedelta(days=days),
+    )
+    record_change(rental, None, state_of(rental))
+    return rental
+
+
+class RentalViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data()
+        refresh_rollups(full=True)
+        cls.super_admin = cls.data['super_admin']
+        cls.owner = cls.data['owners'][0]
+        cls.student = cls.data['students'][0]
+        cls.game = cls.data['games'][0]
+
+    def setUp(self):
+        # Objects from the most recent batch, for views that act on one
+        self.batch = self.data
+
+    def grow(self):
+        self.batch = seed_data(existing=self.data)
+        refresh_rollups()
+
+    def rentals_of(self, batch, **filters):
+        return [
+            rental for rental in batch['rentals']
+            if all(getattr(rental, field) == value for field, value in filters.items())
+        ]
+
+    def test_every_view_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS) | set(WRITE_QUERY_BUDGETS))
+
+    def test_request_form(self):
+        self.assertViewBudget('request_rental', self.student, reverse('request_rental', args=[self.game.pk]))
+
+    def test_my_rentals(self):
+        first, second = self.assertViewBudget('my_rentals', self.student, reverse('my_rentals'))
+        self.assertGreater(len(second.context['rentals']), len(first.context['rentals']))
+
+    def test_pay_form(self):
+        rental, = self.rentals_of(self.data, user_id=self.student.pk, status='approved', payment_status='pending')[:1]
+        self.assertViewBudget('pay_rental', self.student, reverse('pay_rental', args=[rental.pk]))
+
+    def test_reports(self):
+        for user in (self.super_admin, self.owner):
+            with self.subTest(user.role):
+                self.assertViewBudget('rental_report', user, reverse('rental_report'))
+
+    def test_export(self):
+        for fmt in ('csv', 'jsonl'):
+            with self.subTest(fmt):
+                self.assertViewBudget('export_rentals', self.super_admin, reverse('export_rentals') + f'?format={fmt}')
+
+    def test_calendar(self):
+        self.assertViewBudget('game_calendar', self.student, reverse('game_calendar', args=[self.game.pk]))
+
+    def test_quote_many(self):
+        def url():
+            pairs = ','.join(f'{game.pk}:{days}' for game in self.batch['games'] for days in (1, 7, 10))
+            return reverse('quote_rentals') + f'?q={pairs}'
+
+        first, second = self.assertViewBudget('quote_rentals', self.student, url)
+        self.assertEqual(len(second.json()['quotes']), 3 * len(self.batch['games']))
+
+    def test_request_rental(self):
+        def url():
+            rental, = self.rentals_of(self.batch, user_id=self.student.pk, status='returned')[:1]
+            return reverse('request_rental', args=[rental.game_id])
+
+        allow_rental_request(self.student.pk)
+        self.assertViewBudget(
+            'request_rental', self.student, url, method='post', data={'rental_days': 3},
+            status=302, budgets=WRITE_QUERY_BUDGETS,
+        )
+
+    def test_leave_waitlist(self):
+        self.assertViewBudget(
+            'leave_waitlist', self.student, lambda: reverse('leave_waitlist', args=[self.batch['games'][0].pk]),
+            method='post', status=302, budgets=WRITE_QUERY_BUDGETS,
+        )
+
+    def pending_for_owner(self):
+        owned = {game.pk for game in self.batch['games'] if game.added_by_id == self.owner.pk}
+        return [rental.pk for rental in self.rentals_of(self.batch, status='pending') if rental.game_id in owned]
+
+    def test_approve_one(self):
+        def url():
+            return reverse('update_rental_status', args=[self.pending_for_owner()[0], 'approved'])
+
+        self.assertViewBudget('update_rental_status', self.owner, url, status=302, budgets=WRITE_QUERY_BUDGETS)
+
+    def test_bulk_approve(self):
+        def data():
+            return json.dumps({'rental_ids': self.pending_for_owner(), 'status': 'approved'})
+
+        first, second = self.assertViewBudget(
+            'bulk_update_rental_status', self.owner, reverse('bulk_update_rental_status'),
+            method='post', data=data, budgets=WRITE_QUERY_BUDGETS,
+        )
+        self.assertGreater(second.json()['updated'], first.json()['updated'])
+        self.assertFalse(Rental.objects.filter(status='pending', game__added_by=self.owner).exists())
+
+    def test_pay(self):
+        def url():
+            rental, = self.rentals_of(
+                self.batch, user_id=self.student.pk, status='approved', payment_status='pending',
+            )[:1]
+            return reverse('pay_rental', args=[rental.pk])
+
+        self.assertViewBudget(
+            'pay_rental', self.student, url, method='post',
+            data=lambda: {'payment_method': 'upi', 'idempotency_key': f"test-{self.batch['games'][0].pk}"},
+            status=302, budgets=WRITE_QUERY_BUDGETS,
+        )
+
+
+class RentalDeletionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=4, owners=2, games_per_owner=2)
+
+    def test_cascades_keep_stats(self):
+        self.data['games'][0].delete()
+        self.data['students'][1].delete()
+        self.data['owners'][1].delete()
+        self.assertEqual(find_drift(), {})
+
+    def test_deleting_a_rental_returns_its_copy(self):
+        rental = Rental.objects.filter(status='approved').select_related('game').first()
+        available = rental.game.available_copies
+        rental.delete()
+        self.assertEqual(Game.objects.get(pk=rental.game_id).available_copies, available + 1)
+        self.assertEqual(find_drift(), {})
+
+    def test_admin_cannot_edit_lifecycle_fields(self):
+        rental = self.data['rentals'][0]
+        admin = self.data['super_admin']
+        get_user_model().objects.filter(pk=admin.pk).update(is_staff=True, is_superuser=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:rentals_rental_change', args=[rental.pk]))
+        self.assertEqual(response.status_code, 200)
+        fields = response.context['adminform'].form.fields
+        for field in ('status', 'payment_status', 'cost', 'game', 'user'):
+            self.assertNotIn(field, fields)
+
+
+class RentalRequestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=2, owners=1, games_per_owner=1)
+        cls.student = cls.data['students'][0]
+        cls.game = Game.objects.create(
+            title='Fresh', description='A game.', total_copies=2, available_copies=2, added_by=cls.data['owners'][0],
+        )
+
+    def setUp(self):
+        self.client.force_login(self.student)
+
+    def post(self):
+        return self.client.post(reverse('request_rental', args=[self.game.pk]), {'rental_days': 3})
+
+    def test_second_request_is_refused(self):
+        self.post()
+        response = self.post()
+        self.assertEqual(Rental.objects.filter(user=self.student, game=self.game, status='pending').count(), 1)
+        self.assertIn("already requested", [str(m) for m in get_messages(response.wsgi_request)][-1])
+
+    def test_other_integrity_errors_are_raised(self):
+        with mock.patch('rentals.views.record_change', side_effect=IntegrityError("CHECK constraint failed")):
+            with self.assertRaises(IntegrityError):
+                self.post()
+        self.assertFalse(Rental.objects.filter(user=self.student, game=self.game).exists())
+
+    def test_throttle_counts_per_user_and_window(self):
+        with mock.patch('rentals.throttle.time.time', return_value=1200.0):
+            self.assertEqual([allow_rental_request(self.student.pk, limit=2) for _ in range(3)], [True, True, False])
+            self.assertTrue(allow_rental_request(self.data['students'][1].pk, limit=2))
+        # The next window starts over, in the same row
+        with mock.patch('rentals.throttle.time.time', return_value=1800.0):
+            self.assertTrue(allow_rental_request(self.student.pk, limit=2))
+        counter = RentalRequestCounter.objects.get(user=self.student)
+        self.assertEqual((counter.window_start, counter.count), (1800, 1))
+
+
+class WaitlistPromotionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=6, owners=1, games_per_owner=1)
+        cls.owner = cls.data['owners'][0]
+        cls.renters = cls.data['students'][:3]
+        cls.queue = cls.data['students'][3:]
+
+    def setUp(self):
+        self.game = Game.objects.create(
+            title='Azul', description='Tiles.', total_copies=3, available_copies=3, added_by=self.owner,
+        )
+
+    def rent_out(self):
+        for user in self.renters:
+            approve_rental(file_request(user, self.game).pk, self.owner)
+        for user in self.queue:
+            join_waitlist(user, self.game, rental_days=2)
+
+    def test_returned_copies_go_to_as_many_in_line(self):
+        self.rent_out()
+        return_expired(now=timezone.now() + timedelta(days=30))
+        self.assertEqual(Rental.objects.filter(game=self.game, status='returned').count(), 3)
+
+        promoted = Rental.objects.filter(game=self.game, status='pending')
+        self.assertEqual(set(promoted.values_list('user_id', flat=True)), {user.pk for user in self.queue})
+        self.assertFalse(WaitlistEntry.objects.filter(game=self.game).exists())
+        self.assertEqual(Waitlist.objects.get(game=self.game).length, 0)
+        self.assertEqual(find_drift(), {})
+
+    def test_copies_claimed_by_pending_requests_are_not_promoted(self):
+        self.rent_out()
+        walk_in = file_request(self.data['students'][0], self.game)
+        Rental.objects.filter(game=self.game, user=self.renters[1]).delete()
+
+        # One copy is back, and the pending request is first in line for it
+        self.assertEqual(Game.objects.get(pk=self.game.pk).available_copies, 1)
+        self.assertEqual(promote_waitlist([self.game.pk]), [])
+        deny_rental(walk_in.pk)
+        head, = Rental.objects.filter(game=self.game, status='pending')
+        self.assertEqual(head.user_id, self.queue[0].pk)
+        self.assertEqual(Waitlist.objects.get(game=self.game).head_user_id, self.queue[1].pk)
+
+    def test_requests_queue_behind_the_waitlist(self):
+        self.rent_out()
+        Rental.objects.filter(game=self.game, user=self.renters[0]).delete()
+        newcomer = get_user_model().objects.create_user('newcomer', 'newcomer@example.com', 'pass12345')
+
+        # A copy is on the shelf, but the queue is first
+        self.client.force_login(newcomer)
+        self.client.post(reverse('request_rental', args=[self.game.pk]), {'rental_days': 3})
+        self.assertFalse(Rental.objects.filter(user=newcomer).exists())
+        self.assertEqual(WaitlistEntry.objects.get(user=newcomer).position, len(self.queue) + 1)
+
+
+class ReservationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=3, owners=1, games_per_owner=1)
+        cls.owner = cls.data['owners'][0]
+        cls.students = cls.data['students']
+
+    def setUp(self):
+        self.game = Game.objects.create(
+            title='Root', description='Woodland.', total_copies=1, available_copies=1, added_by=self.owner,
+        )
+        self.today = timezone.localdate()
+
+    def test_overlapping_bookings_are_refused(self):
+        later = self.today + timedelta(days=5)
+        first = approve_rental(file_request(self.students[0], self.game, start=later).pk, self.owner)
+        self.assertEqual(first.status, 'reserved')
+        # Overlaps the last day of the first booking
+        clash = file_request(self.students[1], self.game, start=later + timedelta(days=2))
+        with self.assertRaises(RentalError):
+            approve_rental(clash.pk, self.owner)
+        self.assertEqual(Rental.objects.get(pk=clash.pk).status, 'pending')
+        # Starts the day the first one ends (end dates are exclusive)
+        after = approve_rental(file_request(self.students[2], self.game, start=first.end_date).pk, self.owner)
+        self.assertEqual(after.status, 'reserved')
+        self.assertEqual(Game.objects.get(pk=self.game.pk).available_copies, 1)
+
+    def test_started_reservations_take_their_copy(self):
+        tomorrow = self.today + timedelta(days=1)
+        rental = approve_rental(file_request(self.students[0], self.game, start=tomorrow).pk, self.owner)
+        self.assertEqual(start_reservations(), 0)
+
+        self.assertEqual(start_reservations(now=timezone.now() + timedelta(days=1)), 1)
+        rental.refresh_from_db()
+        self.assertEqual(rental.status, 'approved')
+        self.assertEqual(Game.objects.get(pk=self.game.pk).available_copies, 0)
+        self.assertEqual(find_drift(), {})
+
+    def test_due_times_count_from_when_the_copy_leaves(self):
+        Game.objects.filter(pk=self.game.pk).update(total_copies=3, available_copies=3)
+        tomorrow = self.today + timedelta(days=1)
+        approved = approve_rental(file_request(self.students[0], self.game, days=3).pk, self.owner)
+        bulk = file_request(self.students[1], self.game, days=3)
+        bulk_set_status(self.owner, [bulk.pk], 'approved')
+        bulk.refresh_from_db()
+        reserved = approve_rental(file_request(self.students[2], self.game, days=3, start=tomorrow).pk, self.owner)
+        started_at = timezone.now() + timedelta(days=1)
+        start_reservations(now=started_at)
+        reserved.refresh_from_db()
+
+        self.assertEqual(approved.due_at, approved.approved_at + timedelta(days=3))
+        self.assertEqual(bulk.due_at, bulk.approved_at + timedelta(days=3))
+        self.assertEqual(reserved.due_at, started_at + timedelta(days=3))
+
+    def test_shortfall_rolls_the_batch_back(self):
+        tomorrow = self.today + timedelta(days=1)
+        rental = approve_rental(file_request(self.students[0], self.game, start=tomorrow).pk, self.owner)
+        with mock.patch('rentals.services._take_copies', return_value=False):
+            with self.assertRaises(RentalError):
+                start_reservations(now=timezone.now() + timedelta(days=1))
+        self.assertEqual(Rental.objects.get(pk=rental.pk).status, 'reserved')
+
+
+class PricingTests(SimpleTestCase):
+
+    def test_defaults_are_linear(self):
+        for days in (1, 3, 7, 10, 30):
+            with self.subTest(days):
+                self.assertEqual(quote(Decimal('45.50'), days), Decimal('45.50') * days)
+
+    @override_settings(RENTAL_WEEK_PRICE_DAYS=6, RENTAL_DAY_TIERS=((1, '1.00'), (3, '0.95')))
+    def test_weekly_and_tiered_rates(self):
+        self.assertEqual(quote(Decimal('10.00'), 2), Decimal('20.00'))
+        self.assertEqual(quote(Decimal('10.00'), 3), Decimal('28.50'))
+        self.assertEqual(quote(Decimal('10.00'), 7), Decimal('60.00'))
+        # Two weeks plus three days at the tier price
+        self.assertEqual(quote(Decimal('10.00'), 17), Decimal('148.50'))
+
+    @override_settings(RENTAL_DAY_TIERS=((1, '0.95'),))
+    def test_rounds_half_up_to_the_cent(self):
+        self.assertEqual(quote(Decimal('0.30'), 1), Decimal('0.29'))
+        self.assertEqual(quote('33.33', 2), Decimal('63.33'))
+        self.assertEqual(quote(Decimal('0.30'), 1).as_tuple().exponent, -2)
+
+
+class ApprovalTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=4, owners=2, games_per_owner=1)
+        cls.owner, cls.other_owner = cls.data['owners']
+        cls.students = cls.data['students']
+
+    def setUp(self):
+        self.game = Game.objects.create(
+            title='Cascadia', description='Habitats.', total_copies=2, available_copies=2, added_by=self.owner,
+        )
+
+    def test_last_copy_goes_to_one_approval(self):
+        first, second, third = (file_request(student, self.game) for student in self.students[:3])
+        approve_rental(first.pk, self.owner)
+        approve_rental(second.pk, self.owner)
+        with self.assertRaises(RentalError):
+            approve_rental(third.pk, self.owner)
+
+        self.assertEqual(Rental.objects.get(pk=third.pk).status, 'pending')
+        self.assertEqual(Game.objects.get(pk=self.game.pk).available_copies, 0)
+        self.assertEqual(find_drift(), {})
+
+    def test_a_rental_is_decided_once(self):
+        rental = file_request(self.students[0], self.game)
+        approve_rental(rental.pk, self.owner)
+        with self.assertRaisesMessage(RentalError, "Rental is already approved."):
+            approve_rental(rental.pk, self.owner)
+        with self.assertRaisesMessage(RentalError, "Rental is already approved."):
+            deny_rental(rental.pk)
+        self.assertEqual(Game.objects.get(pk=self.game.pk).available_copies, 1)
+
+    def test_stale_stock_cannot_oversell(self):
+        rental = file_request(self.students[0], self.game)
+        # Both copies went out, without bookings (say, by hand) after this
+        # request was filed; only the conditional UPDATE can notice
+        Game.objects.filter(pk=self.game.pk).update(available_copies=0)
+        with self.assertRaisesMessage(RentalError, "Every copy of Cascadia is rented out."):
+            approve_rental(rental.pk, self.owner)
+        self.assertEqual(Game.objects.get(pk=self.game.pk).available_copies, 0)
+
+    def test_bulk_approval_serves_oldest_requests_first(self):
+        rentals = [file_request(student, self.game) for student in self.students[:3]]
+        now = timezone.now()
+        for age, rental in enumerate(reversed(rentals)):
+            Rental.objects.filter(pk=rental.pk).update(requested_at=now - timedelta(hours=age))
+        oldest, middle, newest = rentals
+
+        # Newest first in the request; the order of requests decides
+        results = bulk_set_status(self.owner, [newest.pk, middle.pk, oldest.pk], 'approved')
+        self.assertEqual(
+            {rental_id: result['ok'] for rental_id, result in results.items()},
+            {oldest.pk: True, middle.pk: True, newest.pk: False},
+        )
+        self.assertEqual(Rental.objects.get(pk=newest.pk).status, 'pending')
+        self.assertEqual(Game.objects.get(pk=self.game.pk).available_copies, 0)
+        self.assertEqual(find_drift(), {})
+
+    def test_bulk_approval_skips_other_owners_rentals(self):
+        rental = file_request(self.students[0], self.game)
+        results = bulk_set_status(self.other_owner, [rental.pk, 0], 'approved')
+        self.assertFalse(results[rental.pk]['ok'])
+        self.assertFalse(results[0]['ok'])
+        self.assertEqual(Rental.objects.get(pk=rental.pk).status, 'pending')
+
+    def test_one_pending_request_per_user_and_game(self):
+        rental = file_request(self.students[0], self.game)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            file_request(self.students[0], self.game)
+        # Once decided, the student can ask again
+        deny_rental(rental.pk)
+        file_request(self.students[0], self.game)
+
+
+class PaymentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=2, owners=1, games_per_owner=1)
+        cls.owner = cls.data['owners'][0]
+        cls.student = cls.data['students'][0]
+
+    def setUp(self):
+        self.game = Game.objects.create(
+            title='Splendor', description='Gems.', total_copies=2, available_copies=2, added_by=self.owner,
+        )
+        self.rental = approve_rental(file_request(self.student, self.game).pk, self.owner)
+
+    def test_same_key_pays_once(self):
+        payment, created = record_payment(self.rental, self.student, 'key-1', 'upi')
+        again, created_again = record_payment(self.rental, self.student, 'key-1', 'upi')
+
+        self.assertEqual((created, created_again), (True, False))
+        self.assertEqual(again.pk, payment.pk)
+        self.assertEqual(payment.amount, self.rental.cost)
+        self.assertEqual(Payment.objects.filter(rental=self.rental).count(), 1)
+        self.assertEqual(find_drift(), {})
+
+    def test_paid_rental_is_not_charged_again(self):
+        payment, _ = record_payment(self.rental, self.student, 'key-1', 'upi')
+        # A second form, or a stale page that still shows the rental as unpaid
+        stale = Rental.objects.get(pk=self.rental.pk)
+        stale.payment_status = 'pending'
+        again, created = record_payment(stale, self.student, 'key-2', 'card')
+        self.assertFalse(created)
+        self.assertEqual(again.pk, payment.pk)
+        self.assertEqual(Payment.objects.count(), Payment.objects.exclude(rental=self.rental).count() + 1)
+
+    def test_key_cannot_pay_another_rental(self):
+        record_payment(self.rental, self.student, 'key-1', 'upi')
+        other = approve_rental(file_request(self.data['students'][1], self.game).pk, self.owner)
+        with self.assertRaises(RentalError):
+            record_payment(other, self.data['students'][1], 'key-1', 'upi')
+        self.assertEqual(Rental.objects.get(pk=other.pk).payment_status, 'pending')
+
+    def test_unapproved_rental_cannot_be_paid(self):
+        pending = file_request(self.data['students'][1], self.game)
+        with self.assertRaises(RentalError):
+            record_payment(pending, self.data['students'][1], 'key-3', 'upi')
+        self.assertFalse(Payment.objects.filter(idempotency_key='key-3').exists())
+
+    def test_resubmitted_form_pays_once(self):
+        self.client.force_login(self.student)
+        url = reverse('pay_rental', args=[self.rental.pk])
+        for _ in range(2):
+            response = self.client.post(url, {'payment_method': 'upi', 'idempotency_key': 'form-1'})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(Payment.objects.filter(rental=self.rental).count(), 1)
+
+
+class SweeperTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data(students=5, owners=1, games_per_owner=1)
+        cls.owner = cls.data['owners'][0]
+
+    def setUp(self):
+        self.game = Game.objects.create(
+            title='Wingspan', description='Birds.', total_copies=5, available_copies=5, added_by=self.owner,
+        )
+        self.rentals = [
+            approve_rental(file_request(student, self.game).pk, self.owner) for student in self.data['students']
+        ]
+        self.now = timezone.now()
+
+    def statuses(self):
+        return sorted(Rental.objects.filter(game=self.game).values_list('status', flat=True))
+
+    def due(self, rentals, days_ago):
+        due_at = self.now - timedelta(days=days_ago)
+        Rental.objects.filter(pk__in=[rental.pk for rental in rentals]).update(due_at=due_at)
+
+    def test_marks_overdue_in_batches(self):
+        self.due(self.rentals[:3], days_ago=1)
+        mark_overdue(self.now, batch_size=2)
+        self.assertEqual(self.statuses(), ['approved'] * 2 + ['overdue'] * 3)
+        self.assertEqual(mark_overdue(self.now), 0)
+        self.assertEqual(find_drift(), {})
+
+    def test_returns_after_the_grace_period(self):
+        self.due(self.rentals[:2], days_ago=10)
+        self.due(self.rentals[2:3], days_ago=1)
+        return_expired(self.now, grace=timedelta(days=3), batch_size=1)
+
+        self.assertEqual(self.statuses(), ['approved'] * 3 + ['returned'] * 2)
+        self.assertEqual(Game.objects.get(pk=self.game.pk).available_copies, 2)
+        returned = Rental.objects.filter(game=self.game, status='returned')
+        self.assertEqual(set(returned.values_list('returned_at', flat=True)), {self.now})
+        self.assertEqual(find_drift(), {})
+
+    def test_command(self):
+        self.due(self.rentals[:1], days_ago=10)
+        self.due(self.rentals[1:2], days_ago=1)
+        out = io.StringIO()
+        call_command('sweep_rentals', '--dry-run', stdout=out)
+        self.assertEqual(self.statuses(), ['approved'] * 5)
+
+        call_command('sweep_rentals', stdout=out)
+        self.assertEqual(self.statuses(), ['approved'] * 3 + ['overdue', 'returned'])
+
+
+class RollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data()
+
+    def direct_totals(self, rentals):
+        approved = rentals.filter(approved_at__isnull=False)
+        return {
+            'requests': rentals.count(),
+            'approvals': approved.count(),
+            'rented_days': approved.aggregate(days=Sum('rental_days', default=0))['days'],
+            'revenue_paid': rentals.filter(payment_status='paid').aggregate(
+                revenue=Sum('cost', default=Decimal('0')),
+            )['revenue'],
+        }
+
+    def assertMatchesRentals(self):
+        first = timezone.localdate(Rental.objects.earliest('requested_at').requested_at)
+        today = timezone.localdate()
+        self.assertEqual(report(first, today)['totals'], self.direct_totals(Rental.objects.all()))
+        owner = self.data['owners'][1]
+        self.assertEqual(
+            report(first, today, owner=owner)['totals'],
+            self.direct_totals(Rental.objects.filter(game__added_by=owner)),
+        )
+
+    def test_totals_match_a_direct_aggregate(self):
+        refresh_rollups(full=True)
+        self.assertMatchesRentals()
+
+    def test_incremental_refresh_keeps_up(self):
+        refresh_rollups(full=True)
+        rental = Rental.objects.filter(status='approved', payment_status='pending').first()
+        record_payment(rental, rental.user, 'rollup-test', 'upi')
+        game = Game.objects.create(title='Azul', description='Tiles.', added_by=self.data['owners'][1])
+        file_request(self.data['students'][0], game)
+        refresh_rollups()
+        self.assertMatchesRentals()
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data()
+
+    def setUp(self):
+        self.client.force_login(self.data['super_admin'])
+
+    def export(self, **params):
+        response = self.client.get(reverse('export_rentals'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_has_a_row_per_rental(self):
+        rows = list(csv.DictReader(io.StringIO(self.export(format='csv'))))
+        self.assertEqual(list(rows[0]), [name for name, _ in EXPORT_COLUMNS])
+        ids = list(Rental.objects.order_by('id').values_list('id', flat=True))
+        self.assertEqual([int(row['id']) for row in rows], ids)
+        rental = Rental.objects.select_related('user', 'game__added_by').filter(payment_status='paid').first()
+        row = next(row for row in rows if int(row['id']) == rental.pk)
+        self.assertEqual(row['renter'], rental.user.username)
+        self.assertEqual(row['game'], rental.game.title)
+        self.assertEqual(row['owner'], rental.game.added_by.username)
+        self.assertEqual(Decimal(row['cost']), rental.cost)
+        self.assertEqual(row['transaction_id'], rental.transaction_id)
+        self.assertEqual(row['returned_at'], '')
+
+    def test_jsonl_follows_the_filters(self):
+        lines = self.export(format='jsonl', status='approved').splitlines()
+        approved = Rental.objects.filter(status='approved').order_by('id')
+        self.assertEqual(len(lines), approved.count())
+        first = json.loads(lines[0])
+        rental = approved.first()
+        self.assertEqual(first['id'], rental.pk)
+        self.assertEqual(first['status'], 'approved')
+        self.assertEqual(first['cost'], str(rental.cost))
+        # DjangoJSONEncoder keeps milliseconds
+        self.assertAlmostEqual(
+            parse_datetime(first['approved_at']), rental.approved_at, delta=timedelta(milliseconds=1),
+        )
+
+    def test_chunking_does_not_change_the_content(self):
+        whole = self.export(format='csv')
+        with mock.patch('rentals.export.FLUSH_SIZE', 100):
+            chunks = list(export_chunks(Rental.objects.all(), 'csv'))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(''.join(chunks), whole)
+
+    def test_command_matches_the_view(self):
+        out = io.StringIO()
+        call_command('export_rentals', format='jsonl', status='approved', stdout=out)
+        self.assertEqual(out.getvalue(), self.export(format='jsonl', status='approved'))
+
+    def test_rejects_unknown_formats_and_non_admins(self):
+        self.assertEqual(self.client.get(reverse('export_rentals'), {'format': 'xml'}).status_code, 400)
+        self.client.force_login(self.data['owners'][0])
+        self.assertEqual(self.client.get(reverse('export_rentals')).status_code, 403)
+
+
+class SeedCommandTests(TestCase):
+    NOW = timezone.now()
+
+    def seed(self, prefix, seed=7):
+        with mock.patch('django.utils.timezone.now', return_value=self.NOW):
+            call_command(
+                'seed_gamehub', prefix=prefix, seed=seed, students=20, owners=3, super_admins=1, games=12,
+                rentals=300, days=30, batch_size=64, stdout=io.StringIO(),
+            )
+        return self.snapshot(prefix)
+
+    def snapshot(self, prefix):
+        """The data set seeded under ``prefix``, with ids and the prefix taken out."""
+        users = get_user_model().objects.filter(username__startswith=f'{prefix}-').order_by('pk')
+        names = {pk: username.removeprefix(prefix) for pk, username in users.values_list('pk', 'username')}
+        games = list(
+            Game.objects.filter(added_by__in=users).order_by('pk').values_list(
+                'pk', 'title', 'description', 'price_per_day', 'total_copies', 'available_copies', 'added_by',
+            )
+        )
+        game_index = {row[0]: i for i, row in enumerate(games)}
+        rentals = Rental.objects.filter(user__in=users).order_by('pk').values_list(
+            'user', 'game', 'status', 'rental_days', 'cost', 'requested_at', 'approved_at', 'start_date',
+            'end_date', 'due_at', 'returned_at', 'payment_status', 'payment_method', 'payment_date',
+        )
+        return {
+            'users': [(names[pk], role, joined) for pk, role, joined in users.values_list('pk', 'role', 'date_joined')],
+            'games': [(*row[1:6], names[row[6]]) for row in games],
+            'rentals': [(names[user], game_index[game], *rest) for user, game, *rest in rentals],
+        }
+
+    def test_same_seed_gives_the_same_data(self):
+        first = self.seed('one')
+        self.assertEqual(len(first['rentals']), 300)
+        self.assertEqual(self.seed('two'), first)
+        self.assertNotEqual(self.seed('three', seed=8)['rentals'], first['rentals'])
+        self.assertEqual(find_drift(), {})
@@ -0,0 +1,44 @@
+"""
+Per-user rate limit on rental requests, counted in the database so every
+worker process shares one counter per user.
+
+A fixed window kept in one ``RentalRequestCounter`` row per user. A request
+is counted with a single conditional UPDATE that either increments the
+count (same window, under the limit) or restarts it at 1 (the window has
+moved on); the check and the write are one statement, so concurrent
+requests can't both take the last slot. Only a user's first request ever
+inserts the row.
+"""
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Q, Value, When
+
+from .models import RentalRequestCounter
+
+RENTAL_REQUEST_LIMIT = 10
+RENTAL_REQUEST_WINDOW = 60 * 10  # seconds
+
+
+def _count_request(user_id, window_start, limit):
+    # SET expressions see the row as it was, so the CASE compares the old window
+    return RentalRequestCounter.objects.filter(
+        Q(count__lt=limit) | ~Q(window_start=window_start), user_id=user_id,
+    ).update(
+        count=Case(When(window_start=window_start, then=F('count') + 1), default=Value(1)),
+        window_start=window_start,
+    )
+
+
+def allow_rental_request(user_id, limit=RENTAL_REQUEST_LIMIT, window=RENTAL_REQUEST_WINDOW):
+    """Count one request for ``user_id``; False once they're over ``limit`` in this window."""
+    window_start = int(time.time() // window * window)
+    if _count_request(user_id, window_start, limit):
+        return True
+    try:
+        with transaction.atomic():
+            RentalRequestCounter.objects.create(user_id=user_id, window_start=window_start, count=1)
+        return True
+    except IntegrityError:
+        # Over the limit, or another request created the row in between
+        return bool(_count_request(user_id, window_start, limit))
@@ -5,9 +5,15 @@ from . import views
 urlpatterns = [
     path('request/<int:game_id>/', views.request_rental, name='request_rental'),
     path('my-rentals/', views.my_rentals, name='my_rentals'),
+    path('waitlist/<int:game_id>/leave/', views.leave_waitlist_view, name='leave_waitlist'),
     path('update-status/<int:rental_id>/<str:new_status>/', views.update_rental_status, name='update_rental_status'),
     path('update-status/<int:rental_id>/<str:new_status>/', views.update_rental_status, name='update_rental_status'),
+    path('update-status/bulk/', views.bulk_update_rental_status, name='bulk_update_rental_status'),
     # rentals/urls.py
     path('rental/<int:rental_id>/pay/', views.pay_rental, name='pay_rental'),
+    path('reports/', views.rental_report, name='rental_report'),
+    path('export/', views.export_rentals, name='export_rentals'),
+    path('calendar/<int:game_id>/', views.game_calendar, name='game_calendar'),
+    path('quote/', views.quote_rentals, name='quote_rentals'),
 
 ]
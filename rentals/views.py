@@ -5,7 +5,10 @@ from games.models import Game
 from .models import Rental
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from django.http import HttpResponseForbidden
+from django.http import HttpResponseBadRequest, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_POST
+import json
+import uuid
 from .forms import RentalRequestForm
 
 # @login_required
@@ -58,69 +61,136 @@ from .forms import RentalRequestForm
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from games.models import Game
-from .models import Rental
-from .forms import RentalRequestForm
+from .models import Rental, WaitlistEntry
+from .export import EXPORT_FORMATS, export_chunks
+from .forms import RentalFilterForm, RentalRequestForm, RollupReportForm
+from .pricing import MAX_RENTAL_DAYS, quote, quote_many
+from .reservations import daily_load, has_room, month_calendar, period_for
+from .rollups import report
+from .services import RentalError, bulk_set_status, can_manage, record_payment, set_rental_status
+from .stats import ACTIVE_STATUSES, record_change, state_of
+from .throttle import allow_rental_request
+from .waitlist import join_waitlist, leave_waitlist
+from django.db import IntegrityError, transaction
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 
 @login_required
 def request_rental(request, game_id):
-    game = get_object_or_404(Game, id=game_id)
-
-    if not game.available:
-        messages.error(request, "This game is currently not available.")
-        return redirect('student_dashboard')
-
-    # Check if already requested
-    if Rental.objects.filter(user=request.user, game=game, status='pending').exists():
-        messages.warning(request, "You have already requested this game.")
-        return redirect('student_dashboard')
+    game = get_object_or_404(Game.objects.select_related('waitlist'), id=game_id)
 
     if request.method == "POST":
+        if not allow_rental_request(request.user.pk):
+            messages.error(request, "You are sending rental requests too quickly. Please try again later.")
+            return redirect('student_dashboard')
+
         form = RentalRequestForm(request.POST)
         if form.is_valid():
             rental_days = form.cleaned_data['rental_days']
-            cost = rental_days * float(game.price_per_day)  # calculate total cost based on the game's price
+            today = timezone.localdate()
+            start, end = period_for(form.cleaned_data['start_date'] or today, rental_days)
 
-            Rental.objects.create(
-                user=request.user,
-                game=game,
-                rental_days=rental_days,
-                cost=cost
-            )
+            # Rented out now, or others are queued for it: join the queue
+            # instead; promotion files the request later
+            if start == today and (not game.available or _queue_length(game)):
+                entry, created = join_waitlist(request.user, game, rental_days)
+                if created:
+                    reason = "is rented out" if not game.available else "has a waitlist"
+                    messages.success(
+                        request,
+                        f"{game.title} {reason}. You're on the waitlist and will get a "
+                        f"rental request automatically when it's your turn."
+                    )
+                else:
+                    messages.info(request, f"You're already on the waitlist for {game.title}.")
+                return redirect('student_dashboard')
+
+            # Approval checks again; this just saves asking for dates nobody can get
+            load = daily_load([game.pk], start, end)[game.pk]
+            if not has_room(load, game.total_copies, start, end):
+                form.add_error('start_date', f"{game.title} is fully booked for some of those days.")
+                return render(
+                    request, "rentals/request_rentals.html", {"form": form, "game": game, "quotes": _quote_table(game)},
+                )
+
+            cost = quote(game.price_per_day, rental_days)
+
+            # One pending request per user and game is enforced by the
+            # rental_one_pending_request constraint, also under concurrent posts
+            try:
+                with transaction.atomic():
+                    rental = Rental.objects.create(
+                        user=request.user,
+                        game=game,
+                        rental_days=rental_days,
+                        cost=cost,
+                        start_date=start,
+                        end_date=end,
+                    )
+                    record_change(rental, None, state_of(rental))
+            except IntegrityError:
+                # Only that constraint means a duplicate; anything else is a bug
+                if not Rental.objects.filter(user=request.user, game=game, status='pending').exists():
+                    raise
+                messages.warning(request, "You have already requested this game.")
+                return redirect('student_dashboard')
 
             messages.success(
                 request,
-                f"Rental request for {game.title} submitted for {rental_days} days! Total cost: ₹{cost:.2f}"
+                f"Rental request for {game.title} submitted for {rental_days} days from {start:%d %b}! "
+                f"Total cost: ₹{cost:.2f}"
             )
             return redirect('student_dashboard')
     else:
         form = RentalRequestForm()
 
-    return render(request, "rentals/request_rentals.html", {"form": form, "game": game})
+    return render(request, "rentals/request_rentals.html", {"form": form, "game": game, "quotes": _quote_table(game)})
+
+
+def _queue_length(game):
+    waitlist = getattr(game, 'waitlist', None)
+    return waitlist.length if waitlist is not None else 0
+
+
+def _quote_table(game):
+    """Cost for every allowed rental length, so the form can price without asking the server."""
+    return {days: str(quote(game.price_per_day, days)) for days in range(1, MAX_RENTAL_DAYS + 1)}
 
 
 
 @login_required
 def my_rentals(request):
-    rentals = Rental.objects.filter(user=request.user)
-    return render(request, 'rentals/my_rentals.html', {'rentals': rentals})
+    rentals = Rental.objects.filter(user=request.user).select_related('game')
+    waitlist = WaitlistEntry.objects.filter(user=request.user).select_related('game').order_by('joined_at')
+    return render(request, 'rentals/my_rentals.html', {'rentals': rentals, 'waitlist': waitlist})
+
+
+@login_required
+@require_POST
+def leave_waitlist_view(request, game_id):
+    game = get_object_or_404(Game, id=game_id)
+    if leave_waitlist(request.user, game):
+        messages.success(request, f"You left the waitlist for {game.title}.")
+    else:
+        messages.info(request, f"You weren't on the waitlist for {game.title}.")
+    return redirect('my_rentals')
 
 
 @login_required
 def update_rental_status(request, rental_id, new_status):  # <- accept new_status
-    rental = get_object_or_404(Rental, id=rental_id)
+    rental = get_object_or_404(Rental.objects.select_related('game'), id=rental_id)
 
     # Optional: restrict student admins to only their own rentals
-    if not request.user.is_superuser and rental.game.added_by != request.user:
+    if not can_manage(request.user, rental):
         messages.error(request, "You don't have permission to update this rental.")
         return redirect('student_admin_dashboard')
 
-    rental.status = new_status.lower()
-    if new_status.lower() == 'approved':
-        rental.approved_at = timezone.now()
-    rental.save()
-    messages.success(request, f"Rental status updated to {new_status}.")
+    try:
+        rental = set_rental_status(rental.id, new_status, request.user)
+    except RentalError as exc:
+        messages.error(request, str(exc))
+    else:
+        messages.success(request, f"Rental status updated to {rental.get_status_display()}.")
     
     # Redirect to appropriate dashboard
     if request.user.is_superuser:
@@ -128,29 +198,190 @@ def update_rental_status(request, rental_id, new_status):  # <- accept new_statu
     else:
         return redirect('student_admin_dashboard')
 
+@login_required
+@require_POST
+def bulk_update_rental_status(request):
+    """
+    Approve or deny many rentals at once.
+
+    Accepts a JSON body ``{"rental_ids": [...], "status": "approved"}`` and
+    answers with per-id results, or a regular form post (``rental_ids`` and
+    ``status`` fields) from the dashboard, which redirects back.
+    """
+    wants_json = request.content_type == 'application/json'
+    error, results = None, {}
+    try:
+        if wants_json:
+            payload = json.loads(request.body)
+            raw_ids, status = payload.get('rental_ids', []), payload.get('status', '')
+        else:
+            raw_ids, status = request.POST.getlist('rental_ids'), request.POST.get('status', '')
+        results = bulk_set_status(request.user, [int(rental_id) for rental_id in raw_ids], status)
+    except (ValueError, TypeError, AttributeError):
+        error = "Expected a list of integer rental_ids."
+    except RentalError as exc:
+        error = str(exc)
+
+    updated = sum(result['ok'] for result in results.values())
+    if wants_json:
+        if error:
+            return JsonResponse({'error': error}, status=400)
+        return JsonResponse({
+            'updated': updated,
+            'results': {str(rental_id): result for rental_id, result in results.items()},
+        })
+
+    if error:
+        messages.error(request, error)
+    if updated:
+        messages.success(request, f"Updated {updated} rental(s).")
+    if len(results) > updated:
+        messages.warning(request, f"{len(results) - updated} rental(s) could not be updated.")
+
+    if request.user.is_superuser:
+        return redirect('superadmin_dashboard')
+    else:
+        return redirect('student_admin_dashboard')
+
+
 @login_required
 def pay_rental(request, rental_id):
-    rental = get_object_or_404(Rental, id=rental_id, user=request.user)
+    rental = get_object_or_404(Rental.objects.select_related('game'), id=rental_id, user=request.user)
 
-    if rental.status != 'approved':
+    if rental.status not in ACTIVE_STATUSES:
         messages.error(request, "You cannot pay for a rental that is not approved.")
         return redirect('my_rentals')
 
     if rental.payment_status == 'paid':
-        messages.info(request, "This rental is already paid.")
+        messages.info(request, f"This rental is already paid. Transaction ID: {rental.transaction_id}")
         return redirect('my_rentals')
 
     if request.method == 'POST':
         payment_method = request.POST.get('payment_method', 'Mock Method')
-        rental.payment_status = 'paid'
-        rental.payment_method = payment_method
-        rental.payment_date = timezone.now()
-        rental.transaction_id = f"TXN-{rental.id}-{int(timezone.now().timestamp())}"
-        rental.save()
-        messages.success(request, f"Payment successful! Transaction ID: {rental.transaction_id}")
+        # The form carries a one-time key so resubmits can't pay twice
+        idempotency_key = request.POST.get('idempotency_key') or uuid.uuid4().hex
+        try:
+            payment, created = record_payment(rental, request.user, idempotency_key, payment_method)
+        except RentalError as exc:
+            messages.error(request, str(exc))
+            return redirect('my_rentals')
+        if created:
+            messages.success(request, f"Payment successful! Transaction ID: {payment.transaction_id}")
+        else:
+            messages.info(request, f"This rental is already paid. Transaction ID: {payment.transaction_id}")
         return redirect('my_rentals')
 
-    return render(request, 'rentals/pay_rental.html', {'rental': rental})
+    return render(request, 'rentals/pay_rental.html', {
+        'rental': rental,
+        'idempotency_key': uuid.uuid4().hex,
+    })
+
 
+@login_required
+def rental_report(request):
+    """Daily requests, approvals and revenue over a date range, from the rollup tables."""
+    user = request.user
+    if user.is_superuser or user.role == 'super_admin':
+        owner = None
+    elif user.role == 'student_admin':
+        owner = user
+    else:
+        messages.error(request, "Only game owners and admins can view rental reports.")
+        return redirect('student_dashboard')
+
+    form = RollupReportForm(request.GET)
+    if not form.is_valid():
+        form = RollupReportForm({})
+        messages.error(request, "Invalid date range; showing the last 30 days.")
+        form.is_valid()
+    date_from, date_to = form.cleaned_data['date_from'], form.cleaned_data['date_to']
 
+    return render(request, 'rentals/rental_report.html', {
+        'form': form,
+        'date_from': date_from,
+        'date_to': date_to,
+        'owner': owner,
+        **report(date_from, date_to, owner=owner),
+    })
+
+
+@login_required
+def export_rentals(request):
+    """Stream every rental matching the dashboard filters as CSV or JSON Lines."""
+    if not (request.user.is_superuser or request.user.role == 'super_admin'):
+        return HttpResponseForbidden("Only super admins can export rentals.")
+
+    fmt = request.GET.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return HttpResponseBadRequest(f"Unknown export format {fmt!r}.")
+    filter_form = RentalFilterForm(request.GET)
+    if not filter_form.is_valid():
+        return HttpResponseBadRequest("Invalid export filters.")
+
+    _, content_type = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(
+        export_chunks(filter_form.filter(Rental.objects.all()), fmt),
+        content_type=f"{content_type}; charset=utf-8",
+    )
+    response['Content-Disposition'] = f'attachment; filename="rentals-{timezone.localdate():%Y%m%d}.{fmt}"'
+    return response
+
+
+@login_required
+def game_calendar(request, game_id):
+    """Free and busy intervals of a game for one month (``?month=YYYY-MM``, default this month)."""
+    game = get_object_or_404(Game, id=game_id)
+    month = request.GET.get('month')
+    if month:
+        try:
+            year, month = map(int, month.split('-'))
+            intervals = month_calendar(game, year, month)
+        except ValueError:
+            return JsonResponse({'error': "month must look like YYYY-MM."}, status=400)
+    else:
+        today = timezone.localdate()
+        year, month = today.year, today.month
+        intervals = month_calendar(game, year, month)
+
+    return JsonResponse({
+        'game': game.pk,
+        'month': f"{year:04d}-{month:02d}",
+        'total_copies': game.total_copies,
+        'intervals': intervals,
+    })
+
+
+# Pairs per quote request
+MAX_QUOTE_PAIRS = 100
+
+
+@login_required
+def quote_rentals(request):
+    """
+    Quote many rentals at once: ``?q=<game_id>:<days>`` (repeatable, or
+    comma-separated). Answers ``{"quotes": [{"game", "days", "cost"}]}``
+    in request order; unknown games are left out.
+    """
+    pairs = []
+    for value in request.GET.getlist('q'):
+        for pair in value.split(','):
+            try:
+                game_id, days = map(int, pair.split(':'))
+            except ValueError:
+                return JsonResponse({'error': f"Bad pair {pair!r}; expected <game_id>:<days>."}, status=400)
+            if not 1 <= days <= MAX_RENTAL_DAYS:
+                return JsonResponse({'error': f"days must be between 1 and {MAX_RENTAL_DAYS}."}, status=400)
+            pairs.append((game_id, days))
+    if not pairs:
+        return JsonResponse({'error': "Nothing to quote."}, status=400)
+    if len(pairs) > MAX_QUOTE_PAIRS:
+        return JsonResponse({'error': f"At most {MAX_QUOTE_PAIRS} pairs per request."}, status=400)
 
+    quotes = quote_many(pairs)
+    return JsonResponse({
+        'quotes': [
+            {'game': game_id, 'days': days, 'cost': str(quotes[game_id, days])}
+            for game_id, days in pairs
+            if (game_id, days) in quotes
+        ],
+    })
@@ -0,0 +1,122 @@
+"""
+First-come, first-served waitlist for games that are rented out.
+
+Entries get increasing positions from their game's ``Waitlist`` row, which
+also carries the queue length and the user at its head, so pages can show
+both without scanning the queue. Copies on the shelf that no pending
+request is waiting for (a rental was returned, a request was denied, the
+owner added copies) go to the queue: ``promote_waitlist`` turns that many
+entries from its head into pending rental requests, in the caller's
+transaction. While anyone is queued, new requests for today join the
+queue too (see rentals.views.request_rental), so nobody jumps it.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, Exists, F, IntegerField, OuterRef, Q, Subquery, Value, When, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from games.models import Game
+from .models import Rental, Waitlist, WaitlistEntry
+from .pricing import quote
+from .reservations import period_for
+from .stats import RentalChange, RentalState, record_changes
+
+
+def _head_user():
+    return Subquery(
+        WaitlistEntry.objects.filter(game=OuterRef('game')).order_by('position').values('user')[:1]
+    )
+
+
+def join_waitlist(user, game, rental_days):
+    """Queue ``user`` for ``game``; returns ``(entry, created)``."""
+    existing = WaitlistEntry.objects.filter(game=game, user=user).first()
+    if existing is not None:
+        return existing, False
+
+    try:
+        with transaction.atomic():
+            # Taking a position is an UPDATE, so concurrent joins queue on it
+            Waitlist.objects.bulk_create([Waitlist(game=game)], ignore_conflicts=True)
+            Waitlist.objects.filter(pk=game.pk).update(
+                length=F('length') + 1, next_position=F('next_position') + 1, updated_at=timezone.now(),
+            )
+            position = Waitlist.objects.filter(pk=game.pk).values_list('next_position', flat=True).get() - 1
+            entry = WaitlistEntry.objects.create(game=game, user=user, position=position, rental_days=rental_days)
+            Waitlist.objects.filter(pk=game.pk, head_user__isnull=True).update(head_user=user)
+    except IntegrityError:
+        # The same user joined twice at once
+        existing = WaitlistEntry.objects.filter(game=game, user=user).first()
+        if existing is None:
+            raise
+        return existing, False
+    return entry, True
+
+
+@transaction.atomic
+def leave_waitlist(user, game):
+    deleted, _ = WaitlistEntry.objects.filter(game=game, user=user).delete()
+    if deleted:
+        Waitlist.objects.filter(pk=game.pk).update(
+            length=F('length') - 1, head_user=_head_user(), updated_at=timezone.now(),
+        )
+    return bool(deleted)
+
+
+def promote_waitlist(game_ids):
+    """
+    For each of ``game_ids``, turn as many waitlist entries as there are
+    copies on the shelf beyond the game's pending requests into new pending
+    rentals, first in line first. Entries whose user already has a pending
+    request for the game keep their place. Must run inside the transaction
+    that freed the copies; returns the rentals created.
+    """
+    games = {
+        row['id']: row
+        for row in Game.objects.filter(id__in=set(game_ids), available_copies__gt=0)
+        .annotate(pending=Count('rental', filter=Q(rental__status='pending')))
+        .filter(available_copies__gt=F('pending'))
+        .values('id', 'added_by_id', 'price_per_day', 'available_copies', 'pending')
+    }
+    if not games:
+        return []
+    room = {game_id: row['available_copies'] - row['pending'] for game_id, row in games.items()}
+
+    candidates = (
+        WaitlistEntry.objects.filter(game_id__in=games)
+        .exclude(Exists(Rental.objects.filter(user=OuterRef('user'), game=OuterRef('game'), status='pending')))
+        .annotate(place=Window(RowNumber(), partition_by=F('game'), order_by=F('position').asc()))
+        .filter(place__lte=max(room.values()))
+        .values_list('id', 'game_id', 'user_id', 'rental_days', 'place')
+    )
+    heads = [(entry_id, game_id, user_id, days) for entry_id, game_id, user_id, days, place in candidates
+             if place <= room[game_id]]
+    if not heads:
+        return []
+
+    today = timezone.localdate()
+    rentals = Rental.objects.bulk_create([
+        Rental(
+            user_id=user_id, game_id=game_id, rental_days=days, cost=quote(games[game_id]['price_per_day'], days),
+            start_date=start, end_date=end,
+        )
+        for _, game_id, user_id, days in heads
+        for start, end in [period_for(today, days)]
+    ])
+    promoted = {}
+    for _, game_id, _, _ in heads:
+        promoted[game_id] = promoted.get(game_id, 0) + 1
+    WaitlistEntry.objects.filter(id__in=[entry_id for entry_id, *_ in heads]).delete()
+    Waitlist.objects.filter(game_id__in=promoted).update(
+        length=F('length') - Case(
+            *[When(game_id=game_id, then=Value(count)) for game_id, count in promoted.items()],
+            output_field=IntegerField(),
+        ),
+        head_user=_head_user(),
+        updated_at=timezone.now(),
+    )
+    record_changes([
+        RentalChange(rental.user_id, games[rental.game_id]['added_by_id'], None, RentalState('pending', 'pending', rental.cost))
+        for rental in rentals
+    ])
+    return rentals
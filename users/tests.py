@@ -1,3 +1,86 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from campus_gamehub.testing import SEED_PASSWORD, QueryBudgetMixin, seed_data
+from . import urls
+
+# Queries per request, including the session and user lookups of a
+# logged-in request. They must not grow with the data.
+QUERY_BUDGETS = {
+    'home': 0,
+    'dashboard': 2,
+    'register': 0,
+    'login': 0,
+    'forgot_password': 0,
+    'verify_otp': 0,
+    'reset_password': 0,
+    'superadmin_dashboard': 7,
+    'student_admin_dashboard': 4,
+    'student_dashboard': 4,
+    'profile': 6,
+    'view_user_profile': 7,
+}
+
+# Same, for form posts (savepoints count too)
+POST_QUERY_BUDGETS = {
+    'login': 9,
+    'logout': 4,
+}
+
+
+class UserViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_data()
+        cls.super_admin = cls.data['super_admin']
+        cls.owner = cls.data['owners'][0]
+        cls.student = cls.data['students'][0]
+
+    def test_every_view_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns} | {'home', 'dashboard'}
+        self.assertEqual(names, set(QUERY_BUDGETS) | set(POST_QUERY_BUDGETS))
+
+    def test_public_pages(self):
+        for name in ('home', 'register', 'login', 'forgot_password', 'verify_otp'):
+            with self.subTest(name):
+                self.assertViewBudget(name)
+        self.assertViewBudget('reset_password', status=302)
+
+    def test_login_redirect(self):
+        self.assertViewBudget('dashboard', user=self.owner, status=302)
+
+    def test_login_and_logout(self):
+        with self.assertQueryBudget(POST_QUERY_BUDGETS['login'], "POST login"):
+            response = self.client.post(
+                reverse('login'), {'username': self.student.username, 'password': SEED_PASSWORD},
+            )
+        self.assertEqual(response.status_code, 302)
+        with self.assertQueryBudget(POST_QUERY_BUDGETS['logout'], "POST logout"):
+            self.assertEqual(self.client.post(reverse('logout')).status_code, 302)
+
+    def test_superadmin_dashboard(self):
+        first, second = self.assertViewBudget('superadmin_dashboard', user=self.super_admin)
+        self.assertGreater(second.context['summary']['total'], first.context['summary']['total'])
+
+    def test_superadmin_dashboard_filtered(self):
+        self.assertViewBudget('superadmin_dashboard', user=self.super_admin, query='?status=pending')
+
+    def test_student_admin_dashboard(self):
+        first, second = self.assertViewBudget('student_admin_dashboard', user=self.owner)
+        self.assertGreater(len(second.context['rentals']), len(first.context['rentals']))
+
+    def test_student_dashboard(self):
+        first, second = self.assertViewBudget('student_dashboard', user=self.student)
+        self.assertGreater(len(second.context['rentals']), len(first.context['rentals']))
+
+    def test_own_profiles(self):
+        for user in (self.student, self.owner, self.super_admin):
+            with self.subTest(user.role):
+                self.assertViewBudget('profile', user=user)
+
+    def test_other_profiles(self):
+        for target in (self.student, self.owner):
+            with self.subTest(target.role):
+                self.assertViewBudget('view_user_profile', user=self.super_admin, args=[target.pk])
@@ -6,9 +6,14 @@ from django.conf import settings
 import random
 from .forms import RegisterForm
 from django.contrib.auth.decorators import login_required
-from rentals.models import Rental
+from rentals.models import Payment, Rental, RentalStats
 from games.models import Game
-from django.db.models import Sum, Q
+from games.cards import render_game_cards
+from django.db.models import Count, Sum, Q
+from django.http import HttpResponseBadRequest
+from decimal import Decimal
+from campus_gamehub.pagination import InvalidCursor, paginate_keyset, page_size_from_request
+from rentals.forms import RentalFilterForm
 
 User = get_user_model()
 
@@ -123,14 +128,37 @@ def login_redirect_view(request):
 # ------------------ Super Admin Dashboard ------------------
 @login_required
 def superadmin_dashboard(request):
-    users = User.objects.all()
-    games = Game.objects.all()
-    rentals = Rental.objects.all().order_by('-requested_at')
+    # Summary cards: one GROUP BY over rentals instead of loading every row
+    summary = {'total': 0, 'pending': 0, 'approved': 0}
+    for row in Rental.objects.values('status').annotate(count=Count('id')).order_by():
+        summary['total'] += row['count']
+        if row['status'] in summary:
+            summary[row['status']] += row['count']
+
+    # Revenue comes from the payment ledger
+    summary.update(Payment.objects.aggregate(paid=Count('id'), revenue=Sum('amount', default=Decimal('0'))))
+
+    # Rentals table: filtered, keyset-paginated, users and games joined in
+    filter_form = RentalFilterForm(request.GET or None)
+    rentals = filter_form.filter(Rental.objects.select_related('user', 'game'))
+    try:
+        page = paginate_keyset(
+            rentals,
+            ['-requested_at', '-id'],
+            cursor=request.GET.get('cursor'),
+            page_size=page_size_from_request(request, default=25),
+        )
+    except InvalidCursor:
+        return HttpResponseBadRequest("Invalid page cursor.")
 
     return render(request, 'dashboard/superadmin_dashboard.html', {
-        'users': users,
-        'games': games,
-        'rentals': rentals
+        'user_count': User.objects.count(),
+        'game_count': Game.objects.count(),
+        'summary': summary,
+        'filter_form': filter_form,
+        'rentals': page.items,
+        'next_url': page.next_url(request),
+        'previous_url': page.previous_url(request),
     })
 
 
@@ -141,7 +169,7 @@ def student_admin_dashboard(request):
     games = Game.objects.filter(added_by=request.user)
 
     # Show rentals for those games
-    rentals = Rental.objects.filter(game__added_by=request.user)
+    rentals = Rental.objects.filter(game__added_by=request.user).select_related('user', 'game')
 
     return render(request, 'dashboard/student_admin_dashboard.html', {
         'games': games,
@@ -152,10 +180,10 @@ def student_admin_dashboard(request):
 # ------------------ Student Dashboard ------------------
 @login_required
 def student_dashboard(request):
-    games = Game.objects.filter(available=True)
-    rentals = Rental.objects.filter(user=request.user)
+    games = Game.objects.filter(available_copies__gt=0)
+    rentals = Rental.objects.filter(user=request.user).select_related('game')
     return render(request, 'dashboard/student_dashboard.html', {
-        'games': games,
+        'game_cards': render_game_cards(games, 'dashboard'),
         'rentals': rentals
     })
 
@@ -178,52 +206,32 @@ def profile_view(request, user_id=None):
     games_listed = []
     rentals_received = []
     total_games_listed = 0
-    total_revenue_earned = 0.0
-    show_financial_details = False
 
     # Determine what data to show based on viewer and profile owner
     # Financial details (revenue, payments) only visible to profile owner or super_admin
     show_financial_details = is_own_profile or request.user.role == 'super_admin'
 
+    # Counters are maintained incrementally (rentals.stats): one PK lookup
+    stats = RentalStats.objects.filter(pk=target_user.pk).first() or RentalStats(user=target_user)
+
     # Games & Rentals Analytics for student_admin and super_admin profiles
     if target_user.role in ['student_admin', 'super_admin']:
         # Games listed by target user
-        games_listed = Game.objects.filter(added_by=target_user)
-        total_games_listed = games_listed.count()
+        games_listed = list(Game.objects.filter(added_by=target_user))
+        total_games_listed = len(games_listed)
 
         # Rentals of their games
-        rentals_received = Rental.objects.filter(game__added_by=target_user)
-
-        # Revenue only if viewer has permission
-        if show_financial_details:
-            total_revenue_earned = rentals_received.filter(
-                payment_status='paid'
-            ).aggregate(total=Sum('cost'))['total'] or 0.0
+        rentals_received = Rental.objects.filter(game__added_by=target_user).select_related('game', 'user')
 
     # Rentals made by target user (visible to all)
-    rentals_made = Rental.objects.filter(user=target_user)
-    
-    # Basic rental statistics (visible to all)
-    total_rentals_made = rentals_made.count()
-    active_rentals = rentals_made.filter(status__in=['approved', 'ongoing']).count()
-    completed_rentals = rentals_made.filter(status='returned').count()
-    
-    # Spending details only if viewer has permission
+    rentals_made = Rental.objects.filter(user=target_user).select_related('game')
+
+    # Revenue and spending only if viewer has permission
+    total_revenue_earned = 0.0
     total_spent_on_rentals = 0.0
     if show_financial_details:
-        total_spent_on_rentals = rentals_made.filter(
-            payment_status='paid'
-        ).aggregate(total=Sum('cost'))['total'] or 0.0
-
-    # Count currently rented games (for public view)
-    currently_rented_games = rentals_received.filter(
-        status__in=['approved', 'ongoing']
-    ).count() if target_user.role in ['student_admin', 'super_admin'] else 0
-
-    # Count past rentals of their games (for public view)
-    past_rentals_of_games = rentals_received.filter(
-        status='returned'
-    ).count() if target_user.role in ['student_admin', 'super_admin'] else 0
+        total_revenue_earned = stats.revenue_paid
+        total_spent_on_rentals = stats.spent_paid
 
     # Prepare context
     context = {
@@ -237,11 +245,11 @@ def profile_view(request, user_id=None):
         'total_games_listed': total_games_listed,
         
         # Rental statistics (public)
-        'total_rentals_made': total_rentals_made,
-        'active_rentals': active_rentals,
-        'completed_rentals': completed_rentals,
-        'currently_rented_games': currently_rented_games,
-        'past_rentals_of_games': past_rentals_of_games,
+        'total_rentals_made': stats.rentals_total,
+        'active_rentals': stats.rentals_active,
+        'completed_rentals': stats.rentals_completed,
+        'currently_rented_games': stats.received_active,
+        'past_rentals_of_games': stats.received_completed,
         
         # Financial data (restricted)
         'total_revenue_earned': total_revenue_earned,